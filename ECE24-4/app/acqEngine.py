@@ -0,0 +1,237 @@
+# acqEngine.py
+#   • asyncio acquisition core shared by every device type
+#   • drives one BITalino and/or any number of ESP32 boxes on a single event loop
+#   • stamps each received block with a monotonic clock (and sequence numbers if the device has them)
+#   • keeps timing statistics per source (effective fs, jitter, gaps, lost samples)
+#   • fans blocks out to subscribers (ring buffer recorder, live view, online analysis)
+#_______________________________________________________________________________#
+
+import asyncio
+import time
+import traceback
+from collections import namedtuple
+
+import numpy as np
+
+from acqStats import StreamStats
+from esp32Device import WIRE_ORDER
+from procFuncs import BITALINO_UNITS, convert_raw_block
+
+# How long a source may go without delivering data before its pump gives up (seconds)
+STALL_TIMEOUT_S = 5
+
+# One block of samples from one source.
+#   source    : name of the source that produced it
+#   timestamp : time.monotonic() when the block was received
+#   start     : index of the block's first sample within that source's stream
+#   samples   : np.ndarray (n, 3) in channel order [EMG, ECG, EDA]; columns of
+#               disabled channels are NaN (each source's `enabled` mask says which)
+#   seq       : np.ndarray (n,) of increasing per-sample sequence numbers from the
+#               device, or None if the device does not send any
+Block = namedtuple("Block", ["source", "timestamp", "start", "samples", "seq"], defaults=(None,))
+
+
+#===============================================================================
+# SOURCES
+#===============================================================================
+class Esp32Source:
+    """
+    Streams blocks from an esp32Device.Device.
+
+    Device.read_block never blocks (it only drains what is already waiting),
+    so the source simply polls it on the event loop. Binary frames carry
+    sequence numbers, text lines do not. With keep_open the port stays open
+    after the phase (the device belongs to a deviceSession.DeviceSession).
+    """
+
+    def __init__(self, device, fs, channel, name="ESP32", poll_interval=0.005, keep_open=False):
+        self.device = device
+        self.keep_open = keep_open
+        self.fs = fs
+        self.name = name
+        self.poll_interval = poll_interval
+        self.enabled = np.asarray(channel, dtype=bool)
+        self.units = "V"
+
+    async def open(self):
+        loop = asyncio.get_running_loop()
+        if not self.device.device_found:
+            # port probing sleeps while it waits for data, keep it off the loop
+            if not await loop.run_in_executor(None, self.device.connect):
+                raise ConnectionError(f"{self.name}: device not found")
+        self.device.start()
+
+    async def read_block(self):
+        """Returns (samples, seq or None)."""
+        block = self.device.read_block()
+        if len(block) == 0:
+            await asyncio.sleep(self.poll_interval)
+            return block, None
+
+        # reorder to [EMG, ECG, EDA]; disabled channels are left empty (NaN)
+        samples = block[:, WIRE_ORDER]
+        samples[:, ~self.enabled] = np.nan
+        seq = self.device.last_seq if self.device.protocol == 'binary' else None
+        return samples, seq
+
+    async def close(self):
+        self.device.log_read_errors()
+        if not self.keep_open:
+            self.device.stop()
+
+
+class BitalinoSource:
+    """
+    Streams blocks from a connected bitalino.BITalino.
+
+    BITalino.read blocks until the requested number of frames arrived, so
+    each read runs in the loop's thread pool. Reads are kept short (1/10 s by
+    default) so other sources and subscribers keep getting turns. The 4-bit
+    frame counter is unwrapped into increasing sequence numbers. With
+    keep_open the device only stops acquiring at the end of the phase and
+    stays connected.
+    """
+
+    def __init__(self, device, fs, channel, name="BITalino", chunk=None, keep_open=False):
+        self.device = device
+        self.keep_open = keep_open
+        self.fs = fs
+        self.name = name
+        self.chunk = chunk or max(1, fs // 10)
+        self.enabled = np.asarray(channel, dtype=bool)
+        self.units = BITALINO_UNITS
+        self._last_seq = None
+
+    async def open(self):
+        loop = asyncio.get_running_loop()
+        self._last_seq = None
+        await loop.run_in_executor(None, self.device.start, self.fs, [0, 1, 2, 3, 4, 5])
+
+    async def read_block(self):
+        """Returns (samples, seq)."""
+        loop = asyncio.get_running_loop()
+        data = np.asarray(await loop.run_in_executor(None, self.device.read, self.chunk))
+        if len(data) == 0:
+            return np.empty((0, 3)), None
+        return frames_to_block(data, self.enabled), self._unwrap(data[:, 0])
+
+    def _unwrap(self, counter):
+        # consecutive frames step the counter by 1 (mod 16); a bigger step means lost frames
+        counter = counter.astype(np.int64)
+        last = int(counter[0]) - 1 if self._last_seq is None else self._last_seq
+        steps = (np.diff(counter, prepend=last % 16) - 1) % 16 + 1
+        seq = last + np.cumsum(steps)
+        self._last_seq = int(seq[-1])
+        return seq
+
+    async def close(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.device.stop)
+        if not self.keep_open:
+            await loop.run_in_executor(None, self.device.close)
+
+
+def frames_to_block(data, enabled):
+    """
+    Converts a BITalino frame matrix into an (n, 3) [EMG, ECG, EDA] block in
+    physical units (mV, mV, uS).
+
+    Analog channels A1-A3 sit in columns 5-7 and are converted column-wise in
+    one go; disabled channels are left as NaN.
+    """
+    return convert_raw_block(np.asarray(data)[:, 5:8], enabled)
+
+
+#===============================================================================
+# ENGINE
+#===============================================================================
+class AcquisitionEngine:
+    """
+    Runs every registered source concurrently on one asyncio event loop and
+    publishes each block to the subscribers.
+
+    Subscribers are plain functions (or coroutine functions) taking a Block.
+    They run on the loop, so they should be quick: copy into a buffer, hand
+    off to a queue, update running stats.
+    """
+
+    def __init__(self):
+        self.sources = []
+        self._subscribers = []
+        self.samples_received = {}
+        self.stats = {}
+
+    def add_source(self, source):
+        self.sources.append(source)
+        self.samples_received[source.name] = 0
+        self.stats[source.name] = StreamStats(source.fs)
+        return source
+
+    def subscribe(self, callback, source=None):
+        """
+        Registers callback(block). If source is given (a source name), only
+        blocks from that source are delivered.
+        """
+        self._subscribers.append((callback, source))
+
+    async def run(self, duration):
+        """
+        Opens all sources, collects duration seconds of samples from each one
+        and closes them again. Prints each source's timing statistics.
+        """
+        await asyncio.gather(*(source.open() for source in self.sources))
+        try:
+            await asyncio.gather(*(self._pump(source, duration) for source in self.sources))
+        finally:
+            for source in self.sources:
+                try:
+                    await source.close()
+                except Exception as e:
+                    print(f"{source.name}: close failed: {e}")
+                self.stats[source.name].report(source.name)
+
+    def run_sync(self, duration):
+        """Blocking wrapper around run() for callers on a plain thread."""
+        asyncio.run(self.run(duration))
+
+    async def _pump(self, source, duration):
+        target = int(source.fs * duration)
+        received = 0
+        last_data = time.monotonic()
+
+        while received < target:
+            samples, seq = await source.read_block()
+            now = time.monotonic()
+
+            if len(samples) == 0:
+                if now - last_data > STALL_TIMEOUT_S:
+                    print(f"{source.name}: no data for {STALL_TIMEOUT_S} s, stopping early")
+                    break
+                continue
+
+            last_data = now
+            samples = samples[:target - received]
+            if seq is not None:
+                seq = seq[:len(samples)]
+            block = Block(source.name, now, received, samples, seq)
+            received += len(samples)
+            self.samples_received[source.name] = received
+            self.stats[source.name](block)
+
+            await self._publish(block)
+
+    async def _publish(self, block):
+        for entry in list(self._subscribers):
+            callback, source = entry
+            if source is not None and source != block.source:
+                continue
+            try:
+                result = callback(block)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                # one broken consumer must not stop acquisition for the others; it is
+                # dropped, since a failing one (e.g. a full disk) would fail on every block
+                print(f"Subscriber {callback} failed on {block.source}, unsubscribed: {e}")
+                traceback.print_exc()
+                self._subscribers.remove(entry)
@@ -0,0 +1,163 @@
+# acqStats.py
+#   • online timing statistics for one acquisition stream
+#   • effective sample rate and clock drift (least squares fit of sample index vs arrival time)
+#   • delivery jitter, gaps between blocks and samples lost according to sequence numbers
+#   • saved next to a recording so analysis can correct a mis-stated sampling rate
+#_______________________________________________________________________________#
+
+import json
+import os
+
+import numpy as np
+
+# A block arriving this much later than its samples' worth of time counts as a gap (seconds)
+GAP_THRESHOLD_S = 0.25
+
+
+def stats_path(recording):
+    """Sidecar file holding the StreamStats summary of a recording."""
+    return os.path.splitext(recording)[0] + "_stats.json"
+
+
+def load_stats(recording):
+    """Returns the saved summary of a recording, or None if there is none."""
+    path = stats_path(recording)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+class StreamStats:
+    """
+    Running timing statistics of one stream, updated block by block in O(1).
+
+    Every block's arrival time is paired with the index of its last sample
+    (from the sequence numbers when the device sends them); the slope of a least squares line through those points is the effective
+    sampling period. Jitter is the standard deviation of how much each
+    block's inter-arrival time differs from the time its samples span at the
+    nominal rate.
+
+    Attributes:
+        fs (float): Nominal sampling rate.
+        samples (int): Samples received.
+        blocks (int): Blocks received.
+        gaps (int): Inter-arrival times longer than GAP_THRESHOLD_S beyond nominal.
+        lost_samples (int): Samples missing according to sequence numbers.
+    """
+
+    def __init__(self, fs, gap_threshold_s=GAP_THRESHOLD_S):
+        self.fs = fs
+        self.gap_threshold_s = gap_threshold_s
+        self.samples = 0
+        self.blocks = 0
+        self.gaps = 0
+        self.gap_seconds = 0.0
+        self.max_interval = 0.0
+        self.lost_samples = 0
+
+        self._first_t = None
+        self._prev_t = None
+        self._next_seq = None
+        self._seq0 = None
+
+        # running means / co-moments for the least squares fit
+        self._mx = self._my = self._cxx = self._cxy = 0.0
+
+        # Welford mean / variance of the arrival lateness
+        self._lat_mean = 0.0
+        self._lat_m2 = 0.0
+
+    def __call__(self, block):
+        """Subscriber entry point for acqEngine (accepts a Block)."""
+        self.update(block.timestamp, len(block.samples), block.seq)
+
+    def update(self, timestamp, n, seq=None):
+        if n == 0:
+            return
+
+        if self._first_t is None:
+            self._first_t = timestamp
+        else:
+            interval = timestamp - self._prev_t
+            self.max_interval = max(self.max_interval, interval)
+
+            lateness = interval - n / self.fs
+            count = self.blocks  # intervals seen so far, including this one
+            delta = lateness - self._lat_mean
+            self._lat_mean += delta / count
+            self._lat_m2 += delta * (lateness - self._lat_mean)
+
+            if lateness > self.gap_threshold_s:
+                self.gaps += 1
+                self.gap_seconds += lateness
+
+        self.samples += n
+        self.blocks += 1
+        self._prev_t = timestamp
+
+        # position in the device's own sample clock: by sequence number when
+        # available (lost samples still count as elapsed), else by samples received
+        x = float(self.samples)
+        if seq is not None and len(seq):
+            first, last = int(seq[0]), int(seq[-1])
+            if self._seq0 is None:
+                self._seq0 = first
+            else:
+                self.lost_samples += max(0, first - self._next_seq)
+            self.lost_samples += (last - first + 1) - n
+            self._next_seq = last + 1
+            x = float(last + 1 - self._seq0)
+
+        y = timestamp - self._first_t
+        dx = x - self._mx
+        self._mx += dx / self.blocks
+        self._my += (y - self._my) / self.blocks
+        self._cxx += dx * (x - self._mx)
+        self._cxy += dx * (y - self._my)
+
+    @property
+    def effective_fs(self):
+        """Measured sampling rate, or None until there are enough blocks."""
+        if self.blocks < 3 or self._cxx <= 0:
+            return None
+        period = self._cxy / self._cxx
+        return 1 / period if period > 0 else None
+
+    @property
+    def drift_ppm(self):
+        fs = self.effective_fs
+        return None if fs is None else (fs / self.fs - 1) * 1e6
+
+    @property
+    def jitter(self):
+        """Standard deviation of block arrival lateness (seconds)."""
+        if self.blocks < 3:
+            return 0.0
+        return float(np.sqrt(self._lat_m2 / (self.blocks - 2)))
+
+    def summary(self):
+        return {
+            "nominal_fs": self.fs,
+            "effective_fs": self.effective_fs,
+            "drift_ppm": self.drift_ppm,
+            "samples": self.samples,
+            "blocks": self.blocks,
+            "jitter_ms": self.jitter * 1000,
+            "max_interval_ms": self.max_interval * 1000,
+            "gaps": self.gaps,
+            "gap_seconds": self.gap_seconds,
+            "lost_samples": self.lost_samples,
+        }
+
+    def report(self, name=""):
+        s = self.summary()
+        fs = "n/a" if s["effective_fs"] is None else f"{s['effective_fs']:.2f} Hz ({s['drift_ppm']:+.0f} ppm)"
+        print(f"{name}: {s['samples']} samples in {s['blocks']} blocks, effective fs {fs}, "
+              f"jitter {s['jitter_ms']:.1f} ms, max interval {s['max_interval_ms']:.1f} ms, "
+              f"{s['gaps']} gaps, {s['lost_samples']} lost samples")
+
+    def save(self, recording):
+        """Writes the summary next to a recording (see stats_path)."""
+        with open(stats_path(recording), "w") as f:
+            json.dump(self.summary(), f, indent=2)
@@ -0,0 +1,190 @@
+# figureRender.py
+#   • rasterizes the result figures to PNG in worker processes, off the analysis and GUI threads
+#   • a figure is described by a FigureSpec (a plot function and its data), so only data goes to the workers
+#   • PNG bytes are cached by a hash of the spec; the patient workbook and the GUI pages show the same bytes
+#_______________________________________________________________________________#
+
+import atexit
+import hashlib
+import io
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+# Resolution of every rendered figure
+PNG_DPI = 100
+# Worker processes rendering figures (0: render in the calling process)
+RENDER_WORKERS = min(4, os.cpu_count() or 1)
+# Rendered figures kept in memory
+CACHE_SIZE = 64
+
+# A figure to render.
+#   plot   : module level function returning a matplotlib Figure (it is pickled by reference)
+#   args   : its positional arguments (numbers, strings, arrays, dicts and lists of them)
+#   kwargs : its keyword arguments
+FigureSpec = namedtuple("FigureSpec", ["plot", "args", "kwargs"], defaults=((), {}))
+
+
+def figure_spec(plot, *args, **kwargs):
+    """FigureSpec of plot(*args, **kwargs)."""
+    return FigureSpec(plot, args, kwargs)
+
+
+def _hash_value(h, value):
+    if isinstance(value, np.ndarray):
+        h.update(f"nd{value.dtype.str}{value.shape}".encode())
+        h.update(np.ascontiguousarray(value).data)
+    elif isinstance(value, dict):
+        h.update(b"{")
+        for k in sorted(value, key=str):
+            _hash_value(h, k)
+            _hash_value(h, value[k])
+        h.update(b"}")
+    elif isinstance(value, (list, tuple)):
+        h.update(b"[")
+        for v in value:
+            _hash_value(h, v)
+        h.update(b"]")
+    else:
+        h.update(f"{type(value).__name__}:{value!r};".encode())
+
+
+def spec_key(spec, dpi=PNG_DPI):
+    """Content hash of a figure spec: same plot function, same data, same key."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{spec.plot.__module__}.{spec.plot.__qualname__}@{dpi}".encode())
+    _hash_value(h, spec.args)
+    _hash_value(h, spec.kwargs)
+    return h.hexdigest()
+
+
+def build_figure(spec):
+    """The matplotlib Figure of a spec, built in this process (e.g. for an interactive view)."""
+    return spec.plot(*spec.args, **spec.kwargs)
+
+
+def render_png(spec, dpi=PNG_DPI):
+    """Builds the figure of a spec and returns it as PNG bytes (runs in a worker)."""
+    fig = build_figure(spec)
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=dpi, bbox_inches='tight')
+    # figures made through pyplot stay registered until closed
+    import matplotlib.pyplot as plt
+    plt.close(fig)
+    return buf.getvalue()
+
+
+def _warm_up():
+    # import the plotting stack once per worker before the first real figure arrives
+    from matplotlib.backends.backend_agg import FigureCanvasAgg # noqa: F401
+    return os.getpid()
+
+
+class FigureRenderer:
+    """
+    Renders figure specs to PNG in a process pool and caches the bytes.
+
+    submit() starts rendering and returns straight away, png() waits for the
+    bytes. A spec that was rendered before (same plot, same data) is not
+    rendered again.
+
+        renderer = get_renderer()
+        renderer.submit_all(specs)        # while the analysis goes on
+        png = renderer.png(specs[0])      # when the workbook is written
+
+    Attributes:
+        workers (int): Worker processes; 0 renders in the calling process.
+    """
+
+    def __init__(self, workers=RENDER_WORKERS, cache_size=CACHE_SIZE):
+        self.workers = workers
+        self.cache_size = cache_size
+        self._cache = OrderedDict()   # key -> PNG bytes
+        self._pending = {}            # key -> Future
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None and self.workers > 0:
+            # spawn, not fork: the GUI process runs Tk and other threads
+            self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def start(self):
+        """Starts the worker processes ahead of the first figure (no-op without workers)."""
+        with self._lock:
+            pool = self._get_pool()
+            if pool is not None:
+                for _ in range(self.workers):
+                    pool.submit(_warm_up)
+
+    def submit(self, spec):
+        """Starts rendering a spec unless it is cached or already rendering; returns its key."""
+        key = spec_key(spec)
+        with self._lock:
+            if key in self._cache or key in self._pending:
+                return key
+            pool = self._get_pool()
+            if pool is not None:
+                try:
+                    self._pending[key] = pool.submit(render_png, spec)
+                except BrokenProcessPool:
+                    self._pool = None
+        return key
+
+    def submit_all(self, specs):
+        for spec in specs:
+            if spec is not None:
+                self.submit(spec)
+
+    def png(self, spec):
+        """PNG bytes of a spec, rendering it now if it was not submitted."""
+        key = self.submit(spec)
+        with self._lock:
+            png = self._cache.get(key)
+            if png is not None:
+                self._cache.move_to_end(key)
+                return png
+            future = self._pending.get(key)
+
+        png = None
+        if future is not None:
+            try:
+                png = future.result()
+            except Exception as e:
+                # a worker died or could not unpickle the spec; render it here instead
+                print(f"Figure rendering in a worker failed ({e}), rendering locally")
+        if png is None:
+            png = render_png(spec)
+
+        with self._lock:
+            self._pending.pop(key, None)
+            self._cache[key] = png
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return png
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
+            self._pending.clear()
+
+
+_renderer = None
+
+
+def get_renderer():
+    """The renderer shared by the workbook export and the GUI pages of this process."""
+    global _renderer
+    if _renderer is None:
+        _renderer = FigureRenderer()
+        atexit.register(_renderer.close)
+    return _renderer
@@ -0,0 +1,191 @@
+# liveView.py
+#   • live signal display for the acquisition ring buffer
+#   • reads the newest window as one NumPy slice (no per-sample Python lists)
+#   • min/max decimation down to the axes pixel width
+#   • blitted redraws on a fixed-rate timer; only the lines are redrawn per frame
+#   • keeps frame time statistics and prints them when the view closes
+#_______________________________________________________________________________#
+
+import os
+import time
+
+import numpy as np
+import matplotlib.pyplot as plt
+
+from ringBuffer import CHANNEL_NAMES
+
+# Seconds of signal shown on screen
+VIEW_WINDOW_S = 3
+# Target redraw rate (frames per second)
+VIEW_FPS = 30
+# Headroom added around the data when the y limits are recomputed
+_Y_MARGIN = 0.1
+
+
+def minmax_decimate(block, n_bins):
+    """
+    Reduces a (n, channels) block to 2 * n_bins points per channel.
+
+    Each bin is replaced by its minimum and maximum, so peaks (QRS spikes,
+    EMG bursts) stay visible no matter how many samples fall on one pixel.
+
+    Args:
+        block (np.ndarray): Samples, shape (n, channels); n should be a
+                            multiple of the bin size.
+        n_bins (int): Number of bins (usually the axes width in pixels).
+
+    Returns:
+        tuple: (bin positions (2 * n_bins,) as sample offsets,
+                values (2 * n_bins, channels))
+    """
+    n = len(block)
+    if n <= 2 * n_bins:
+        return np.arange(n, dtype=np.float64), block
+
+    bin_size = n // n_bins
+    n = n_bins * bin_size
+    bins = block[:n].reshape(n_bins, bin_size, -1)
+
+    values = np.empty((2 * n_bins, bins.shape[2]), dtype=block.dtype)
+    values[0::2] = bins.min(axis=1)
+    values[1::2] = bins.max(axis=1)
+
+    # both points of a bin sit at its centre
+    positions = np.repeat(np.arange(n_bins) * bin_size + bin_size / 2, 2)
+    return positions, values
+
+
+class LiveView:
+    """
+    Matplotlib window showing the newest VIEW_WINDOW_S seconds of a RingBuffer.
+
+    The axes (ticks, labels, grid) are rendered once and cached as a
+    background; each frame restores that background and draws only the
+    signal lines. The y limits are recomputed (with a full redraw) only when
+    the signal leaves them or shrinks to a fraction of them.
+
+    Attributes:
+        frame_times (list[float]): Seconds spent in each frame update.
+    """
+
+    def __init__(self, buffer, fs, channel, duration=None, window_s=VIEW_WINDOW_S, fps=VIEW_FPS):
+        self.buffer = buffer
+        self.fs = fs
+        self.duration = duration
+        self.window = int(window_s * fs)
+        self.interval_ms = int(1000 / fps)
+        self.columns = [i for i, enabled in enumerate(channel) if enabled]
+        self.frame_times = []
+
+        self.fig, axs = plt.subplots(len(self.columns), squeeze=False)
+        self.axes = list(axs[:, 0])
+        self.lines = []
+        for ax, col in zip(self.axes, self.columns):
+            ax.set_xlim(-window_s, 0)
+            ax.set_ylabel(CHANNEL_NAMES[col])
+            # animated lines are left out of normal draws and only blitted
+            self.lines.append(ax.plot([], [], linewidth=1, animated=True)[0])
+        self.axes[-1].set_xlabel("Time (s)")
+
+        self._background = None
+        self._n_bins = 1
+        self._start_time = None
+
+        self.fig.canvas.mpl_connect("draw_event", self._on_draw)
+        self._timer = self.fig.canvas.new_timer(interval=self.interval_ms)
+        self._timer.add_callback(self._frame)
+
+    def run(self):
+        """Shows the window and blocks until it is closed or duration ran out."""
+        plt.tight_layout()
+        self._start_time = time.monotonic()
+        self._timer.start()
+        plt.show()
+        self._timer.stop()
+        self.report()
+
+    def _on_draw(self, event):
+        # full redraw (first show, resize, new y limits): recache the background
+        canvas = self.fig.canvas
+        self._background = canvas.copy_from_bbox(self.fig.bbox)
+        self._n_bins = max(1, int(self.axes[0].bbox.width))
+        self._draw_lines()
+
+    def _draw_lines(self):
+        for ax, line in zip(self.axes, self.lines):
+            ax.draw_artist(line)
+
+    def _frame(self):
+        if self.duration is not None and time.monotonic() - self._start_time >= self.duration:
+            self._timer.stop()
+            plt.close(self.fig)
+            return
+        if self._background is None:
+            return
+
+        t0 = time.perf_counter()
+
+        # align bins to absolute sample numbers so the envelope does not shimmer
+        bin_size = max(1, self.window // self._n_bins)
+        stop = self.buffer.count
+        stop -= stop % bin_size
+        start = max(stop - self._n_bins * bin_size, self.buffer.oldest())
+        start += -start % bin_size
+
+        block = self.buffer.read(start, stop)[:, self.columns]
+        positions, values = minmax_decimate(block, self._n_bins)
+        x = (positions + start - stop) / self.fs
+
+        rescale = False
+        for i, line in enumerate(self.lines):
+            line.set_data(x, values[:, i])
+            if len(values):
+                rescale |= self._update_ylim(self.axes[i], values[:, i])
+
+        canvas = self.fig.canvas
+        if rescale:
+            # tick labels changed, the cached background is stale
+            canvas.draw_idle()
+        else:
+            canvas.restore_region(self._background)
+            self._draw_lines()
+            canvas.blit(self.fig.bbox)
+        canvas.flush_events()
+
+        self.frame_times.append(time.perf_counter() - t0)
+
+    @staticmethod
+    def _update_ylim(ax, y):
+        lo, hi = float(y.min()), float(y.max())
+        pad = max(hi - lo, 1e-6) * _Y_MARGIN
+        bottom, top = ax.get_ylim()
+
+        # keep the limits while the signal fits and still fills a quarter of them
+        fits = lo >= bottom and hi <= top
+        if fits and (hi - lo + 2 * pad) > 0.25 * (top - bottom):
+            return False
+
+        ax.set_ylim(lo - pad, hi + pad)
+        return True
+
+    def report(self):
+        """Prints how long the frame updates took."""
+        if not self.frame_times:
+            return
+        times = np.asarray(self.frame_times) * 1000
+        print(f"Live view: {len(times)} frames, mean {times.mean():.1f} ms, "
+              f"p95 {np.percentile(times, 95):.1f} ms, max {times.max():.1f} ms "
+              f"(budget {self.interval_ms} ms)")
+
+
+def run_live_view(buffer, fs, channel, duration, **kwargs):
+    """
+    Entry point for the graphing process. Lowers the process priority so the
+    display never competes with acquisition for CPU.
+    """
+    if hasattr(os, "nice"):
+        try:
+            os.nice(5)
+        except OSError:
+            pass
+    LiveView(buffer, fs, channel, duration, **kwargs).run()
@@ -0,0 +1,281 @@
+# patientCatalog.py
+#   • SQLite index of every patient and session under Patient Records/
+#   • hands out session numbers (no listing of patient folders, no parsing of workbook names)
+#   • keeps each session's device, sample rate, channels, files and summary results, so history
+#     lookups and batch jobs do not open workbooks
+#   • patients recorded before the catalogue existed are indexed from their folder the first time they come back
+#
+# Tables:
+#   patients(name, age, contact, created)
+#   sessions(patient, number, created, device, sample_rate, channels, workbook, store, results)
+#     channels: mask of the recorded channels, e.g. "110" = EMG and ECG
+#     workbook/store: relative to the Patient Records folder
+#     results: JSON summary (per channel stats, % difference and flags; ECG classification)
+#
+# Index the sessions already on disk:
+#   python3 app/patientCatalog.py --rebuild
+#_______________________________________________________________________________#
+
+import argparse
+import datetime
+import json
+import os
+import re
+import sqlite3
+from contextlib import closing, contextmanager
+
+import numpy as np
+
+from sessionStore import store_path
+
+RECORDS_DIR = "Patient Records"
+CATALOG_PATH = os.path.join(RECORDS_DIR, "catalog.sqlite3")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS patients (
+    name        TEXT PRIMARY KEY,
+    age         TEXT,
+    contact     TEXT,
+    created     TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    id          INTEGER PRIMARY KEY,
+    patient     TEXT NOT NULL REFERENCES patients(name),
+    number      INTEGER NOT NULL,
+    created     TEXT NOT NULL,
+    device      TEXT,
+    sample_rate INTEGER,
+    channels    TEXT,
+    workbook    TEXT NOT NULL UNIQUE,
+    store       TEXT,
+    results     TEXT,
+    UNIQUE (patient, number)
+);
+CREATE INDEX IF NOT EXISTS sessions_created ON sessions(created);
+"""
+
+
+def _now():
+    return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def channel_mask(signals):
+    """'110' for [EMG, ECG] recorded and EDA not."""
+    return "".join("1" if s else "0" for s in signals)
+
+
+def _json_default(value):
+    # numpy numbers become numbers; figures, filters and arrays are left out
+    if isinstance(value, np.generic):
+        return value.item()
+    return None
+
+
+def summarize_results(analysis_results, ml_predictions=None):
+    """The part of procResult's results worth querying: stats, % difference and flags per channel."""
+    summary = {}
+    for channel, result in (analysis_results or {}).items():
+        result = result or {}
+        summary[channel] = {key: result.get(key) for key in ("baseline", "test", "diff", "flags")}
+    ecg = (ml_predictions or {}).get("ecg") or {}
+    if ecg:
+        summary["ml"] = {key: ecg.get(key) for key in ("classification", "confidence", "anomaly_count")}
+    return summary
+
+
+class PatientCatalog:
+    """
+    The catalogue of one Patient Records folder.
+
+        catalog = PatientCatalog()
+        number = catalog.new_session('x', age='30')      # -> Patient_x/x_<number>.xlsx
+        catalog.sessions('x')
+
+    Every call opens its own short connection, so the catalogue can be used
+    from the GUI, the acquisition threads and analysis worker processes.
+
+    Attributes:
+        path (str): The SQLite file.
+    """
+
+    def __init__(self, path=CATALOG_PATH):
+        self.path = path
+        self.records_dir = os.path.dirname(path) or "."
+        self._ready = False
+
+    @contextmanager
+    def _connect(self):
+        if not self._ready:
+            os.makedirs(self.records_dir, exist_ok=True)
+        with closing(sqlite3.connect(self.path, timeout=30, isolation_level=None)) as db:
+            db.row_factory = sqlite3.Row
+            if not self._ready:
+                db.execute("PRAGMA journal_mode=WAL")
+                db.executescript(_SCHEMA)
+                self._ready = True
+            yield db
+
+    def _relative(self, path):
+        # paths are kept relative to the records folder, so the folder can move
+        return os.path.relpath(os.path.abspath(path), os.path.abspath(self.records_dir)).replace(os.sep, "/")
+
+    def _absolute(self, path):
+        return os.path.join(self.records_dir, *path.split("/")) if path else None
+
+    # ── patients and session numbers ────────────────────────────────────────
+    def workbook_path(self, patient, number):
+        """Workbook of a session, e.g. 'Patient Records/Patient_x/x_4.xlsx'."""
+        return os.path.join(self.records_dir, f"Patient_{patient}", f"{patient}_{number}.xlsx")
+
+    def new_session(self, patient, age=None, contact=None):
+        """
+        Adds a session for a patient and returns its number (one more than the
+        patient's last session). Safe against two stations allocating at once.
+        A number whose workbook is already on disk (written by a station
+        without the catalogue) is indexed and skipped, so it is never
+        overwritten.
+
+        Args:
+            patient (str): Patient name (as used in the folder and file names).
+            age, contact (str): Patient details, updated when given.
+        """
+        with self._connect() as db:
+            self._index_folder(db, patient)
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                self._upsert_patient(db, patient, age, contact)
+                number = db.execute("SELECT COALESCE(MAX(number), 0) + 1 FROM sessions WHERE patient = ?",
+                                    (patient,)).fetchone()[0]
+                workbook = self.workbook_path(patient, number)
+                while os.path.exists(workbook) or os.path.exists(store_path(workbook)):
+                    self._add_existing(db, patient, number, workbook)
+                    number += 1
+                    workbook = self.workbook_path(patient, number)
+                db.execute("INSERT INTO sessions (patient, number, created, workbook, store) VALUES (?, ?, ?, ?, ?)",
+                           (patient, number, _now(), self._relative(workbook), self._relative(store_path(workbook))))
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        return number
+
+    def remove_session(self, patient, number):
+        """Takes back a number from new_session whose workbook could not be written."""
+        with self._connect() as db:
+            db.execute("DELETE FROM sessions WHERE patient = ? AND number = ? AND results IS NULL",
+                       (patient, number))
+
+    def _upsert_patient(self, db, patient, age=None, contact=None):
+        db.execute("INSERT INTO patients (name, age, contact, created) VALUES (?, ?, ?, ?) "
+                   "ON CONFLICT(name) DO UPDATE SET age = COALESCE(excluded.age, age), "
+                   "contact = COALESCE(excluded.contact, contact)",
+                   (patient, age or None, contact or None, _now()))
+
+    def _index_folder(self, db, patient):
+        # a patient seen for the first time may have sessions from before the catalogue
+        if db.execute("SELECT 1 FROM patients WHERE name = ?", (patient,)).fetchone():
+            return
+        folder = os.path.join(self.records_dir, f"Patient_{patient}")
+        if not os.path.isdir(folder):
+            return
+        pattern = re.compile(rf"^{re.escape(patient)}_(\d+)\.xlsx$")
+        db.execute("BEGIN IMMEDIATE")
+        self._upsert_patient(db, patient)
+        for file in os.listdir(folder):
+            match = pattern.match(file)
+            if match:
+                self._add_existing(db, patient, int(match.group(1)), os.path.join(folder, file))
+        db.execute("COMMIT")
+
+    def _add_existing(self, db, patient, number, workbook):
+        # a session found on disk, dated by its workbook (or store)
+        found = workbook if os.path.exists(workbook) else store_path(workbook)
+        created = datetime.datetime.fromtimestamp(os.path.getmtime(found)).strftime("%Y-%m-%d %H:%M:%S")
+        db.execute("INSERT OR IGNORE INTO sessions (patient, number, created, workbook, store) "
+                   "VALUES (?, ?, ?, ?, ?)",
+                   (patient, number, created, self._relative(workbook), self._relative(store_path(workbook))))
+
+    def rebuild(self):
+        """Indexes every patient folder not in the catalogue yet. Returns the number of sessions."""
+        with self._connect() as db:
+            for entry in sorted(os.listdir(self.records_dir)):
+                if entry.startswith("Patient_") and os.path.isdir(os.path.join(self.records_dir, entry)):
+                    self._index_folder(db, entry[len("Patient_"):])
+            return db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    # ── updates on save ─────────────────────────────────────────────────────
+    def record_recording(self, workbook, recording_info):
+        """Stores the recording settings of a session (save_recording_info)."""
+        with self._connect() as db:
+            db.execute("UPDATE sessions SET device = ?, sample_rate = ?, channels = ? WHERE workbook = ?",
+                       (recording_info.get("device_option"), recording_info.get("sample_rate"),
+                        channel_mask(recording_info.get("signals", [])), self._relative(workbook)))
+
+    def record_results(self, workbook, analysis_results, ml_predictions=None):
+        """Stores the summary of a session's analysis results."""
+        results = json.dumps(summarize_results(analysis_results, ml_predictions), default=_json_default)
+        with self._connect() as db:
+            db.execute("UPDATE sessions SET results = ? WHERE workbook = ?", (results, self._relative(workbook)))
+
+    # ── lookups ─────────────────────────────────────────────────────────────
+    def sessions(self, patient=None, device=None, since=None, with_results=None):
+        """
+        Sessions, oldest first, as dicts with workbook and store paths usable
+        from the working directory and results decoded.
+
+        Args:
+            patient (str): Only this patient's sessions.
+            device (str): Only sessions recorded with this device ('ESP32', 'BITalino').
+            since (str): Only sessions created at or after this 'YYYY-MM-DD[ HH:MM:SS]'.
+            with_results (bool): Only analyzed (True) or not analyzed (False) sessions.
+        """
+        where, args = [], []
+        if patient is not None:
+            where.append("patient = ?")
+            args.append(patient)
+        if device is not None:
+            where.append("device = ?")
+            args.append(device)
+        if since is not None:
+            where.append("created >= ?")
+            args.append(since)
+        if with_results is not None:
+            where.append("results IS NOT NULL" if with_results else "results IS NULL")
+
+        query = "SELECT * FROM sessions"
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY created, patient, number"
+
+        with self._connect() as db:
+            rows = db.execute(query, args).fetchall()
+
+        sessions = []
+        for row in rows:
+            session = dict(row)
+            session["workbook"] = self._absolute(session["workbook"])
+            session["store"] = self._absolute(session["store"])
+            session["results"] = json.loads(session["results"]) if session["results"] else None
+            sessions.append(session)
+        return sessions
+
+    def patients(self):
+        """Every patient, by name."""
+        with self._connect() as db:
+            return [dict(row) for row in db.execute("SELECT * FROM patients ORDER BY name")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Patient / session catalogue of the Patient Records folder.")
+    parser.add_argument("--catalog", default=CATALOG_PATH, help=f"catalogue file (default: {CATALOG_PATH})")
+    parser.add_argument("--rebuild", action="store_true", help="index the patient folders on disk")
+    parser.add_argument("--patient", help="list this patient's sessions")
+    args = parser.parse_args()
+
+    catalog = PatientCatalog(args.catalog)
+    if args.rebuild:
+        print(f"{catalog.rebuild()} sessions indexed")
+    for s in catalog.sessions(args.patient):
+        print(f"{s['patient']:<20} #{s['number']:<4} {s['created']}  {s['device'] or '-':<9} "
+              f"{s['sample_rate'] or '-':>5} Hz  channels {s['channels'] or '---'}  "
+              f"{'analyzed' if s['results'] else 'not analyzed'}")
@@ -9,6 +9,7 @@ import testSeq
 import openpyxl
 from openpyxl.styles import Alignment
 import datetime
+from patientCatalog import PatientCatalog
 
 pygame.init()
 pygame.mixer.init()
@@ -229,6 +230,8 @@ def save_input(name_entry, age_entry, contact_info_entry, label):
     print("DEBUG contact_info_entry:", contact_info_entry)
 
     if name:
+        catalog = PatientCatalog()
+        new_file = None # workbook of a newly numbered session until it is saved
         try:
             x = os.getcwd()
             directory = x.replace('\\', '/') 
@@ -242,18 +245,8 @@ def save_input(name_entry, age_entry, contact_info_entry, label):
             else:
                 print(f"Folder already exists for patient {name}")
 
-            patient_files = os.listdir(full_directory)
-            existing_numbers = []
-
-            for file in patient_files:
-                if file.endswith('.xlsx') and file.startswith(f"{name}_"):
-                    try:
-                        num = int(file.split('_')[-1].split('.')[0])  # Get the number part from the filename
-                        existing_numbers.append(num)
-                    except ValueError:
-                        continue
-
-            next_number = max(existing_numbers, default=0) + 1
+            # the catalogue hands out the session number (and records the session)
+            next_number = catalog.new_session(name, age, contact_info)
             filename = f"{name}_{next_number}.xlsx"
 
             filepath_full = os.path.join(full_directory, filename)
@@ -265,6 +258,7 @@ def save_input(name_entry, age_entry, contact_info_entry, label):
             else:
                 workbook = Workbook()
                 workbook.remove(workbook.active)
+                new_file = filepath_full
                 print(f"Returning patient: {returning_patient}")
 
             sheets = workbook.sheetnames
@@ -318,6 +312,7 @@ def save_input(name_entry, age_entry, contact_info_entry, label):
             sheet3.cell(row=1, column=3).font = openpyxl.styles.Font(bold=True)
 
             workbook.save(filepath_full)
+            new_file = None # saved: the session keeps its number
 
             if os.path.exists(filepath_full):
                 print(f"Workbook saved successfully at {filepath_full}")
@@ -326,6 +321,11 @@ def save_input(name_entry, age_entry, contact_info_entry, label):
 
             label.config(text="Information saved successfully!")
         except Exception as e:
+            if new_file is not None:
+                # the workbook was never saved: free the number again (and drop a partial file)
+                catalog.remove_session(name, next_number)
+                if os.path.exists(new_file):
+                    os.remove(new_file)
             print(f"An error occurred: {str(e)}")
             label.config(text=f"An error occurred: {str(e)}")
     else:
@@ -380,6 +380,11 @@ def save_recording_info(filepath, filename, recording_info):
 
     workbook.save(filepath + filename)
 
+    try:
+        PatientCatalog().record_recording(filepath + filename, recording_info)
+    except Exception as e:
+        print(f"Could not update the patient catalogue: {e}")
+
 
 # ------------------------------------------------BASELINE/TEST SEQUENCE FUNCTIONS-----------------------------------------------
 # starts the baseline recording thread
@@ -0,0 +1,181 @@
+# ringBuffer.py
+#   • preallocated shared-memory ring buffer for live acquisition
+#   • one producer (device thread) writes whole blocks of samples
+#   • any number of consumers (live graph process, savers) read NumPy views
+#   • replaces the multiprocessing.Manager().list() proxies used by testSeq.py
+#_______________________________________________________________________________#
+
+import numpy as np
+from multiprocessing import shared_memory
+
+# Channel (column) order used everywhere in the acquisition path
+EMG, ECG, EDA = 0, 1, 2
+CHANNEL_NAMES = ("EMG", "ECG", "EDA")
+
+# Bytes reserved at the front of the segment for the write index
+_HEADER_BYTES = 64
+
+
+class RingBuffer:
+    """
+    Fixed-size (capacity, n_channels) sample buffer living in shared memory.
+
+    The write index is a single int64 in the segment header holding the total
+    number of samples ever written. The producer copies a block into the data
+    area first and only then publishes the new index, so a consumer that reads
+    the index never sees samples that are not there yet.
+
+    The object pickles by segment name, so it can be passed straight to a
+    multiprocessing.Process and the child attaches to the same memory.
+
+    Attributes:
+        capacity (int): Number of samples (rows) the buffer holds.
+        n_channels (int): Number of columns per sample (EMG, ECG, EDA).
+        dtype (np.dtype): Sample data type.
+        name (str): Shared memory segment name.
+    """
+
+    def __init__(self, capacity, n_channels=3, dtype=np.float64, name=None):
+        if capacity <= 0:
+            raise ValueError("Capacity should be positive")
+
+        self.capacity = int(capacity)
+        self.n_channels = int(n_channels)
+        self.dtype = np.dtype(dtype)
+        self._owner = name is None
+
+        size = _HEADER_BYTES + self.capacity * self.n_channels * self.dtype.itemsize
+        if self._owner:
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self._shm = _attach(name)
+
+        self.name = self._shm.name
+        self._map_arrays()
+
+        if self._owner:
+            self._index[0] = 0
+
+    def _map_arrays(self):
+        buf = self._shm.buf
+        self._index = np.ndarray((1,), dtype=np.int64, buffer=buf, offset=0)
+        self._data = np.ndarray((self.capacity, self.n_channels), dtype=self.dtype,
+                                buffer=buf, offset=_HEADER_BYTES)
+
+    # ---------------------------------------------------------------------------
+    # Pickling (attach by name in child processes)
+    # ---------------------------------------------------------------------------
+    def __getstate__(self):
+        return {"name": self.name, "capacity": self.capacity,
+                "n_channels": self.n_channels, "dtype": self.dtype.str}
+
+    def __setstate__(self, state):
+        self.__init__(state["capacity"], state["n_channels"],
+                      np.dtype(state["dtype"]), name=state["name"])
+
+    # ---------------------------------------------------------------------------
+    # Producer side
+    # ---------------------------------------------------------------------------
+    def write(self, block):
+        """
+        Appends a block of samples. Accepts shape (n, n_channels) or a single
+        sample of shape (n_channels,). Oldest samples are overwritten once the
+        buffer wraps.
+        """
+        block = np.asarray(block, dtype=self.dtype)
+        if block.ndim == 1:
+            block = block.reshape(1, -1)
+
+        n = block.shape[0]
+        if n == 0:
+            return
+
+        # only the newest `capacity` samples can survive a single write
+        if n > self.capacity:
+            block = block[-self.capacity:]
+
+        total = int(self._index[0])
+        start = (total + n - block.shape[0]) % self.capacity
+        first = min(block.shape[0], self.capacity - start)
+
+        self._data[start:start + first] = block[:first]
+        if first < block.shape[0]:
+            self._data[:block.shape[0] - first] = block[first:]
+
+        # publish after the data is in place
+        self._index[0] = total + n
+
+    # ---------------------------------------------------------------------------
+    # Consumer side
+    # ---------------------------------------------------------------------------
+    def __len__(self):
+        """Total number of samples written so far."""
+        return int(self._index[0])
+
+    @property
+    def count(self):
+        return int(self._index[0])
+
+    def oldest(self):
+        """Absolute index of the oldest sample still held in the buffer."""
+        return max(0, self.count - self.capacity)
+
+    def read(self, start, stop=None):
+        """
+        Returns samples [start, stop) by absolute sample index.
+
+        A view into shared memory is returned when the range does not wrap,
+        otherwise a copy of the two pieces. Indices outside what is currently
+        held are clipped.
+        """
+        total = self.count
+        stop = total if stop is None else min(int(stop), total)
+        start = max(int(start), total - self.capacity, 0)
+        if stop <= start:
+            return self._data[:0]
+
+        a = start % self.capacity
+        b = a + (stop - start)
+        if b <= self.capacity:
+            return self._data[a:b]
+        return np.concatenate((self._data[a:], self._data[:b - self.capacity]))
+
+    def latest(self, n):
+        """Returns the newest n samples (or fewer if not yet written)."""
+        total = self.count
+        return self.read(total - int(n), total)
+
+    def to_array(self):
+        """Returns a private copy of every sample currently held, oldest first."""
+        return np.array(self.read(self.oldest()), copy=True)
+
+    # ---------------------------------------------------------------------------
+    # Lifetime
+    # ---------------------------------------------------------------------------
+    def close(self):
+        """Detaches from the segment; the creator also frees it."""
+        self._index = None
+        self._data = None
+        try:
+            self._shm.close()
+        finally:
+            if self._owner:
+                try:
+                    self._shm.unlink()
+                except FileNotFoundError:
+                    pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _attach(name):
+    # Python 3.13+ lets consumers skip the resource tracker, which otherwise
+    # may unlink the segment when a child process exits
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
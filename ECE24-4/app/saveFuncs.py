@@ -4,23 +4,121 @@
 #   and statistical analyses to an Excel file using OpenPyXL.
 #
 # Functions:
+#   - WorkbookReport: Opens the patient workbook once, stages every sheet below, saves once
 #   - save_graphs_to_excel(): Saves general statistics plots
 #   - save_ml_graphs_to_excel(): Saves machine learning signal plots
 #   - save_ml_results_to_excel(): Saves ML classification results and features
 #   - save_stats_results_to_excel(): Saves statistical summaries
+#   - write_data_sheet(): Streams a raw signal sheet straight into the .xlsx file
 #
 # Dependencies:
-#   openpyxl, io, os, matplotlib (for figures)
+#   openpyxl, io, os, re, zipfile, numpy, matplotlib (for figures), figureRender
 # ---------------------------------------------------------------------------------------
 
 import openpyxl
 from openpyxl import Workbook, load_workbook
 from openpyxl.drawing.image import Image
 from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
 import io
+import posixpath
+import re
+import shutil
+import tempfile
+import zipfile
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
 
 import os
 
+import numpy as np
+
+from figureRender import PNG_DPI, FigureSpec, get_renderer
+
+
+def _open_workbook(excel_file):
+    # check if workbook exists (if so, open it, or create a new one)
+    if os.path.exists(excel_file):
+        return load_workbook(excel_file)
+    wb = Workbook()
+    wb.remove(wb.active)
+    return wb
+
+
+def _clear_sheet(wb, title):
+    # Create the tab/sheet or clear out the old one (rows and pictures)
+    if title not in wb.sheetnames:
+        return wb.create_sheet(title=title)
+    ws = wb[title]
+    ws.delete_rows(1, ws.max_row)
+    ws._images = []
+    return ws
+
+
+class WorkbookReport:
+    """
+    Writes all the result sheets of a session into the patient workbook with
+    a single load and a single save.
+
+    The workbook already holds the full Baseline Data / Test Data sheets, so
+    loading and saving it is the expensive part; every add_* call only stages
+    a sheet in memory. Figures are rendered to PNG in memory, and a figure
+    used on two sheets is rendered once. Figure specs (figureRender) come
+    from the shared renderer, which usually has them ready already.
+
+        with WorkbookReport(excel_file) as report:
+            report.add_graphs(graphs)
+            report.add_stats_results(analysis_results)
+        # saved here (not saved if the block raised)
+    """
+
+    def __init__(self, excel_file):
+        self.excel_file = excel_file
+        self.wb = _open_workbook(excel_file)
+        self._png_cache = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.save()
+
+    def save(self):
+        self.wb.save(self.excel_file)
+
+    def image(self, fig, width=None, height=None):
+        """
+        Returns an openpyxl Image of a matplotlib figure or a figureRender
+        FigureSpec (PNG rendered once per figure).
+        """
+        if isinstance(fig, FigureSpec):
+            png = (fig, get_renderer().png(fig))
+        else:
+            png = self._png_cache.get(id(fig))
+        if png is None:
+            buf = io.BytesIO()
+            fig.savefig(buf, format='png', dpi=PNG_DPI, bbox_inches='tight')
+            png = self._png_cache[id(fig)] = (fig, buf.getvalue()) # keep fig so its id is not reused
+        img = Image(io.BytesIO(png[1]))
+        if width is not None:
+            img.width = width
+            img.height = height
+        return img
+
+    def add_graphs(self, graphs_dict):
+        _write_graphs(self, graphs_dict)
+
+    def add_ml_graphs(self, graphs_dict):
+        _write_ml_graphs(self, graphs_dict)
+
+    def add_ml_results(self, ml_prediction, ml_features):
+        _write_ml_results(self, ml_prediction, ml_features)
+
+    def add_stats_results(self, stats_data):
+        _write_stats_results(self, stats_data)
+
+
 # Saves the graphs to the users excel file
 def save_graphs_to_excel(excel_file, graphs_dict):
     """
@@ -29,27 +127,18 @@ def save_graphs_to_excel(excel_file, graphs_dict):
     Args:
         excel_file (str): Path to the Excel file.
         graphs_dict (dict): Dictionary where keys are section names (e.g., 'ECG')
-                            and values are lists of matplotlib figures.
+                            and values are lists of matplotlib figures (or figureRender specs).
 
     Returns:
         None
     """
+    with WorkbookReport(excel_file) as report:
+        report.add_graphs(graphs_dict)
 
-    temp_files = []
-    
-    # check if workbook exists (if so, open it, or create a new one)
-    if os.path.exists(excel_file):
-        wb = load_workbook(excel_file)
-    else:
-        wb = Workbook()
-        wb.remove(wb.active)
 
+def _write_graphs(report, graphs_dict):
     # Create or refresh "Stats Graphs" tab/sheet within the workbook
-    if "Stats Graphs" not in wb.sheetnames:
-        ws = wb.create_sheet(title="Stats Graphs")
-    else:
-        ws = wb["Stats Graphs"]
-        ws.delete_rows(1, ws.max_row)
+    ws = _clear_sheet(report.wb, "Stats Graphs")
 
     # layout parameters
     img_width = 600
@@ -71,16 +160,8 @@ def save_graphs_to_excel(excel_file, graphs_dict):
         for i, fig in enumerate(fig_list, 1):
             if fig is None:  
                 continue
-            
-            buf = io.BytesIO()
-            fig.savefig(buf, format='png', dpi=100, bbox_inches='tight')
-            buf.seek(0)
 
-            img = Image(buf)
-            
-            img.width = img_width
-            img.height = img_height
-            ws.add_image(img, f'A{current_row}')
+            ws.add_image(report.image(fig, img_width, img_height), f'A{current_row}')
             
             ws.row_dimensions[current_row].height = row_height + 5
             current_row += 5
@@ -89,7 +170,6 @@ def save_graphs_to_excel(excel_file, graphs_dict):
         current_row += 2
 
     ws.column_dimensions['A'].width = img_width / 7
-    wb.save(excel_file)
 
 # Saves the ml graphs to the user's excel file
 def save_ml_graphs_to_excel(excel_file, graphs_dict):
@@ -99,27 +179,18 @@ def save_ml_graphs_to_excel(excel_file, graphs_dict):
     Args:
         excel_file (str): Path to Excel file.
         graphs_dict (dict): Nested dictionary structured as:
-                            { category_name: { data_type: matplotlib.figure } }
+                            { category_name: { data_type: matplotlib.figure or figure spec } }
 
     Returns:
         None
     """
+    with WorkbookReport(excel_file) as report:
+        report.add_ml_graphs(graphs_dict)
 
-    temp_files = []
-    
-    # check if workbook exists (if so, open it, or create a new one)
-    if os.path.exists(excel_file):
-        wb = load_workbook(excel_file)
-    else:
-        wb = Workbook()
-        wb.remove(wb.active)
 
+def _write_ml_graphs(report, graphs_dict):
     # Create or clear out the target worksheet
-    if "Signal Graphs" not in wb.sheetnames:
-        ws = wb.create_sheet(title="Signal Graphs")
-    else:
-        ws = wb["Signal Graphs"]
-        ws.delete_rows(1, ws.max_row)
+    ws = _clear_sheet(report.wb, "Signal Graphs")
 
     # formatting
     img_width = 1300
@@ -141,29 +212,13 @@ def save_ml_graphs_to_excel(excel_file, graphs_dict):
             current_row += 1
 
             # make png and add to sheet
-            buf = io.BytesIO()
-            fig.savefig(buf, format='png', dpi=100, bbox_inches='tight')
-            buf.seek(0)
-
-            img = Image(buf)
-            img.width = img_width
-            img.height = img_height
-            ws.add_image(img, f'A{current_row}')
+            ws.add_image(report.image(fig, img_width, img_height), f'A{current_row}')
             
             ws.row_dimensions[current_row].height = row_height + 5
             current_row += 5
         current_row += 2
 
     ws.column_dimensions['A'].width = img_width / 7
-    wb.save(excel_file)
-
-    # clear out temp files if any
-    for temp_file in temp_files:
-        try:
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
-        except Exception as e:
-            print(f"Error deleting temp file {temp_file}: {str(e)}")
 
 # Saves the ml results to the excel file
 def save_ml_results_to_excel(excel_file, ml_prediction, ml_features):
@@ -174,26 +229,20 @@ def save_ml_results_to_excel(excel_file, ml_prediction, ml_features):
     Args:
         excel_file (str): Path to Excel file.
         ml_prediction (dict): Dictionary containing model outputs, e.g.
-                              {'ecg': {'classification': int, 'confidence': float, 'fig': matplotlib.figure}}
+                              {'ecg': {'classification': int, 'confidence': float, 'fig': matplotlib.figure or figure spec}}
         ml_features (dict): Feature data structured as:
                             { signal_type: {'baseline_data': {}, 'test_data': {}, 'percent_difference': {}} }
 
     Returns:
         None
     """
-    # check if workbook exists (if so, open it, or create a new one)
-    if os.path.exists(excel_file):
-        wb = load_workbook(excel_file)
-    else:
-        wb = Workbook()
-        wb.remove(wb.active)
+    with WorkbookReport(excel_file) as report:
+        report.add_ml_results(ml_prediction, ml_features)
+
 
+def _write_ml_results(report, ml_prediction, ml_features):
     # make a sheet / tab if it doesnt exists or clear it out
-    if "ML Results" not in wb.sheetnames:
-        ws = wb.create_sheet(title="ML Results")
-    else:
-        ws = wb["ML Results"]
-        ws.delete_rows(1, ws.max_row)
+    ws = _clear_sheet(report.wb, "ML Results")
 
     # get classification and confidence for ECG data
     classification = ml_prediction['ecg'].get('classification', 'N/A')
@@ -205,7 +254,7 @@ def save_ml_results_to_excel(excel_file, ml_prediction, ml_features):
 
     
     # Write classification and confidence
-    sheet = wb['ML Results']
+    sheet = ws
     sheet.cell(row=1, column=1).value = 'ML Classification:'
     sheet.cell(row=1, column=1).font = openpyxl.styles.Font(bold=True)
     sheet.cell(row=1, column=2).value = classification
@@ -257,22 +306,10 @@ def save_ml_results_to_excel(excel_file, ml_prediction, ml_features):
                 sheet.cell(row=curr_row, column=3).value = test_value
                 sheet.cell(row=curr_row, column=4).value = percent_diff
 
-        # Save SHAP waterfall plot if provided
-        temp_img = f"shap_waterfall.png"
-
+        # Add the result plot if provided (rendered in memory, shared with the Signal Graphs sheet)
         fig = ml_prediction['ecg'].get('fig', None)
         if fig is not None:
-            fig.savefig(temp_img, dpi=100, bbox_inches='tight')
-
-            img = Image(temp_img)
-
-            ws.add_image(img, f'A{curr_row+3}') 
-    
-    wb.save(excel_file)
-
-    # Remove temporary image
-    if os.path.exists(temp_img):
-            os.remove(temp_img)
+            ws.add_image(report.image(fig), f'A{curr_row+3}') 
 
 
 # Saves the stat analysis to excel file
@@ -280,20 +317,12 @@ def save_stats_results_to_excel(excel_file, stats_data):
     """
     Saves statistical analysis data to an Excel sheet titled "Stats Results".
     """
+    with WorkbookReport(excel_file) as report:
+        report.add_stats_results(stats_data)
 
-    if os.path.exists(excel_file):
-        wb = load_workbook(excel_file)
-    else:
-        wb = Workbook()
-        wb.remove(wb.active)
 
-    if "Stats Results" not in wb.sheetnames:
-        ws = wb.create_sheet(title="Stats Results")
-    else:
-        ws = wb["Stats Results"]
-        ws.delete_rows(1, ws.max_row)
-
-    sheet = wb["Stats Results"]
+def _write_stats_results(report, stats_data):
+    sheet = _clear_sheet(report.wb, "Stats Results")
 
     sheet.column_dimensions['A'].width = 20
     sheet.column_dimensions['B'].width = 20
@@ -349,4 +378,185 @@ def save_stats_results_to_excel(excel_file, stats_data):
 
             curr_row += 2
 
-    wb.save(excel_file)
+
+# ------------------------------------RAW DATA SHEETS---------------------------------------
+
+_NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_NS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_NS_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+# Rows turned into XML per write (bounds the memory used for the text)
+_ROWS_PER_WRITE = 20000
+
+
+def _sheet_part(zf, sheet_name):
+    # path inside the .xlsx zip of the worksheet called sheet_name
+    workbook = ET.fromstring(zf.read("xl/workbook.xml"))
+    rel_id = None
+    for sheet in workbook.iter(f"{{{_NS_MAIN}}}sheet"):
+        if sheet.get("name") == sheet_name:
+            rel_id = sheet.get(f"{{{_NS_REL}}}id")
+    if rel_id is None:
+        raise KeyError(f"Worksheet {sheet_name} does not exist.")
+
+    rels = ET.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+    for rel in rels.iter(f"{{{_NS_PKG_REL}}}Relationship"):
+        if rel.get("Id") == rel_id:
+            target = rel.get("Target")
+            return target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target))
+    raise KeyError(f"Worksheet {sheet_name} has no part in the workbook.")
+
+
+def _split_sheet(xml, names, note=None):
+    """
+    Cuts a worksheet part around its rows: everything before the rows
+    (root element, sheetPr, sheetViews, cols, ...; the dimension updated
+    later), the header row and everything after them (page setup, drawings,
+    ...). Existing header cells of the data columns are kept as they are
+    (their styles stay valid); a data column without a header cell, or with
+    an empty one, gets its name. The note goes one empty column after the
+    data.
+
+    Returns:
+        tuple: (head, header row, tail) as str.
+    """
+    xml = xml.decode("utf-8")
+    start = xml.find("<sheetData")
+    if start < 0:
+        raise ValueError("Worksheet has no sheetData element")
+    open_end = xml.index(">", start) + 1
+    if xml[open_end - 2] == "/":
+        rows, tail = "", xml[open_end:]
+    else:
+        close = xml.index("</sheetData>", open_end)
+        rows, tail = xml[open_end:close], xml[close + len("</sheetData>"):]
+    head = xml[:start]
+
+    letters = [get_column_letter(j + 1) for j in range(len(names))]
+    first = re.match(r'\s*<row\b[^>]*\br="1"[^>]*?(?:/>|>(.*?)</row>)', rows, re.S)
+    kept = {}
+    if first:
+        for m in re.finditer(r'<c\b([^>]*?)\br="([A-Z]+)1"([^>]*?)(?:/>|>(.*?)</c>)', first.group(1) or "", re.S):
+            if m.group(2) not in letters:
+                continue
+            if m.group(4) and ("<v>" in m.group(4) or "<is>" in m.group(4)):
+                kept[m.group(2)] = m.group(0)
+            else:
+                # an empty (e.g. only styled) cell: keep its style, fill in the name
+                style = re.search(r'\bs="\d+"', m.group(1) + m.group(3))
+                kept[m.group(2)] = style.group(0) if style else ""
+
+    cells = ""
+    for letter, name in zip(letters, names):
+        cell = kept.get(letter, "")
+        if not cell.startswith("<c"):
+            style = f" {cell}" if cell else ""
+            cell = f'<c r="{letter}1"{style} t="inlineStr"><is><t>{escape(name)}</t></is></c>'
+        cells += cell
+
+    if note:
+        cells += f'<c r="{get_column_letter(len(names) + 2)}1" t="inlineStr"><is><t>{escape(note)}</t></is></c>'
+    return head, f'<row r="1">{cells}</row>', tail
+
+
+def block_mean(values, factor):
+    """
+    Averages consecutive blocks of `factor` samples (the last block may be
+    shorter). NaN samples are left out of their block's mean.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if factor <= 1 or len(values) == 0:
+        return values
+    n_blocks = -(-len(values) // factor)
+    padded = np.full(n_blocks * factor, np.nan)
+    padded[:len(values)] = values
+    blocks = padded.reshape(n_blocks, factor)
+    counts = np.count_nonzero(~np.isnan(blocks), axis=1)
+    sums = np.nansum(blocks, axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def _column_text(values, column, rows):
+    # "<c r="A2"><v>1.5</v></c>" per row, '' where there is no value (disabled channel / NaN)
+    text = np.full(len(rows), "", dtype=object)
+    if values is None:
+        return text
+    values = np.asarray(values, dtype=np.float64)
+    have = np.isfinite(values)
+    numbers = values[have].astype(str).astype(object)
+    text[have] = f'<c r="{column}' + rows[have] + '"><v>' + numbers + "</v></c>"
+    return text
+
+
+def write_data_sheet(excel_file, sheet_name, columns, names=("EMG", "ECG", "EDA"), decimate=1, note=None):
+    """
+    Replaces the rows of a raw signal sheet with the given columns.
+
+    The rows are generated straight from the arrays and swapped into the
+    sheet's part of the .xlsx zip; the workbook is never loaded into
+    openpyxl, so the cost grows only with the number of samples written.
+    Everything in the sheet but its rows (views, column widths, page setup)
+    and the existing header cells are kept. Other sheets are copied over
+    unchanged.
+
+    Args:
+        excel_file (str): Path to the patient workbook (must contain sheet_name).
+        sheet_name (str): e.g. 'Baseline Data'.
+        columns (list): 1-D arrays (None for a disabled channel), one per column.
+        names (tuple): Header names used if the sheet has no header row yet.
+        decimate (int): Store the mean of every `decimate` samples instead of every sample.
+        note (str): Written in the header row next to the data (e.g. where the full rate data is).
+
+    Returns:
+        None
+    """
+    if decimate > 1:
+        columns = [None if c is None else block_mean(c, decimate) for c in columns]
+
+    letters = [get_column_letter(j + 1) for j in range(len(columns))]
+    n = max((len(c) for c in columns if c is not None), default=0)
+
+    directory = os.path.dirname(os.path.abspath(excel_file))
+    with zipfile.ZipFile(excel_file) as zin:
+        part = _sheet_part(zin, sheet_name)
+        head, header, tail = _split_sheet(zin.read(part), names[:len(columns)], note)
+        last_col = get_column_letter(max(len(columns) + (2 if note else 0), 1))
+        dimension = f'<dimension ref="A1:{last_col}{n + 1}"/>'
+        if re.search(r"<dimension\b[^>]*/>", head):
+            head = re.sub(r"<dimension\b[^>]*/>", dimension, head, count=1)
+        else:
+            # dimension comes right after sheetPr (or first) in CT_Worksheet
+            head = re.sub(r"(<worksheet\b[^>]*>(?:\s*<sheetPr\b.*?(?:/>|</sheetPr>))?)", lambda m: m.group(1) + dimension,
+                          head, count=1, flags=re.S)
+
+        fd, temp_path = tempfile.mkstemp(suffix=".xlsx", dir=directory)
+        os.close(fd)
+        try:
+            # fast compression: the raw sheets dominate the file and are rewritten often
+            with zipfile.ZipFile(temp_path, "w", zipfile.ZIP_DEFLATED, compresslevel=1) as zout:
+                for item in zin.infolist():
+                    if item.filename != part:
+                        with zin.open(item) as src, zout.open(item.filename, "w") as dst:
+                            shutil.copyfileobj(src, dst, 1 << 20)
+                        continue
+
+                    with zout.open(part, "w") as dst:
+                        dst.write(f"{head}<sheetData>{header}".encode("utf-8"))
+
+                        for start in range(0, n, _ROWS_PER_WRITE):
+                            stop = min(start + _ROWS_PER_WRITE, n)
+                            rows = np.arange(start + 2, stop + 2).astype(str).astype(object)
+                            line = '<row r="' + rows + '">'
+                            for letter, values in zip(letters, columns):
+                                chunk = None if values is None or len(values) <= start else values[start:stop]
+                                text = _column_text(chunk, letter, rows[:0 if chunk is None else len(chunk)])
+                                line[:len(text)] = line[:len(text)] + text
+                            dst.write(("</row>".join(line.tolist()) + "</row>").encode("utf-8"))
+
+                        dst.write(f"</sheetData>{tail}".encode("utf-8"))
+            shutil.copymode(excel_file, temp_path)
+            os.replace(temp_path, excel_file)
+        except BaseException:
+            os.remove(temp_path)
+            raise
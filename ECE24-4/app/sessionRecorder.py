@@ -0,0 +1,142 @@
+# sessionRecorder.py
+#   • streams acquired samples to disk while a phase is running
+#   • one append-only file per phase: a JSON header line followed by .npy chunks
+#   • finishing a phase only flushes the last partial chunk
+#   • every completed chunk is already on disk, so a crash keeps the data up to it
+#   • timing statistics of the stream are saved next to it on close (acqStats)
+#
+# File layout:
+#   {"fs": 1000, "channels": ["EMG", "ECG", "EDA"], "device": "ESP32", "enabled": [...], ...}\n
+#   <npy chunk 0><npy chunk 1>...          each chunk is (<= chunk_size, 3)
+#
+# Columns of disabled channels hold NaN; the "enabled" mask in the header says which.
+#_______________________________________________________________________________#
+
+import json
+import os
+
+import numpy as np
+
+from acqStats import StreamStats
+from ringBuffer import CHANNEL_NAMES
+
+RECORDING_EXT = ".rec"
+
+
+def recording_path(excel_file, phase):
+    """
+    Recording file that belongs to a patient workbook, e.g.
+    'Patient Records/Patient_x/x_3.xlsx' -> 'Patient Records/Patient_x/x_3_baseline.rec'.
+    """
+    return os.path.splitext(excel_file)[0] + f"_{phase}{RECORDING_EXT}"
+
+
+class ChunkRecorder:
+    """
+    Acquisition subscriber that appends fixed-size chunks to a recording file.
+
+    Incoming blocks are copied into a preallocated staging array; whenever it
+    fills up the chunk is written with np.save and flushed, so memory use does
+    not grow with the length of the recording.
+
+    Attributes:
+        path (str): Output file.
+        header (dict): Metadata written as the first line of the file.
+        chunk_size (int): Samples per chunk.
+        samples_written (int): Samples accepted so far (including the staged ones).
+        stats (acqStats.StreamStats): Timing of the blocks received through __call__.
+    """
+
+    def __init__(self, path, fs, device, channels=CHANNEL_NAMES, chunk_size=None, **info):
+        self.path = path
+        self.chunk_size = int(chunk_size or fs)
+        self.header = {
+            "fs": fs,
+            "channels": list(channels),
+            "device": device,
+            "chunk_size": self.chunk_size,
+            **info,
+        }
+
+        self._stage = np.empty((self.chunk_size, len(channels)))
+        self._fill = 0
+        self.samples_written = 0
+        self.stats = StreamStats(fs)
+
+        self._file = open(path, "wb")
+        self._file.write((json.dumps(self.header) + "\n").encode("utf-8"))
+        self._file.flush()
+
+    def __call__(self, block):
+        """Subscriber entry point for acqEngine (accepts a Block)."""
+        self.stats(block)
+        self.write(block.samples)
+
+    def write(self, samples):
+        samples = np.asarray(samples)
+        self.samples_written += len(samples)
+
+        while len(samples):
+            take = min(self.chunk_size - self._fill, len(samples))
+            self._stage[self._fill:self._fill + take] = samples[:take]
+            self._fill += take
+            samples = samples[take:]
+
+            if self._fill == self.chunk_size:
+                self._flush_chunk()
+
+    def _flush_chunk(self):
+        if self._fill == 0:
+            return
+        np.save(self._file, self._stage[:self._fill], allow_pickle=False)
+        self._file.flush()
+        self._fill = 0
+
+    def close(self):
+        """Writes the last partial chunk, closes the file and saves the timing stats."""
+        if self._file.closed:
+            return
+        self._flush_chunk()
+        self._file.close()
+        if self.stats.blocks:
+            self.stats.save(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def read_header(path):
+    """Returns the JSON header of a recording."""
+    with open(path, "rb") as f:
+        return json.loads(f.readline().decode("utf-8"))
+
+
+def iter_chunks(path):
+    """
+    Yields (header, chunk) pairs. A chunk cut short by a crash is skipped.
+    """
+    with open(path, "rb") as f:
+        header = json.loads(f.readline().decode("utf-8"))
+        while True:
+            try:
+                chunk = np.load(f, allow_pickle=False)
+            except (ValueError, EOFError, OSError):
+                break
+            yield header, chunk
+
+
+def load_recording(path):
+    """
+    Reads a whole recording.
+
+    Returns:
+        tuple: (header dict, np.ndarray of shape (n, n_channels))
+    """
+    header = read_header(path)
+    chunks = [chunk for _, chunk in iter_chunks(path)]
+    if not chunks:
+        return header, np.empty((0, len(header["channels"])))
+    return header, np.concatenate(chunks)
@@ -0,0 +1,260 @@
+# sessionStore.py
+#   • compact store of one session next to the patient workbook: <id>_<N>.session/
+#   • each phase's raw channels as a channel-major .npy (one contiguous row per channel), memory-mapped on load
+#   • recording info, per-phase metadata and analysis results in meta.json
+#   • the primary record of a live session; the workbook's raw data sheets are an export of it
+#   • sessions recorded before the store are copied in from their workbook (write_phase_from_workbook)
+#
+# Layout:
+#   <id>_<N>.session/meta.json       {"recording_info": {...}, "phases": {"baseline": {"fs", "samples", ...}}, "results": {...}}
+#   <id>_<N>.session/baseline.npy    (3, n) float64, rows EMG, ECG, EDA (disabled channels are NaN)
+#   <id>_<N>.session/test.npy
+#
+# Export the raw sheets of a session to its workbook on demand:
+#   python3 app/sessionStore.py "Patient Records/Patient_x/x_3.xlsx"
+#_______________________________________________________________________________#
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+from acqStats import load_stats
+from ringBuffer import CHANNEL_NAMES
+
+STORE_EXT = ".session"
+
+# Workbook sheet holding each phase's raw data
+PHASE_SHEETS = {"baseline": "Baseline Data", "test": "Test Data"}
+
+# Labels of the workbook's Recording Info sheet (recFuncs.save_recording_info) -> recording_info keys
+RECORDING_INFO_LABELS = {
+    "Audio Option:": "audio_option",
+    "Duration (sec):": "duration",
+    "Sample Rate (Hz):": "sample_rate",
+    "Decibel Increment (dB):": "di_option",
+    "Time Increment (sec):": "time_option",
+    "Device:": "device_option",
+}
+SIGNAL_LABELS = ("EMG Recorded:", "ECG Recorded:", "EDA Recorded:")
+
+
+def store_path(excel_file):
+    """
+    Store that belongs to a patient workbook, e.g.
+    'Patient Records/Patient_x/x_3.xlsx' -> 'Patient Records/Patient_x/x_3.session'.
+    """
+    return os.path.splitext(excel_file)[0] + STORE_EXT
+
+
+_SKIP = object()
+
+
+def _jsonable(value):
+    # numbers, strings and containers of them; anything else (figures, filters, arrays) is left out
+    if isinstance(value, dict):
+        out = {}
+        for k, v in value.items():
+            v = _jsonable(v)
+            if v is not _SKIP:
+                out[str(k)] = v
+        return out
+    if type(value) in (list, tuple): # not namedtuples such as figure specs
+        items = [_jsonable(v) for v in value]
+        return [v for v in items if v is not _SKIP]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or isinstance(value, (bool, int, float, str)):
+        if isinstance(value, float) and not np.isfinite(value):
+            return None
+        return value
+    return _SKIP
+
+
+def read_recording_info(excel_file):
+    """
+    Recording info of a workbook's Recording Info sheet, with the keys of
+    recFuncs.save_recording_info ('sample_rate', 'signals', ...). Empty dict
+    if the workbook has no such sheet.
+    """
+    from openpyxl import load_workbook
+
+    wb = load_workbook(excel_file, read_only=True)
+    try:
+        if "Recording Info" not in wb.sheetnames:
+            return {}
+        cells = {label: value for label, value, *_ in
+                 wb["Recording Info"].iter_rows(max_col=2, values_only=True) if label}
+    finally:
+        wb.close()
+
+    info = {key: cells[label] for label, key in RECORDING_INFO_LABELS.items() if label in cells}
+    if all(label in cells for label in SIGNAL_LABELS):
+        # the sheet may hold bools or their text
+        info["signals"] = [str(cells[label]).strip().lower() in ("true", "1") for label in SIGNAL_LABELS]
+    return info
+
+
+class SessionStore:
+    """
+    Reads and writes the store of one session.
+
+        store = SessionStore(store_path(excel_file))
+        store.write_phase_from_recording('baseline', rec_path)
+        ecg = store.channel('baseline', 'ECG')   # memory-mapped, no copy
+
+    Attributes:
+        path (str): Store directory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._meta = None
+
+    @classmethod
+    def for_workbook(cls, excel_file):
+        return cls(store_path(excel_file))
+
+    def exists(self):
+        return os.path.exists(os.path.join(self.path, "meta.json"))
+
+    # ── metadata ────────────────────────────────────────────────────────────
+    @property
+    def meta(self):
+        if self._meta is None:
+            meta_file = os.path.join(self.path, "meta.json")
+            if os.path.exists(meta_file):
+                with open(meta_file) as f:
+                    self._meta = json.load(f)
+            else:
+                self._meta = {"phases": {}}
+        return self._meta
+
+    def update_meta(self, **fields):
+        """Merges top level fields into meta.json."""
+        meta = self.meta
+        meta.update(_jsonable(fields))
+        self._save_meta()
+
+    def _save_meta(self):
+        os.makedirs(self.path, exist_ok=True)
+        meta_file = os.path.join(self.path, "meta.json")
+        with open(meta_file + ".tmp", "w") as f:
+            json.dump(self.meta, f, indent=2)
+        os.replace(meta_file + ".tmp", meta_file)
+
+    def phases(self):
+        """Phases stored so far."""
+        return [p for p in self.meta.get("phases", {}) if os.path.exists(self._phase_file(p))]
+
+    def phase_info(self, phase):
+        return self.meta["phases"][phase]
+
+    def fs(self, phase="baseline"):
+        return self.phase_info(phase)["fs"]
+
+    # ── raw data ────────────────────────────────────────────────────────────
+    def _phase_file(self, phase):
+        return os.path.join(self.path, f"{phase}.npy")
+
+    def write_phase(self, phase, data, fs, enabled=None, units=None, timing=None):
+        """
+        Stores a phase.
+
+        Args:
+            phase (str): 'baseline' or 'test'.
+            data (np.ndarray): (n, 3) samples in [EMG, ECG, EDA] column order.
+            fs (float): Sampling rate.
+            enabled (list[bool]): Channels recorded.
+            units (str or list[str]): Physical units of the channels.
+            timing (dict): acqStats summary of the phase, if measured.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        columns = np.ascontiguousarray(np.asarray(data, dtype=np.float64).T)
+
+        target = self._phase_file(phase)
+        with open(target + ".tmp", "wb") as f:
+            np.save(f, columns, allow_pickle=False)
+        os.replace(target + ".tmp", target)
+
+        self.meta.setdefault("phases", {})[phase] = _jsonable({
+            "fs": fs,
+            "samples": columns.shape[1],
+            "channels": list(CHANNEL_NAMES),
+            "enabled": list(enabled) if enabled is not None else [True] * len(CHANNEL_NAMES),
+            "units": units,
+            "timing": timing,
+        })
+        self._save_meta()
+
+    def write_phase_from_recording(self, phase, rec_path):
+        """Stores a phase from its sessionRecorder .rec file (and timing sidecar)."""
+        from sessionRecorder import load_recording
+
+        header, data = load_recording(rec_path)
+        self.write_phase(phase, data, header["fs"], header.get("enabled"),
+                         header.get("units"), load_stats(rec_path))
+
+    def write_phase_from_workbook(self, phase, excel_file, fs, enabled=None):
+        """
+        Stores a phase from the raw data sheet of a workbook written before the
+        store existed (one row per sample, columns EMG, ECG, EDA; empty cells
+        of a disabled channel become NaN).
+        """
+        from openpyxl import load_workbook
+
+        wb = load_workbook(excel_file, read_only=True)
+        try:
+            rows = wb[PHASE_SHEETS[phase]].iter_rows(min_row=2, max_col=len(CHANNEL_NAMES), values_only=True)
+            data = np.array([[np.nan if v is None else v for v in row] for row in rows if any(v is not None for v in row)],
+                            dtype=np.float64).reshape(-1, len(CHANNEL_NAMES))
+        finally:
+            wb.close()
+        self.write_phase(phase, data, fs, enabled)
+
+    def load_phase(self, phase, mmap=True):
+        """(3, n) array of a phase, rows EMG, ECG, EDA; memory-mapped read-only by default."""
+        return np.load(self._phase_file(phase), mmap_mode="r" if mmap else None, allow_pickle=False)
+
+    def channel(self, phase, name, mmap=True):
+        """One channel of a phase as a 1-D array, or None if it was not recorded."""
+        col = list(CHANNEL_NAMES).index(name)
+        if not self.phase_info(phase)["enabled"][col]:
+            return None
+        return self.load_phase(phase, mmap)[col]
+
+    # ── analysis results ────────────────────────────────────────────────────
+    def write_results(self, analysis_results, ml_predictions=None):
+        """Stores the numeric analysis results (figures and filter objects are left out)."""
+        self.update_meta(results={"stats": analysis_results, "ml": ml_predictions or {}})
+
+
+def export_excel(excel_file, phases=None, decimate=1):
+    """
+    Writes the raw data sheets of a workbook from its session store.
+
+    Args:
+        excel_file (str): Patient workbook (with Baseline Data / Test Data sheets).
+        phases (list[str]): Phases to export; defaults to every stored phase.
+        decimate (int): Samples averaged into each row (see saveFuncs.write_data_sheet).
+    """
+    import saveFuncs as sv
+
+    store = SessionStore.for_workbook(excel_file)
+    for phase in phases or store.phases():
+        columns = [store.channel(phase, name) for name in CHANNEL_NAMES]
+        note = None
+        if decimate > 1:
+            note = f"Mean of every {decimate} samples; full rate data in {os.path.basename(store.path)}"
+        sv.write_data_sheet(excel_file, PHASE_SHEETS[phase], columns, CHANNEL_NAMES, decimate, note)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a session store's raw data to its patient workbook.")
+    parser.add_argument("workbook", help="patient workbook, e.g. 'Patient Records/Patient_x/x_3.xlsx'")
+    parser.add_argument("--phase", choices=list(PHASE_SHEETS), action="append",
+                        help="phase to export (repeatable, default: all stored phases)")
+    parser.add_argument("--decimate", type=int, default=1, help="samples averaged into each row")
+    args = parser.parse_args()
+    export_excel(args.workbook, args.phase, args.decimate)
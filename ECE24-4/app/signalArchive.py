@@ -0,0 +1,335 @@
+# signalArchive.py
+#   • compact archive of raw signal channels (.sigz) for long recordings and the SD card sequence files
+#   • samples stored as integers: ADC counts as they are, other values quantized per channel unit
+#     (UNIT_RESOLUTION counts per V / mV / µS)
+#   • each channel delta coded (zigzag, smallest integer width, byte shuffled) and zlib compressed
+#     in chunks of CHUNK_SAMPLES, with a chunk index at the end for random access
+#   • read directly by procFuncs.load_signal_matrix, like .txt / .npy / .rec files
+#
+# Layout:
+#   MAGIC, u32 header length, JSON header {"fs", "channels", "enabled", "resolution", "chunk_samples", "codec", ...}
+#   chunks: zlib(for each enabled channel: i64 first value, u8 width, u8 has_nan, [packed NaN mask], deltas)
+#   index: i64 offset of every chunk and of the index itself; footer: u64 index offset, u64 samples, MAGIC
+#
+# Archive sequence files / recordings (writes <name>.sigz next to each file):
+#   python3 app/signalArchive.py data/baseline_sequence.txt data/test_sequence.txt
+#_______________________________________________________________________________#
+
+import argparse
+import json
+import os
+import struct
+import zlib
+
+import numpy as np
+
+from ringBuffer import CHANNEL_NAMES
+
+ARCHIVE_EXT = ".sigz"
+MAGIC = b"\x93SIGZ01\n"
+_FOOTER = struct.Struct("<QQ")
+
+# Counts per volt of quantized voltages: 10 µV steps, far below one count of
+# the ESP32's 12-bit ADC (3.3 V / 4096 ≈ 0.8 mV). Used for channels in volts
+# and of unknown unit; integer data (raw ADC counts) is stored as it is.
+RESOLUTION = 100_000
+# Counts per unit by channel unit. BITalino samples arrive converted to mV
+# (EMG, ECG) and µS (EDA) (procFuncs.BITALINO_UNITS): 0.1 µV and 0.1 nS steps,
+# far below one count of its 10-bit ADC (about 3 µV for ECG/EMG, 24 nS for EDA).
+UNIT_RESOLUTION = {"V": RESOLUTION, "mV": 10_000, "uS": 10_000}
+# Samples per chunk (the unit of random access)
+CHUNK_SAMPLES = 1 << 16
+# zlib level: 6 compresses about 5 % better than 1; decoding speed is the same
+ZLIB_LEVEL = 6
+
+_WIDTHS = {1: np.uint8, 2: np.uint16, 4: np.uint32, 8: np.uint64}
+
+
+def is_archive(head):
+    """True if the first bytes of a file are those of an archive."""
+    return head.startswith(MAGIC)
+
+
+def unit_resolution(units, channels=len(CHANNEL_NAMES)):
+    """Counts per unit for each channel of *units* (one unit, a list per channel, or None for volts)."""
+    if units is None or isinstance(units, str):
+        units = [units] * channels
+    return [UNIT_RESOLUTION.get(unit, RESOLUTION) for unit in units]
+
+
+def pick_resolution(data, units=None):
+    """
+    Counts per unit for each row of (3, n) data: 1 for integer data (ADC
+    counts), else the resolution of the row's unit (unit_resolution).
+    """
+    resolution = []
+    for row, per_unit in zip(data, unit_resolution(units, len(data))):
+        finite = row[np.isfinite(row)]
+        resolution.append(1 if len(finite) and np.array_equal(finite, np.round(finite)) else per_unit)
+    return resolution
+
+
+# =============================================================================
+# CODEC
+# =============================================================================
+
+def _encode_channel(values, resolution):
+    nan = np.isnan(values)
+    q = np.rint(np.where(nan, 0.0, values) * resolution).astype(np.int64)
+    if nan.any():
+        # NaNs repeat the last value, so they cost no delta
+        idx = np.where(nan, 0, np.arange(len(q)))
+        np.maximum.accumulate(idx, out=idx)
+        q = q[idx]
+
+    deltas = np.diff(q)
+    zigzag = ((deltas << 1) ^ (deltas >> 63)).view(np.uint64)
+    top = int(zigzag.max()) if len(zigzag) else 0
+    width = next(w for w in _WIDTHS if w == 8 or top < 1 << (8 * w))
+    shuffled = np.ascontiguousarray(zigzag.astype(_WIDTHS[width])).view(np.uint8).reshape(-1, width).T
+
+    parts = [struct.pack("<qBB", int(q[0]) if len(q) else 0, width, bool(nan.any()))]
+    if nan.any():
+        parts.append(np.packbits(nan).tobytes())
+    parts.append(shuffled.tobytes())
+    return b"".join(parts)
+
+
+def _decode_channel(buf, pos, n, resolution):
+    first, width, has_nan = struct.unpack_from("<qBB", buf, pos)
+    pos += 10
+    nan = None
+    if has_nan:
+        size = (n + 7) // 8
+        nan = np.unpackbits(np.frombuffer(buf, np.uint8, size, pos), count=n).astype(bool)
+        pos += size
+
+    size = (n - 1) * width
+    shuffled = np.frombuffer(buf, np.uint8, size, pos).reshape(width, n - 1)
+    pos += size
+    zigzag = np.ascontiguousarray(shuffled.T).view(_WIDTHS[width]).ravel().astype(np.uint64)
+    deltas = (zigzag >> np.uint64(1)).view(np.int64) ^ -(zigzag & np.uint64(1)).view(np.int64)
+
+    q = np.empty(n, dtype=np.int64)
+    q[0] = first
+    np.cumsum(deltas, out=q[1:])
+    q[1:] += first
+
+    values = q / resolution
+    if nan is not None:
+        values[nan] = np.nan
+    return values, pos
+
+
+def encode_chunk(data, enabled, resolution, level=ZLIB_LEVEL):
+    """Compressed bytes of a (3, n) block (n >= 1)."""
+    payload = b"".join(_encode_channel(np.asarray(data[row], dtype=np.float64), resolution[row])
+                       for row in range(len(enabled)) if enabled[row])
+    return zlib.compress(payload, level)
+
+
+def decode_chunk(blob, n, enabled, resolution):
+    """(3, n) float64 block of compressed bytes; rows of disabled channels are NaN."""
+    buf = zlib.decompress(blob)
+    data = np.full((len(enabled), n), np.nan)
+    pos = 0
+    for row in range(len(enabled)):
+        if enabled[row]:
+            data[row], pos = _decode_channel(buf, pos, n, resolution[row])
+    return data
+
+
+# =============================================================================
+# FILES
+# =============================================================================
+
+class ArchiveWriter:
+    """
+    Writes an archive block by block, e.g. while a recording is converted.
+
+        with ArchiveWriter(path, fs=1000, resolution=[1e5] * 3) as archive:
+            for block in blocks:          # (3, k) rows EMG, ECG, EDA
+                archive.write(block)
+
+    The file appears under its name when the writer is closed.
+    """
+
+    def __init__(self, path, fs, enabled=None, resolution=None, units=None, chunk_samples=CHUNK_SAMPLES):
+        self.path = path
+        self.chunk_samples = chunk_samples
+        self.enabled = list(enabled) if enabled is not None else [True] * len(CHANNEL_NAMES)
+        self.resolution = list(resolution) if resolution is not None else unit_resolution(units)
+        self.samples = 0
+
+        header = json.dumps({
+            "version": 1,
+            "fs": fs,
+            "channels": list(CHANNEL_NAMES),
+            "enabled": self.enabled,
+            "resolution": self.resolution,
+            "units": units,
+            "chunk_samples": chunk_samples,
+            "codec": "zlib",
+        }).encode("utf-8")
+
+        self._file = open(path + ".tmp", "wb")
+        self._file.write(MAGIC + struct.pack("<I", len(header)) + header)
+        self._offsets = []
+        self._pending = []
+        self._pending_samples = 0
+
+    def write(self, block):
+        """Appends a (3, k) block of samples."""
+        block = np.asarray(block, dtype=np.float64)
+        self._pending.append(block)
+        self._pending_samples += block.shape[1]
+        if self._pending_samples >= self.chunk_samples:
+            self._flush(final=False)
+
+    def _flush(self, final):
+        if not self._pending:
+            return
+        data = np.concatenate(self._pending, axis=1)
+        stop = len(data[0]) if final else len(data[0]) - len(data[0]) % self.chunk_samples
+        for start in range(0, stop, self.chunk_samples):
+            self._offsets.append(self._file.tell())
+            self._file.write(encode_chunk(data[:, start:min(start + self.chunk_samples, stop)],
+                                          self.enabled, self.resolution))
+        self.samples += stop
+        rest = data[:, stop:]
+        self._pending = [rest] if rest.shape[1] else []
+        self._pending_samples = rest.shape[1]
+
+    def close(self):
+        if self._file is None:
+            return
+        self._flush(final=True)
+        index_offset = self._file.tell()
+        self._file.write(np.asarray(self._offsets + [index_offset], dtype="<i8").tobytes())
+        self._file.write(_FOOTER.pack(index_offset, self.samples) + MAGIC)
+        self._file.close()
+        self._file = None
+        os.replace(self.path + ".tmp", self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+            os.remove(self.path + ".tmp")
+
+
+def write_archive(path, data, fs, enabled=None, resolution=None, units=None):
+    """
+    Archives (3, n) data (rows EMG, ECG, EDA). Rows that are all NaN are
+    stored as disabled channels; the resolution defaults to pick_resolution
+    for *units* (e.g. procFuncs.BITALINO_UNITS; None for volts).
+    """
+    data = np.asarray(data, dtype=np.float64)
+    if enabled is None:
+        enabled = [not np.isnan(row).all() for row in data]
+    if resolution is None:
+        resolution = pick_resolution(data, units)
+    with ArchiveWriter(path, fs, enabled, resolution, units) as archive:
+        archive.write(data)
+    return path
+
+
+class SignalArchive:
+    """
+    Reads an archive; any range of samples decodes only the chunks it covers.
+
+        archive = SignalArchive(path)
+        data = archive.read()                 # (3, n) float64, rows EMG, ECG, EDA
+        minute = archive.read(60 * archive.fs, 120 * archive.fs)
+
+    Attributes:
+        header (dict): fs, channels, enabled, resolution, units, chunk_samples.
+        samples (int): Samples per channel.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            head = f.read(len(MAGIC) + 4)
+            if not is_archive(head):
+                raise ValueError(f"{path} is not a signal archive")
+            (size,) = struct.unpack_from("<I", head, len(MAGIC))
+            self.header = json.loads(f.read(size))
+
+            f.seek(-(_FOOTER.size + len(MAGIC)), os.SEEK_END)
+            index_offset, self.samples = _FOOTER.unpack(f.read(_FOOTER.size))
+            f.seek(index_offset)
+            n_chunks = -(-self.samples // self.header["chunk_samples"])
+            self._offsets = np.frombuffer(f.read(8 * (n_chunks + 1)), dtype="<i8")
+
+    @property
+    def fs(self):
+        return self.header["fs"]
+
+    def __len__(self):
+        return self.samples
+
+    def read(self, start=0, stop=None):
+        """(3, stop - start) float64 samples; rows of disabled channels are NaN."""
+        stop = self.samples if stop is None else min(stop, self.samples)
+        start = max(0, min(start, stop))
+        size = self.header["chunk_samples"]
+        enabled, resolution = self.header["enabled"], self.header["resolution"]
+
+        first, last = start // size, -(-stop // size)
+        blocks = []
+        with open(self.path, "rb") as f:
+            f.seek(self._offsets[first])
+            for chunk in range(first, last):
+                blob = f.read(self._offsets[chunk + 1] - self._offsets[chunk])
+                n = min(size, self.samples - chunk * size)
+                blocks.append(decode_chunk(blob, n, enabled, resolution))
+
+        if not blocks:
+            return np.full((len(enabled), 0), np.nan)
+        data = np.concatenate(blocks, axis=1) if len(blocks) > 1 else blocks[0]
+        offset = first * size
+        return data[:, start - offset:stop - offset]
+
+
+def read_archive(path):
+    """(3, n) float64 samples of an archive, rows EMG, ECG, EDA."""
+    return SignalArchive(path).read()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive signal files (.txt / .csv / .npy / .rec) as .sigz.")
+    parser.add_argument("files", nargs="+", help="signal files; <name>.sigz is written next to each")
+    parser.add_argument("--fs", type=float, default=None, help="sampling rate, if the file does not give one")
+    parser.add_argument("--resolution", type=float, default=None,
+                        help="counts per unit (default: by channel unit, e.g. "
+                             f"{RESOLUTION} per V, {UNIT_RESOLUTION['mV']} per mV; 1 for integer ADC counts)")
+    args = parser.parse_args()
+
+    import time
+    from procFuncs import load_signal_matrix, sniff_signal_file
+
+    for file in args.files:
+        fmt = sniff_signal_file(file)
+        fs = fmt.get("fs") or args.fs
+        units = None
+        if fmt["format"] == "rec":
+            # recordings know their units (BITalino ones are in mV / µS)
+            from sessionRecorder import read_header
+            header = read_header(file)
+            fs, units = fs or header["fs"], header.get("units")
+        data = np.asarray(load_signal_matrix(file))
+        resolution = [args.resolution] * len(data) if args.resolution else None
+        target = os.path.splitext(file)[0] + ARCHIVE_EXT
+        write_archive(target, data, fs, resolution=resolution, units=units)
+
+        start = time.perf_counter()
+        restored = read_archive(target)
+        elapsed = time.perf_counter() - start
+        error = np.nanmax(np.abs(restored - data)) if data.size else 0.0
+        print(f"{file}: {os.path.getsize(file) / os.path.getsize(target):.1f}x smaller, "
+              f"max error {error:.2g}, loads in {elapsed * 1000:.1f} ms -> {target}")
@@ -1,107 +1,64 @@
 import threading
 import pygame
 import time
-from bitalino import BITalino
 import os
 import multiprocessing as multi
 import sys
 # from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
 # from comtypes import CLSCTX_ALL
 import hearingTest as sound # Kyle's code
-import openpyxl
 import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
 import procFuncs as proc
 import procResult
-from esp32Device import Device
+from deviceSession import DeviceSession
+from ringBuffer import RingBuffer
+from acqEngine import AcquisitionEngine, BitalinoSource, Esp32Source
+from sessionRecorder import ChunkRecorder, recording_path
+from sessionStore import SessionStore, export_excel
+from liveView import run_live_view
 
 # Global variables
-device = 0
+device = 0 # device of the phase being recorded (session.device while a phase runs)
+session = None # DeviceSession kept open from the baseline to the end of the test
 
-# Saves the EMG, ECG, EDA signals in a TXT file
-def save_to_txt_file(txt_name, emg, ecg, eda):
-    """
-    Save EMG, ECG, and EDA signal data to a text file.
+# Seconds of signal kept in shared memory for the live graph (the full phase is streamed to disk)
+LIVE_WINDOW_S = 30
 
-    Parameters
-    ----------
-    txt_name : str
-        Path or filename of the output text file.
-    emg : list
-        List of EMG signal values.
-    ecg : list
-        List of ECG signal values.
-    eda : list
-        List of EDA signal values.
+# Samples averaged into each row of the Baseline / Test Data sheets (1 = every sample).
+# The session store always holds the full rate data.
+EXCEL_DECIMATION = 1
 
-    Returns
-    -------
-    None
-        Writes data directly to a file. Each line contains comma-separated EMG, ECG, and EDA values.
+# Export each phase's raw data to the workbook when it ends (False: only on demand, see sessionStore.py)
+EXPORT_RAW_SHEETS = True
 
-    Side Effects
-    -------------
-    Creates or overwrites a text file on disk.
+def store_phase(filename, phase, rec_path, recording_info=None):
     """
-
-    # init as 0
-    data1, data2, data3 = 0,0,0
-
-    with open(txt_name, 'w') as file:
-        for data in range(len(ecg)):
-            if len(emg) > 0:
-                data1 = emg[data]
-            if len(ecg) > 0:
-                data2 = ecg[data]
-            if len(eda) > 0:
-                data3 = eda[data]
-
-            file.write(f'{data1},{data2},{data3}\n')
-
-
-def save_to_patients_excel_file(baseline: bool, filename: str, emg, ecg, eda):
-    """
-    Save signal data (EMG, ECG, EDA) to a patient's Excel file.
+    Save a finished phase to the session store (the primary record) and
+    export its raw data to the patient workbook.
 
     Parameters
     ----------
-    baseline : bool
-        True if writing to baseline data sheet; False for test data sheet.
     filename : str
-        Path to the Excel file to update.
-    emg, ecg, eda : list
-        Lists containing EMG, ECG, and EDA samples.
+        Patient workbook; the store sits next to it.
+    phase : str
+        'baseline' or 'test'.
+    rec_path : str
+        The phase's sessionRecorder recording.
+    recording_info : dict, optional
+        Session settings (Recording Info), stored with the first phase.
 
     Returns
     -------
     None
-        Writes values into Excel workbook.
-
-    Side Effects
-    -------------
-    Updates and saves an Excel workbook using openpyxl.
     """
 
-    # Write data to excel file
-    print(f'in save_to_patients_excel_file: {filename}')
-    workbook = openpyxl.load_workbook(filename)
-
-    data = [emg, ecg, eda]
-
-    if baseline:
-        sheet_name = 'Baseline Data'
-    else:
-        sheet_name = 'Test Data'
-
-    sheet = workbook[sheet_name]
+    store = SessionStore.for_workbook(filename)
+    if recording_info is not None:
+        store.update_meta(recording_info=recording_info)
+    store.write_phase_from_recording(phase, rec_path)
 
-    # write in data (EMG, ECG, EDA) by column
-    for column in range(3):
-        for row_num, value in enumerate(data[column], start=2):
-            sheet.cell(row=row_num, column=column + 1).value = value
-
-    # Save workbook with a new name or overwrite the existing one
-    workbook.save(filename)
+    if EXPORT_RAW_SHEETS:
+        export_excel(filename, [phase], EXCEL_DECIMATION)
 
 # def set_computer_volume(percentage):
 #     """
@@ -283,9 +240,72 @@ def play_sound(duration, frequency, interval, di, final_volume_db=-30):
             final_volume_db += di # Increases by a certain db
         # --------------------------------------------------------------------
 
-def grab_signal(samplingRate:int, duration:int, emg_vals, ecg_vals, eda_vals, channel = [True, True, True]):
+def discard_online_phases(filename):
     """
-    Acquire EMG, ECG, and EDA signals from a connected BITalino or ESP32 device.
+    Drop the online analyzers of both phases after a failed test phase
+    (the ErrorPage ends the session, so nothing will analyze them).
+
+    Parameters
+    ----------
+    filename : str
+        Patient workbook of the session.
+
+    Returns
+    -------
+    None
+    """
+
+    for phase in ('baseline', 'test'):
+        procResult.discard_online_phase(filename, phase)
+
+def acquire(source, duration, buffer, subscribers=(), errors=None, stop_event=None):
+    """
+    Run a device on the asyncio acquisition engine and record it into a buffer.
+
+    In a thread an exception would be lost: when errors is given it is
+    appended there instead and stop_event is set, so the live graph stops
+    waiting for data and the sequence can report the failure.
+
+    Parameters
+    ----------
+    source : acqEngine.Esp32Source or acqEngine.BitalinoSource
+        Device source to collect from.
+    duration : int
+        Duration of acquisition in seconds.
+    buffer : RingBuffer
+        Shared buffer receiving [EMG, ECG, EDA] samples.
+    subscribers : iterable of callable, optional
+        Extra consumers called with every acqEngine.Block.
+    errors : list, optional
+        Receives the exception that stopped the acquisition.
+    stop_event : multiprocessing.Event, optional
+        Set when the acquisition fails (see live_graphing).
+
+    Returns
+    -------
+    None
+    """
+
+    try:
+        engine = AcquisitionEngine()
+        engine.add_source(source)
+        engine.subscribe(lambda block: buffer.write(block.samples))
+        for callback in subscribers:
+            engine.subscribe(callback)
+
+        engine.run_sync(duration) # prints the source's timing statistics when done
+    except Exception as e:
+        if errors is None:
+            raise
+        print(f"Acquisition failed: {e}")
+        errors.append(e)
+        if stop_event is not None:
+            stop_event.set()
+
+def grab_signal(samplingRate:int, duration:int, buffer, channel = [True, True, True], subscribers=(),
+                errors=None, stop_event=None):
+    """
+    Acquire EMG, ECG, and EDA signals from the connected BITalino.
 
     Parameters
     ----------
@@ -293,48 +313,81 @@ def grab_signal(samplingRate:int, duration:int, emg_vals, ecg_vals, eda_vals, ch
         Sampling rate in Hz.
     duration : int
         Duration of acquisition in seconds.
-    emg_vals, ecg_vals, eda_vals : multiprocessing.Manager().list
-        Shared lists to store sampled data.
+    buffer : RingBuffer
+        Shared buffer receiving [EMG, ECG, EDA] samples.
     channel : list of bool
         Enables or disables each channel [EMG, ECG, EDA].
+    subscribers : iterable of callable, optional
+        Extra consumers called with every acqEngine.Block.
+    errors, stop_event : optional
+        Failure reporting, see acquire.
 
     Returns
     -------
     None
     """
 
-    device.start(samplingRate, [0,1,2,3,4,5])
-    start_time = time.time()
-    
-    # grad data for specified duration of test
-    while (time.time() - start_time) < duration:
-        data = device.read(samplingRate) # <--- Returns n samples in one second (n = samplingRate)
-        for i in data:
-            # if the channel is enabled, add in data, if not use 1 as a placeholder
-            if channel[0] == True:
-                emg_vals.append(i[5])
-            if channel[1] == True:
-                ecg_vals.append(i[6])
-            if channel[2] == True:
-                eda_vals.append(i[7])
-            if channel[0] == False:
-                emg_vals.append(1)
-            if channel[1] == False:
-                ecg_vals.append(1)
-            if channel[2] == False:
-                eda_vals.append(1)            
- 
-
-    print(time.time()-start_time)
-    # Stop acquisition
-    device.stop()
-
-    # Close the connection
-    device.close()
-
-def live_graphing(ready_event, samplingRate, emg_vals, ecg_vals, eda_vals, channel, duration):
+    acquire(BitalinoSource(device, samplingRate, channel, keep_open=True), duration, buffer, subscribers,
+            errors, stop_event)
+
+def connect_session(kind, controller, address=None):
     """
-    Display real-time graphing of signals using Matplotlib animation.
+    Connect the device session shared by the baseline and test phases,
+    announcing progress to the user. An open session for the same device is
+    reused as is.
+
+    Parameters
+    ----------
+    kind : str
+        'bitalino' or 'esp32'.
+    controller : object
+        GUI controller with page frame references.
+    address : str, optional
+        BITalino MAC address.
+
+    Returns
+    -------
+    bool
+        False (after showing the ErrorPage) if the device could not be reached.
+    """
+
+    global session
+
+    if session is not None and not session.matches(kind, address):
+        session.close()
+        session = None
+
+    if session is None:
+        session = DeviceSession(kind, address,
+                                on_retry=lambda attempt: sound.tts("Couldn't connect to device. Trying again.", 150))
+
+    if session.connected:
+        return True
+
+    sound.tts("Connecting to device, please wait", 150)
+    if not session.connect():
+        close_session() # nothing to keep alive; stops the heartbeat
+        sound.tts("Unable to connect to device.", 150)
+        controller.show_frame("ErrorPage")
+        return False
+
+    sound.tts("Connected to device.", 150)
+    return True
+
+def close_session():
+    """
+    Disconnect the device session after the last phase.
+    """
+
+    global session
+
+    if session is not None:
+        session.close()
+        session = None
+
+def live_graphing(ready_event, samplingRate, buffer, channel, duration, stop_event=None):
+    """
+    Display real-time graphing of signals (see liveView.LiveView).
 
     Parameters
     ----------
@@ -342,12 +395,14 @@ def live_graphing(ready_event, samplingRate, emg_vals, ecg_vals, eda_vals, chann
         Event flag signaling readiness to start graphing.
     samplingRate : int
         Sampling rate in Hz.
-    emg_vals, ecg_vals, eda_vals : multiprocessing.Manager().list
-        Shared data arrays for EMG, ECG, and EDA.
+    buffer : RingBuffer
+        Shared buffer holding [EMG, ECG, EDA] samples.
     channel : list of bool
         Indicates which channels are enabled.
     duration : float
         Total graphing duration in seconds.
+    stop_event : multiprocessing.Event, optional
+        Set if the acquisition failed; no data will come, so stop waiting.
 
     Returns
     -------
@@ -356,134 +411,17 @@ def live_graphing(ready_event, samplingRate, emg_vals, ecg_vals, eda_vals, chann
 
     plt.style.use('fivethirtyeight')
 
-    x_vals = []
-    emg_vals_graph = []
-    ecg_vals_graph = []
-    eda_vals_graph = []
-    selected_indices = []
-
-    for index, value in enumerate(channel):
-        if value == True:
-            selected_indices.append(index)
-
     # wait until populated with data
     while(1):
-        if (len(emg_vals) > 100) or (len(ecg_vals) > 100) or (len(eda_vals) > 100):
+        if len(buffer) > 100:
             ready_event.set() # Tell other processes that graphing has started
             break  
-    
-    # THESE ARE SUBJECT TO CHANGE BASED ON COMPUTERS ABILITY
-    if samplingRate == 10:
-        num_data_to_graph = 10
-        window_size = 15
-        inter = 1000
-    elif samplingRate == 100:
-        num_data_to_graph = 100
-        window_size = 150
-        inter = 1000
-    elif samplingRate == 130:
-        num_data_to_graph = 130
-        window_size = 100
-        inter = 1000
-    else:
-        num_data_to_graph = 1000 # Needs adjusting
-        window_size = 1500
-        inter = 750
-        '''
-        num_data_to_graph = 30
-        window_size = 1500
-        inter = 1
-        '''
-    
-    num_data_to_graph = samplingRate
-    start_time = time.time()
-    starting = 0
-    
-    if len(selected_indices) == 1:
-        fig, ax = plt.subplots()
-        line = ax.plot([], [])[0]  # Create a line for the subplot ax
-        lines = [line]  # Create a list containing only the line
-    else:
-        # Creating subplots based on user's selection
-        fig, axs = plt.subplots(len(selected_indices))
-        lines = []
-        for ax in axs:
-            line = ax.plot([], [])[0]  # Create a line for the current subplot ax
-            lines.append(line)  # Append the created line to the list of lines
-
-    def animate(i):
-        # stop if duration is up
-        if(time.time() - start_time) >= duration:
-            print(f'Time: {time.time()-start_time}')
-            ani.event_source.stop()
-            plt.close()
-            sys.exit()
+        if stop_event is not None and stop_event.is_set():
+            ready_event.set() # release the sequence waiting on us, it reports the error
             return
+        time.sleep(0.01)
 
-        nonlocal starting, ax
-        for i in range(starting, starting + num_data_to_graph):
-            try: 
-                if channel[0] == True:
-                    emg_vals_graph.append(emg_vals[i])
-                if channel[1] == True:
-                    ecg_vals_graph.append(ecg_vals[i])
-                if channel[2] == True:
-                    eda_vals_graph.append(eda_vals[i])
-            except Exception as e:
-                # make sure all arrays are the same size before conitnuing to next itteration (some might've been added to before error was thrown)
-                if (channel[0] == True) and (len(emg_vals_graph) > len(x_vals)):
-                    emg_vals_graph.pop() # pop the last element
-                if (channel[1] == True) and (len(ecg_vals_graph) > len(x_vals)):
-                    ecg_vals_graph.pop() # pop the last element
-                if (channel[2] == True) and (len(eda_vals_graph) > len(x_vals)):
-                    eda_vals_graph.pop() # pop the last element
-                continue
-            
-            x_vals.append(starting / samplingRate)
-            starting += 1
-            
-            # Maintain a moving window of values for live plotting
-            if len(x_vals) > window_size:
-                x_vals.pop(0)
-                if channel[0] == True: 
-                    emg_vals_graph.pop(0)
-                if channel[1] == True:
-                    ecg_vals_graph.pop(0)
-                if channel[2] == True:
-                    eda_vals_graph.pop(0)
-
-        if len(selected_indices) == 1:
-            idx = selected_indices[0]
-            line = lines[0]
-            ax = ax  # Assuming you don't need to update ax in this case
-
-            if idx == 0:
-                line.set_data(x_vals, emg_vals_graph)
-            elif idx == 1:
-                line.set_data(x_vals, ecg_vals_graph)  
-            elif idx == 2:
-                line.set_data(x_vals, eda_vals_graph) 
-                
-            ax.relim()
-            ax.autoscale_view()
-        else:
-            for idx, line, ax in zip(selected_indices, lines, axs):
-                if idx == 0:
-                    line.set_data(x_vals, emg_vals_graph)
-                elif idx == 1:
-                    line.set_data(x_vals, ecg_vals_graph)  
-                elif idx == 2:
-                    line.set_data(x_vals, eda_vals_graph) 
-                
-                try:
-                    ax.relim()
-                    ax.autoscale_view()
-                except:
-                    print(len(x_vals), len(emg_vals_graph), len(ecg_vals_graph), len(eda_vals_graph))
-
-    ani = FuncAnimation(fig, animate, frames=60, interval=inter)
-    plt.tight_layout()
-    plt.show()
+    run_live_view(buffer, samplingRate, channel, duration)
 
 def run_baseline_sequence_ESP32(filepath:str, filename:str, recording_info, controller):
     """
@@ -520,23 +458,28 @@ def run_baseline_sequence_ESP32(filepath:str, filename:str, recording_info, cont
     di_option = recording_info["di_option"]
     signals = recording_info["signals"]
 
-    device = Device()
-
-    # Establish array values for multiprocessing
-    with multi.Manager() as manager:
-        emg_vals = manager.list()
-        ecg_vals = manager.list()
-        eda_vals = manager.list()
+    # Connect before opening the live graph so it never waits on a missing device
+    if not connect_session('esp32', controller):
+        return -1
 
+    # Shared-memory buffer for the graphing process; the whole phase is streamed to disk
+    recorder = ChunkRecorder(recording_path(filename, 'baseline'), sample_rate, 'ESP32', units='V', enabled=signals)
+    # analyzes the phase while it is recorded, so the results are ready when it ends
+    analyzer = procResult.start_online_phase(filename, 'baseline', signals, sample_rate, duration)
+    with RingBuffer(sample_rate * LIVE_WINDOW_S) as buffer, recorder, session.phase() as device:
         ready_event = multi.Event()
+        stop_event = multi.Event() # set by the acquisition thread if it fails
+        errors = []
     
         # Ensure no errors are thrown during the baseline sequence
         try:
             set_computer_volume(50) # takes in a percentage to change the volume on physical computer
+            sound.tts("Baseline Collection sequence starts in. 3, 2, 1 ", 150)
+            controller.frames["LoadingPage"].set_load_title("Collecting data...")
 
-            signal_thread = threading.Thread(target=device.collect_data, args=(sample_rate, duration, emg_vals, ecg_vals, eda_vals, signals,
-                                                                                       controller, "Baseline Collection sequence starts in. 3, 2, 1 "))
-            graphing_process = multi.Process(target=live_graphing,args=(ready_event, sample_rate, emg_vals, ecg_vals, eda_vals, signals, duration))
+            source = Esp32Source(device, sample_rate, signals, keep_open=True)
+            signal_thread = threading.Thread(target=acquire, args=(source, duration, buffer, (recorder, analyzer), errors, stop_event))
+            graphing_process = multi.Process(target=live_graphing,args=(ready_event, sample_rate, buffer, signals, duration, stop_event))
 
             # Starts all threads/proccess
             graphing_process.start()
@@ -546,22 +489,25 @@ def run_baseline_sequence_ESP32(filepath:str, filename:str, recording_info, cont
             # Wait for threads/subprocess to finish
             graphing_process.join()
             signal_thread.join()
+            if errors:
+                raise errors[0] # the acquisition thread failed
         except Exception as e:
             print(e)
+            procResult.discard_online_phase(filename, 'baseline')
+            close_session() # the ErrorPage ends the session: release the device
             return -1
+        finally:
+            analyzer.close() # the tail of the phase is finished in the background
 
         
         # Notify user baseline collection finished
         sound.tts("Baseline Collection sequence complete. Saving Results Now. Please wait", 150)
-        device.stop()
 
         controller.frames["LoadingPage"].set_load_title("Saving Results...")
+        recorder.close() # flushes the last chunk, everything else is already on disk
 
-        # Save info to text file (needed for Max's code)
-        save_to_txt_file('baseline_sequence.txt', emg_vals, ecg_vals, eda_vals)
-
-        # Save results to patients excel file
-        save_to_patients_excel_file(True, filename, emg_vals, ecg_vals, eda_vals)
+        # Save the phase to the session store and the patient's excel file
+        store_phase(filename, 'baseline', recorder.path, recording_info)
         sound.tts("Results have been saved", 150)
 
 
@@ -600,56 +546,69 @@ def run_test_sequence_ESP32(filepath, filename, db_volume, recording_info, contr
 
     filename = filepath + filename
 
-    with multi.Manager() as manager:
-        emg_vals = manager.list()
-        ecg_vals = manager.list()
-        eda_vals = manager.list()
+    if not connect_session('esp32', controller):
+        return -1
 
+    recorder = ChunkRecorder(recording_path(filename, 'test'), sample_rate, 'ESP32', units='V', enabled=signals)
+    # analyzes the phase while it is recorded, so the results are ready when it ends
+    analyzer = procResult.start_online_phase(filename, 'test', signals, sample_rate, duration)
+    with RingBuffer(sample_rate * LIVE_WINDOW_S) as buffer, recorder, session.phase() as device:
         ready_event = multi.Event()
+        stop_event = multi.Event() # set by the acquisition thread if it fails
+        errors = []
     
         try:
             set_computer_volume(50) # takes in a percentage to change the volume on physical computer
+            sound.tts("Sounds Sense hearing test starts in. 3, 2, 1 ", 150)
+            controller.frames["LoadingPage"].set_load_title("Collecting data...")
 
-            # Create one thread and one subprocesses
+            # Create two threads and one subprocesses
+            source = Esp32Source(device, sample_rate, signals, keep_open=True)
             sound_thread = threading.Thread(target=play_sound, args=(duration, audio_option, time_option, di_option, db_volume))
-            signal_thread = threading.Thread(target=device.collect_data, args=(sample_rate, duration, emg_vals, ecg_vals, eda_vals, signals,
-                                                                                controller, "Sounds Sense hearing test starts in. 3, 2, 1 "))
-            graphing_process = multi.Process(target=live_graphing,args=(ready_event, sample_rate, emg_vals, ecg_vals, eda_vals, signals, duration))
+            signal_thread = threading.Thread(target=acquire, args=(source, duration, buffer, (recorder, analyzer), errors, stop_event))
+            graphing_process = multi.Process(target=live_graphing,args=(ready_event, sample_rate, buffer, signals, duration, stop_event))
 
             # Starts all threads/proccess
             graphing_process.start()
             signal_thread.start()
             ready_event.wait() # wait till process loads
+            if errors:
+                # the acquisition failed before any data: no sounds, report it
+                graphing_process.join()
+                signal_thread.join()
+                raise errors[0]
             sound_thread.start()
             
             # Wait for threads/subprocess to finish
             graphing_process.join()
             signal_thread.join()
             sound_thread.join()
+            if errors:
+                raise errors[0] # the acquisition thread failed
         except Exception as e:
             print(e)
+            discard_online_phases(filename)
+            close_session() # the ErrorPage ends the session: release the device
             return -1
+        finally:
+            analyzer.close() # the tail of the phase is finished in the background
 
         # Notify user Test Sequnce finished
         sound.tts("Sound Sense hearing test complete. Saving Results Now. Please wait", 150)
-        device.stop()
 
         controller.frames["LoadingPage"].set_load_title("Saving Results...")
+        recorder.close() # flushes the last chunk, everything else is already on disk
 
-        # Save info to text file (needed for Max's code)
-        save_to_txt_file('test_sequence.txt', emg_vals, ecg_vals, eda_vals)
-
-        # Save results to patients excel file
-        save_to_patients_excel_file(False, filename, emg_vals, ecg_vals, eda_vals)
+        # Save the phase to the session store and the patient's excel file
+        store_phase(filename, 'test', recorder.path)
         # sound.tts("Results have been saved", 150)
         controller.frames["LoadingPage"].set_load_title("Please Wait...")
-    
-    # Run analysis on code
-    procResult2.main(filename,signals,sample_rate, controller)
 
-    # Delete text files
-    os.remove('test_sequence.txt')
-    os.remove('baseline_sequence.txt')
+    close_session() # last phase done, release the device
+    
+    # Run analysis on code (reads the phase recordings next to the workbook)
+    with procResult.AnalysisSession(filename, signals, sample_rate) as analysis:
+        procResult.main(analysis, controller)
 
 
 def run_baseline_sequence_bitalino(filepath:str, filename:str, recording_info, controller):
@@ -684,30 +643,18 @@ def run_baseline_sequence_bitalino(filepath:str, filename:str, recording_info, c
     di_option = recording_info["di_option"]
     signals = recording_info["signals"]
 
-    # Attempt to connect with device
-    for i in range(5):
-        print(i)
-        try:
-            device = BITalino(macAddress)
-            break
-        except Exception as e:
-            sound.tts("Couldn't connect to device. Trying again.", 150)
-            time.sleep(2)
-            print("Trying again")
-            print(e)
-        if i == 4:
-            sound.tts("Couldn't connect to device after 5 tries.", 150)
-            print("Couldnt connect after 5 tries")
-            return -1
-
-    sound.tts("Connected to device.", 150)
-    # Establish array values for multiprocessing
-    with multi.Manager() as manager:
-        emg_vals = manager.list()
-        ecg_vals = manager.list()
-        eda_vals = manager.list()
+    # Connect with device (kept connected for the test phase)
+    if not connect_session('bitalino', controller, macAddress):
+        return -1
 
+    # Shared-memory buffer for the graphing process; the whole phase is streamed to disk
+    recorder = ChunkRecorder(recording_path(filename, 'baseline'), sample_rate, 'BITalino', units=proc.BITALINO_UNITS, enabled=signals)
+    # analyzes the phase while it is recorded, so the results are ready when it ends
+    analyzer = procResult.start_online_phase(filename, 'baseline', signals, sample_rate, duration)
+    with RingBuffer(sample_rate * LIVE_WINDOW_S) as buffer, recorder, session.phase() as device:
         ready_event = multi.Event()
+        stop_event = multi.Event() # set by the acquisition thread if it fails
+        errors = []
     
         # Ensure no errors are thrown during the baseline sequence
         try:
@@ -717,8 +664,8 @@ def run_baseline_sequence_bitalino(filepath:str, filename:str, recording_info, c
 
             controller.frames["LoadingPage"].set_load_title("Collecting data...")
             # Create one thread and one subprocesses
-            signal_thread = threading.Thread(target=grab_signal, args=(sample_rate, duration, emg_vals, ecg_vals, eda_vals, signals))
-            graphing_process = multi.Process(target=live_graphing,args=(ready_event, sample_rate, emg_vals, ecg_vals, eda_vals, signals, duration))
+            signal_thread = threading.Thread(target=grab_signal, args=(sample_rate, duration, buffer, signals, (recorder, analyzer), errors, stop_event))
+            graphing_process = multi.Process(target=live_graphing,args=(ready_event, sample_rate, buffer, signals, duration, stop_event))
 
             # Starts all threads/proccess
             graphing_process.start()
@@ -728,27 +675,25 @@ def run_baseline_sequence_bitalino(filepath:str, filename:str, recording_info, c
             # Wait for threads/subprocess to finish
             graphing_process.join()
             signal_thread.join()
+            if errors:
+                raise errors[0] # the acquisition thread failed
         except Exception as e:
             print(e)
+            procResult.discard_online_phase(filename, 'baseline')
+            close_session() # the ErrorPage ends the session: release the device
             return -1
+        finally:
+            analyzer.close() # the tail of the phase is finished in the background
 
         
         # Notify user baseline collection finished
         sound.tts("Baseline Collection sequence complete. Saving Results Now. Please wait", 150)
 
         controller.frames["LoadingPage"].set_load_title("Saving Results...")
+        recorder.close() # flushes the last chunk, everything else is already on disk
 
-        converted_emg_vals = proc.convert_raw_emg(emg_vals)
-        converted_ecg_vals = proc.convert_raw_ecg(ecg_vals)
-        converted_eda_vals = proc.convert_raw_eda(eda_vals)     
-
-        # Save info to text file (needed for Max's code)
-        # save_to_txt_file('baseline_sequence.txt', emg_vals, ecg_vals, eda_vals)
-        save_to_txt_file('baseline_sequence.txt', converted_emg_vals, converted_ecg_vals, converted_eda_vals)
-        
-
-        # Save results to patients excel file
-        save_to_patients_excel_file(True, filename, converted_emg_vals, converted_ecg_vals, eda_vals)
+        # Save the phase to the session store and the patient's excel file
+        store_phase(filename, 'baseline', recorder.path, recording_info)
         sound.tts("Results have been saved", 150)
         
         
@@ -786,27 +731,18 @@ def run_test_sequence_bitalino(filepath, filename, db_volume, recording_info, co
     signals = recording_info["signals"]
 
     filename = filepath + filename
-    # Attempt to connect with device
-    for i in range(5):
-        try:
-            device = BITalino(macAddress)
-            break
-        except Exception as e:
-            print("Trying again")
-            print(e)
-            
-        if i == 4:
-            print("Couldnt connect after 5 tries")
-            return -1
-    
-
-    # Establish array values for multiprocessing
-    with multi.Manager() as manager:
-        emg_vals = manager.list()
-        ecg_vals = manager.list()
-        eda_vals = manager.list()
-
+    # Reuses the baseline's connection (reconnects only if it was lost)
+    if not connect_session('bitalino', controller, macAddress):
+        return -1
+
+    # Shared-memory buffer for the graphing process; the whole phase is streamed to disk
+    recorder = ChunkRecorder(recording_path(filename, 'test'), sample_rate, 'BITalino', units=proc.BITALINO_UNITS, enabled=signals)
+    # analyzes the phase while it is recorded, so the results are ready when it ends
+    analyzer = procResult.start_online_phase(filename, 'test', signals, sample_rate, duration)
+    with RingBuffer(sample_rate * LIVE_WINDOW_S) as buffer, recorder, session.phase() as device:
         ready_event = multi.Event()
+        stop_event = multi.Event() # set by the acquisition thread if it fails
+        errors = []
 
         # Ensure no errors are thrown during the test sequence
         try:
@@ -817,46 +753,50 @@ def run_test_sequence_bitalino(filepath, filename, db_volume, recording_info, co
 
             # Create two threads and one subprocesses
             sound_thread = threading.Thread(target=play_sound, args=(duration, audio_option, time_option, di_option, db_volume))
-            signal_thread = threading.Thread(target=grab_signal, args=(sample_rate, duration, emg_vals, ecg_vals, eda_vals, signals))
-            graphing_process = multi.Process(target=live_graphing,args=(ready_event, sample_rate, emg_vals, ecg_vals, eda_vals, signals, duration))
+            signal_thread = threading.Thread(target=grab_signal, args=(sample_rate, duration, buffer, signals, (recorder, analyzer), errors, stop_event))
+            graphing_process = multi.Process(target=live_graphing,args=(ready_event, sample_rate, buffer, signals, duration, stop_event))
             
             # Starts all threads/proccess
             graphing_process.start()
             signal_thread.start()
             ready_event.wait() # wait till process loads
+            if errors:
+                # the acquisition failed before any data: no sounds, report it
+                graphing_process.join()
+                signal_thread.join()
+                raise errors[0]
             sound_thread.start()
                 
             # Wait for threads/subprocess to finish
             graphing_process.join()
             sound_thread.join()
             signal_thread.join()
-        except:
+            if errors:
+                raise errors[0] # the acquisition thread failed
+        except Exception as e:
+            print(e)
+            discard_online_phases(filename)
+            close_session() # the ErrorPage ends the session: release the device
             return -1
+        finally:
+            analyzer.close() # the tail of the phase is finished in the background
 
         # Notify user Test Sequnce finished
         sound.tts("Sound Sense hearing test complete. Saving Results Now. Please wait", 150)
 
         controller.frames["LoadingPage"].set_load_title("Saving Results...")
+        recorder.close() # flushes the last chunk, everything else is already on disk
 
-        converted_emg_vals = proc.convert_raw_emg(emg_vals)
-        converted_ecg_vals = proc.convert_raw_ecg(ecg_vals)
-        converted_eda_vals = proc.convert_raw_eda(eda_vals)     
-
-        # Save info to text file (needed for Max's code)
-        # save_to_txt_file('test_sequence.txt', emg_vals, ecg_vals, eda_vals)
-        save_to_txt_file('test_sequence.txt', converted_emg_vals, converted_ecg_vals, converted_eda_vals)
-
-        # Save results to patients excel file
-        save_to_patients_excel_file(False, filename, converted_emg_vals, converted_ecg_vals, converted_eda_vals)
+        # Save the phase to the session store and the patient's excel file
+        store_phase(filename, 'test', recorder.path)
         # sound.tts("Results have been saved", 150)
         controller.frames["LoadingPage"].set_load_title("Please Wait...")
-    
-    # Run analysis on code
-    procResult2.main(filename,signals,sample_rate, controller)
 
-    # Delete text files
-    os.remove('test_sequence.txt')
-    os.remove('baseline_sequence.txt')
+    close_session() # last phase done, release the device
+    
+    # Run analysis on code (reads the phase recordings next to the workbook)
+    with procResult.AnalysisSession(filename, signals, sample_rate) as analysis:
+        procResult.main(analysis, controller)
 
 
 
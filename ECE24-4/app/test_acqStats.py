@@ -0,0 +1,90 @@
+# test_acqStats.py
+#   • least squares effective rate / drift against known clocks, with and without sequence numbers
+#   • jitter, gaps and lost samples; the saved summary is what load_stats returns
+#_______________________________________________________________________________#
+
+import numpy as np
+import pytest
+
+from acqStats import StreamStats, load_stats
+
+
+def _feed(stats, fs_true, block=25, blocks=400, jitter_s=0.0, seed=0):
+    rng = np.random.default_rng(seed)
+    for i in range(1, blocks + 1):
+        stats.update(i * block / fs_true + rng.normal(0, jitter_s), block)
+
+
+def test_rate_of_exact_clock():
+    stats = StreamStats(fs=250)
+    _feed(stats, 250)
+
+    assert stats.effective_fs == pytest.approx(250, rel=1e-9)
+    assert stats.drift_ppm == pytest.approx(0, abs=1e-3)
+    assert stats.jitter == pytest.approx(0, abs=1e-9)
+    assert stats.gaps == 0
+
+
+def test_drift_of_fast_clock():
+    # a device clock 500 ppm fast delivers its samples early
+    stats = StreamStats(fs=250)
+    _feed(stats, 250 * 1.0005)
+
+    assert stats.drift_ppm == pytest.approx(500, rel=1e-6)
+
+
+def test_rate_fit_averages_out_jitter():
+    stats = StreamStats(fs=1000)
+    _feed(stats, 1000 * 0.999, block=50, blocks=2000, jitter_s=0.005)
+
+    assert stats.drift_ppm == pytest.approx(-1000, abs=20)
+    # lateness is the difference of two jittered arrivals: sqrt(2) times the arrival jitter
+    assert stats.jitter == pytest.approx(0.005 * np.sqrt(2), rel=0.1)
+
+
+def test_not_enough_blocks():
+    stats = StreamStats(fs=100)
+    stats.update(0.1, 10)
+    stats.update(0.2, 10)
+
+    assert stats.effective_fs is None and stats.drift_ppm is None
+    assert stats.jitter == 0.0
+
+
+def test_sequence_numbers_count_lost_samples_as_elapsed():
+    stats = StreamStats(fs=100)
+    seq = 0
+    for i in range(1, 101):
+        if i == 50:
+            seq += 10                               # one block lost in transit
+            continue
+        stats.update(i * 0.1, 10, np.arange(seq, seq + 10))
+        seq += 10
+
+    assert stats.lost_samples == 10
+    assert stats.samples == 990
+    assert stats.effective_fs == pytest.approx(100, rel=1e-9)
+    assert stats.gaps == 0                          # a 0.1 s hole is under the gap threshold
+
+
+def test_gap_detected():
+    stats = StreamStats(fs=100, gap_threshold_s=0.25)
+    for t in (0.1, 0.2, 0.3, 1.0, 1.1):
+        stats.update(t, 10)
+
+    assert stats.gaps == 1
+    assert stats.gap_seconds == pytest.approx(0.6)
+    assert stats.max_interval == pytest.approx(0.7)
+
+
+def test_saved_summary(tmp_path):
+    recording = str(tmp_path / "baseline.rec")
+    assert load_stats(recording) is None
+
+    stats = StreamStats(fs=250)
+    _feed(stats, 250)
+    stats.save(recording)
+
+    saved = load_stats(recording)
+    assert saved["samples"] == stats.samples
+    assert saved["effective_fs"] == pytest.approx(stats.effective_fs)
@@ -0,0 +1,123 @@
+# test_patientCatalog.py
+#   • session numbers: consecutive per patient, sessions from before the catalogue, workbooks already on disk
+#   • a number taken back after a failed save is handed out again; analyzed sessions are never removed
+#   • concurrent allocation from several connections, recording settings / results and lookups
+#_______________________________________________________________________________#
+
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from patientCatalog import PatientCatalog, channel_mask
+from sessionStore import store_path
+
+
+@pytest.fixture
+def records(tmp_path):
+    return tmp_path / "Patient Records"
+
+
+@pytest.fixture
+def catalog(records):
+    return PatientCatalog(str(records / "catalog.sqlite3"))
+
+
+def _touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "w").close()
+
+
+def test_numbers_per_patient(catalog):
+    assert [catalog.new_session("x", age="30") for _ in range(3)] == [1, 2, 3]
+    assert catalog.new_session("y") == 1
+
+    sessions = catalog.sessions("x")
+    assert [s["number"] for s in sessions] == [1, 2, 3]
+    assert sessions[0]["workbook"] == catalog.workbook_path("x", 1)
+    assert sessions[0]["store"] == store_path(catalog.workbook_path("x", 1))
+    assert {p["name"]: p["age"] for p in catalog.patients()} == {"x": "30", "y": None}
+
+
+def test_folder_from_before_the_catalogue(catalog):
+    for number in (1, 2, 5):
+        _touch(catalog.workbook_path("old", number))
+    _touch(os.path.join(catalog.records_dir, "Patient_old", "notes.xlsx"))
+
+    assert catalog.new_session("old") == 6
+    assert [s["number"] for s in catalog.sessions("old")] == [1, 2, 5, 6]
+
+
+def test_workbook_or_store_on_disk_is_skipped(catalog):
+    assert catalog.new_session("x") == 1
+    # written later by a station without the catalogue: the folder is not scanned again
+    _touch(catalog.workbook_path("x", 2))
+    os.makedirs(store_path(catalog.workbook_path("x", 3)))
+
+    assert catalog.new_session("x") == 4
+    assert [s["number"] for s in catalog.sessions("x")] == [1, 2, 3, 4]
+
+
+def test_number_reused_after_failed_save(catalog):
+    assert catalog.new_session("x") == 1
+    number = catalog.new_session("x")
+    catalog.remove_session("x", number)         # recFuncs.save_input could not write the workbook
+
+    assert catalog.new_session("x") == number
+    assert len(catalog.sessions("x")) == 2
+
+
+def test_analyzed_session_is_not_removed(catalog):
+    number = catalog.new_session("x")
+    catalog.record_results(catalog.workbook_path("x", number), {"ecg": {"diff": np.float64(1.5)}})
+    catalog.remove_session("x", number)
+
+    (session,) = catalog.sessions("x")
+    assert session["results"] == {"ecg": {"baseline": None, "test": None, "diff": 1.5, "flags": None}}
+
+
+def test_concurrent_allocation(records):
+    PatientCatalog(str(records / "catalog.sqlite3")).new_session("x")
+    numbers, errors = [], []
+
+    def allocate():
+        catalog = PatientCatalog(str(records / "catalog.sqlite3"))  # a station of its own
+        try:
+            for _ in range(10):
+                numbers.append(catalog.new_session("x"))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=allocate) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert sorted(numbers) == list(range(2, 42))
+
+
+def test_recording_settings_and_lookups(catalog):
+    first = catalog.workbook_path("x", catalog.new_session("x"))
+    second = catalog.workbook_path("x", catalog.new_session("x"))
+    catalog.record_recording(first, {"device_option": "ESP32", "sample_rate": 250, "signals": [True, True, False]})
+    catalog.record_recording(second, {"device_option": "BITalino", "sample_rate": 1000, "signals": [True] * 3})
+    catalog.record_results(second, {}, {"ecg": {"classification": "normal", "confidence": np.float32(0.5)}})
+
+    (esp32,) = catalog.sessions(device="ESP32")
+    assert esp32["sample_rate"] == 250 and esp32["channels"] == channel_mask([True, True, False]) == "110"
+    (analyzed,) = catalog.sessions(with_results=True)
+    assert analyzed["results"] == {"ml": {"classification": "normal", "confidence": 0.5, "anomaly_count": None}}
+    assert [s["number"] for s in catalog.sessions(with_results=False)] == [1]
+    assert catalog.sessions(since="2999-01-01") == []
+
+
+def test_rebuild(catalog):
+    for patient, number in (("a", 1), ("a", 2), ("b", 7)):
+        _touch(catalog.workbook_path(patient, number))
+
+    assert catalog.rebuild() == 3
+    assert catalog.rebuild() == 3
+    assert catalog.new_session("b") == 8
@@ -0,0 +1,81 @@
+# test_ringBuffer.py
+#   • RingBuffer writes and reads across the wrap point, oversized blocks, clipping and pickling
+#_______________________________________________________________________________#
+
+import pickle
+
+import numpy as np
+import pytest
+
+from ringBuffer import RingBuffer
+
+
+@pytest.fixture
+def ring():
+    with RingBuffer(8, n_channels=3) as buf:
+        yield buf
+
+
+def _samples(start, stop):
+    # sample i holds i, i + 0.1, i + 0.2: easy to recognise after a wrap
+    index = np.arange(start, stop, dtype=np.float64)[:, None]
+    return index + np.array([0.0, 0.1, 0.2])
+
+
+def test_wraparound_keeps_newest_samples(ring):
+    ring.write(_samples(0, 5))
+    ring.write(_samples(5, 11))     # wraps: samples 0-2 are overwritten
+
+    assert ring.count == 11
+    assert ring.oldest() == 3
+    np.testing.assert_array_equal(ring.to_array(), _samples(3, 11))
+    np.testing.assert_array_equal(ring.read(6, 10), _samples(6, 10))
+    np.testing.assert_array_equal(ring.latest(3), _samples(8, 11))
+
+
+def test_block_larger_than_capacity(ring):
+    ring.write(_samples(0, 3))
+    ring.write(_samples(3, 23))
+
+    assert ring.count == 23
+    np.testing.assert_array_equal(ring.to_array(), _samples(15, 23))
+
+
+def test_single_sample_and_empty_block(ring):
+    ring.write(np.array([1.0, 2.0, 3.0]))
+    ring.write(np.empty((0, 3)))
+
+    assert len(ring) == 1
+    np.testing.assert_array_equal(ring.to_array(), [[1.0, 2.0, 3.0]])
+
+
+def test_read_clips_to_held_range(ring):
+    ring.write(_samples(0, 12))
+
+    np.testing.assert_array_equal(ring.read(0, 100), _samples(4, 12))
+    assert ring.read(20).shape == (0, 3)
+    assert ring.read(9, 5).shape == (0, 3)
+
+
+def test_view_without_wrap(ring):
+    ring.write(_samples(0, 6))
+    view = ring.read(1, 4)
+
+    assert view.base is not None    # a view into shared memory, not a copy
+    np.testing.assert_array_equal(view, _samples(1, 4))
+
+
+def test_pickled_buffer_attaches_to_same_memory(ring):
+    ring.write(_samples(0, 10))
+    other = pickle.loads(pickle.dumps(ring))
+    try:
+        np.testing.assert_array_equal(other.to_array(), ring.to_array())
+        ring.write(_samples(10, 11))
+        assert other.count == 11
+    finally:
+        other.close()
+
+
+def test_capacity_must_be_positive():
+    with pytest.raises(ValueError):
+        RingBuffer(0)
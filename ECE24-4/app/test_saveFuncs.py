@@ -0,0 +1,99 @@
+# test_saveFuncs.py
+#   • write_data_sheet round trip through openpyxl: values, decimation, a disabled column, escaping,
+#     headers (kept, missing, empty), the sheet's own settings and the other sheets
+#_______________________________________________________________________________#
+
+import numpy as np
+import pytest
+from openpyxl import Workbook, load_workbook
+from openpyxl.styles import Font
+
+from saveFuncs import block_mean, write_data_sheet
+
+
+def _values(ws, column, first_row=2):
+    return [row[0] for row in ws.iter_rows(min_row=first_row, min_col=column, max_col=column, values_only=True)]
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    path = str(tmp_path / "patient_1.xlsx")
+    wb = Workbook()
+    info = wb.active
+    info.title = "Patient Info"
+    info["A1"], info["B1"] = "Name", "A & B <test>"
+
+    data = wb.create_sheet("Baseline Data")
+    for column, name in zip("ABC", ("EMG", "ECG", "EDA")):
+        data[f"{column}1"] = name
+        data[f"{column}1"].font = Font(bold=True)
+    data.freeze_panes = "A2"
+    data.column_dimensions["B"].width = 21
+    data["A2"] = 99.0          # rows of an earlier save, replaced
+    wb.create_sheet("Test Data")
+    wb.save(path)
+    return path
+
+
+def test_round_trip(workbook):
+    emg = np.linspace(0, 1, 10)
+    eda = np.arange(7, dtype=np.float64)
+    eda[3] = np.nan
+    write_data_sheet(workbook, "Baseline Data", [emg, None, eda], note='full rate in "x.sigz" & <more>')
+
+    wb = load_workbook(workbook)
+    ws = wb["Baseline Data"]
+    assert [c.value for c in ws[1][:5]] == ["EMG", "ECG", "EDA", None, 'full rate in "x.sigz" & <more>']
+    assert ws["A1"].font.bold and ws["C1"].font.bold
+    assert ws.freeze_panes == "A2"
+    assert ws.column_dimensions["B"].width == 21
+
+    np.testing.assert_allclose(_values(ws, 1), emg)
+    assert _values(ws, 2) == [None] * 10                       # disabled channel
+    assert _values(ws, 3) == [0, 1, 2, None, 4, 5, 6, None, None, None]
+    assert ws.max_row == 11
+
+    assert wb["Patient Info"]["B1"].value == "A & B <test>"
+    assert wb.sheetnames == ["Patient Info", "Baseline Data", "Test Data"]
+
+
+def test_decimation(workbook):
+    values = np.arange(10, dtype=np.float64)
+    write_data_sheet(workbook, "Baseline Data", [values, values, values], decimate=4)
+
+    ws = load_workbook(workbook)["Baseline Data"]
+    assert _values(ws, 2) == [1.5, 5.5, 8.5]
+    np.testing.assert_array_equal(block_mean(values, 4), [1.5, 5.5, 8.5])
+
+
+def test_headers_written_where_missing(tmp_path):
+    path = str(tmp_path / "patient_2.xlsx")
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Test Data"
+    ws["E1"] = "note of an earlier export"     # row 1 without header cells in the data columns
+    ws["B1"].font = Font(italic=True)          # styled but empty
+    wb.save(path)
+
+    names = ("EMG & 1", "<ECG>", "EDA")
+    write_data_sheet(path, "Test Data", [np.ones(3)] * 3, names=names)
+
+    ws = load_workbook(path)["Test Data"]
+    assert [c.value for c in ws[1][:3]] == list(names)
+    assert ws["B1"].font.italic
+    assert ws["E1"].value is None               # a note is only written when given
+
+
+def test_many_columns(workbook):
+    columns = [np.full(2, float(j)) for j in range(30)]
+    names = tuple(f"ch{j}" for j in range(30))
+    write_data_sheet(workbook, "Test Data", columns, names=names, note="end")
+
+    ws = load_workbook(workbook)["Test Data"]
+    assert ws["AD1"].value == "ch29" and ws["AD3"].value == 29
+    assert ws["AF1"].value == "end"
+
+
+def test_unknown_sheet(workbook):
+    with pytest.raises(KeyError):
+        write_data_sheet(workbook, "Missing", [np.ones(2)])
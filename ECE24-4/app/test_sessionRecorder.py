@@ -0,0 +1,82 @@
+# test_sessionRecorder.py
+#   • ChunkRecorder / load_recording round trip: blocks across chunk boundaries, header, disabled channels
+#   • a recording cut short by a crash keeps its complete chunks; timing stats saved on close
+#_______________________________________________________________________________#
+
+import os
+
+import numpy as np
+
+from acqEngine import Block
+from acqStats import load_stats
+from sessionRecorder import ChunkRecorder, iter_chunks, load_recording, read_header, recording_path
+
+
+def _samples(start, stop):
+    index = np.arange(start, stop, dtype=np.float64)[:, None]
+    return index + np.array([0.0, 0.1, 0.2])
+
+
+def test_recording_path():
+    path = os.path.join("Patient Records", "Patient_x", "x_3.xlsx")
+    assert recording_path(path, "baseline") == os.path.join("Patient Records", "Patient_x", "x_3_baseline.rec")
+
+
+def test_round_trip_across_chunks(tmp_path):
+    path = str(tmp_path / "x_baseline.rec")
+    with ChunkRecorder(path, 100, "ESP32", chunk_size=8, units="V", enabled=[True, True, True]) as recorder:
+        for start, stop in ((0, 3), (3, 3), (3, 20), (20, 21), (21, 37)):
+            recorder.write(_samples(start, stop))
+        assert recorder.samples_written == 37
+
+    header, data = load_recording(path)
+    np.testing.assert_array_equal(data, _samples(0, 37))
+    assert header == read_header(path)
+    assert header["fs"] == 100 and header["device"] == "ESP32" and header["units"] == "V"
+    assert header["channels"] == ["EMG", "ECG", "EDA"]
+    assert [len(chunk) for _, chunk in iter_chunks(path)] == [8, 8, 8, 8, 5]
+
+
+def test_disabled_channel_stays_nan(tmp_path):
+    path = str(tmp_path / "x_test.rec")
+    block = _samples(0, 10)
+    block[:, 1] = np.nan
+    with ChunkRecorder(path, 250, "BITalino", enabled=[True, False, True]) as recorder:
+        recorder.write(block)
+
+    header, data = load_recording(path)
+    assert header["enabled"] == [True, False, True]
+    assert np.isnan(data[:, 1]).all()
+    np.testing.assert_array_equal(data[:, [0, 2]], block[:, [0, 2]])
+
+
+def test_empty_recording(tmp_path):
+    path = str(tmp_path / "empty.rec")
+    ChunkRecorder(path, 100, "ESP32").close()
+
+    header, data = load_recording(path)
+    assert data.shape == (0, 3)
+    assert load_stats(path) is None             # no blocks, no timing sidecar
+
+
+def test_truncated_file_keeps_complete_chunks(tmp_path):
+    path = str(tmp_path / "crash.rec")
+    with ChunkRecorder(path, 100, "ESP32", chunk_size=10) as recorder:
+        recorder.write(_samples(0, 30))
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 17)  # the last chunk is cut in the middle
+
+    _, data = load_recording(path)
+    np.testing.assert_array_equal(data, _samples(0, 20))
+
+
+def test_subscriber_saves_timing(tmp_path):
+    path = str(tmp_path / "timed.rec")
+    with ChunkRecorder(path, 100, "ESP32", chunk_size=16) as recorder:
+        for i in range(10):
+            recorder(Block("esp32", 0.1 * (i + 1), 10 * i, _samples(10 * i, 10 * i + 10)))
+
+    _, data = load_recording(path)
+    assert len(data) == 100
+    stats = load_stats(path)
+    assert stats["samples"] == 100 and stats["blocks"] == 10
@@ -0,0 +1,112 @@
+# test_sessionStore.py
+#   • SessionStore round trip: phases written as (n, 3), read channel-major, disabled channels NaN / None
+#   • metadata (JSON-safe results), phases from a .rec recording and from an old workbook, Excel export
+#_______________________________________________________________________________#
+
+import os
+
+import numpy as np
+import pytest
+from openpyxl import Workbook, load_workbook
+
+from sessionRecorder import ChunkRecorder
+from sessionStore import SessionStore, export_excel, store_path
+
+
+def _phase(n, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, 3))
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    folder = tmp_path / "Patient_x"
+    folder.mkdir()
+    path = str(folder / "x_1.xlsx")
+    wb = Workbook()
+    wb.active.title = "Patient Info"
+    for title in ("Baseline Data", "Test Data"):
+        ws = wb.create_sheet(title)
+        ws.append(["EMG", "ECG", "EDA"])
+    wb.save(path)
+    return path
+
+
+def test_store_path():
+    assert store_path(os.path.join("Patient_x", "x_3.xlsx")) == os.path.join("Patient_x", "x_3.session")
+
+
+def test_write_then_read(workbook):
+    data = _phase(500)
+    data[:, 2] = np.nan
+    store = SessionStore.for_workbook(workbook)
+    assert not store.exists()
+    store.write_phase("baseline", data, 250, enabled=[True, True, False], units="V",
+                      timing={"effective_fs": 249.9, "drift_ppm": np.float64(-400.0)})
+
+    # a fresh object reads everything back from disk
+    store = SessionStore.for_workbook(workbook)
+    assert store.exists() and store.phases() == ["baseline"]
+    assert store.fs() == 250
+    info = store.phase_info("baseline")
+    assert info["samples"] == 500 and info["enabled"] == [True, True, False] and info["units"] == "V"
+    assert info["timing"]["drift_ppm"] == -400.0
+
+    loaded = store.load_phase("baseline")
+    assert isinstance(loaded, np.memmap) and loaded.shape == (3, 500)
+    np.testing.assert_array_equal(loaded[:2], data[:, :2].T)
+    assert np.isnan(loaded[2]).all()
+    np.testing.assert_array_equal(store.channel("baseline", "ECG"), data[:, 1])
+    assert store.channel("baseline", "EDA") is None
+
+
+def test_meta_keeps_only_json_values(workbook):
+    store = SessionStore.for_workbook(workbook)
+    store.write_results({"ecg": {"baseline": {"mean": np.float32(1.5), "peaks": (1, 2)},
+                                 "filter": object(), "diff": float("nan")}},
+                        {"ecg": {"classification": "normal"}})
+
+    results = SessionStore.for_workbook(workbook).meta["results"]
+    assert results["stats"] == {"ecg": {"baseline": {"mean": 1.5, "peaks": [1, 2]}, "diff": None}}
+    assert results["ml"] == {"ecg": {"classification": "normal"}}
+
+
+def test_phase_from_recording(workbook, tmp_path):
+    rec = str(tmp_path / "x_1_test.rec")
+    data = _phase(40, seed=1)
+    with ChunkRecorder(rec, 100, "BITalino", chunk_size=16, units=["mV", "mV", "uS"], enabled=[True] * 3) as recorder:
+        recorder.write(data)
+
+    store = SessionStore.for_workbook(workbook)
+    store.write_phase_from_recording("test", rec)
+    assert store.phase_info("test")["units"] == ["mV", "mV", "uS"]
+    np.testing.assert_array_equal(store.load_phase("test", mmap=False), data.T)
+
+
+def test_phase_from_old_workbook(workbook):
+    wb = load_workbook(workbook)
+    ws = wb["Baseline Data"]
+    for row in ([1.0, 2.0, None], [3.0, 4.0, None], [5.0, 6.0, None]):
+        ws.append(row)
+    wb.save(workbook)
+
+    store = SessionStore.for_workbook(workbook)
+    store.write_phase_from_workbook("baseline", workbook, 100, enabled=[True, True, False])
+    np.testing.assert_array_equal(store.channel("baseline", "EMG"), [1.0, 3.0, 5.0])
+    assert store.channel("baseline", "EDA") is None
+
+
+def test_export_excel(workbook):
+    store = SessionStore.for_workbook(workbook)
+    data = np.arange(30, dtype=np.float64).reshape(10, 3)
+    store.write_phase("baseline", data, 100, enabled=[True, False, True])
+    store.write_phase("test", data * 2, 100)
+
+    export_excel(workbook, decimate=2)
+
+    wb = load_workbook(workbook)
+    baseline = list(wb["Baseline Data"].iter_rows(values_only=True))
+    assert baseline[0][:3] == ("EMG", "ECG", "EDA")
+    assert "x_1.session" in baseline[0][4]
+    assert [row[:3] for row in baseline[1:]] == [(1.5, None, 3.5), (7.5, None, 9.5), (13.5, None, 15.5),
+                                                (19.5, None, 21.5), (25.5, None, 27.5)]
+    assert wb["Test Data"]["B2"].value == 5.0
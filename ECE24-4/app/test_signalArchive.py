@@ -0,0 +1,71 @@
+# test_signalArchive.py
+#   • chunk codec round trip (zigzag deltas, byte shuffle, zlib): integer widths, NaNs, disabled channels
+#   • archive files: random access across chunks, resolution by unit
+#_______________________________________________________________________________#
+
+import numpy as np
+import pytest
+
+from signalArchive import (RESOLUTION, UNIT_RESOLUTION, ArchiveWriter, SignalArchive, decode_chunk, encode_chunk,
+                           pick_resolution, read_archive, write_archive)
+
+
+@pytest.mark.parametrize("step", [1, 200, 40_000, 3_000_000_000])
+def test_integer_chunk_round_trip(step):
+    # steps that need 1, 2, 4 and 8 byte deltas, up and down
+    rng = np.random.default_rng(step)
+    data = np.cumsum(rng.integers(-step, step + 1, size=(3, 1000)), axis=1).astype(np.float64)
+    blob = encode_chunk(data, [True] * 3, [1] * 3)
+
+    np.testing.assert_array_equal(decode_chunk(blob, data.shape[1], [True] * 3, [1] * 3), data)
+
+
+def test_quantized_chunk_with_nans_and_disabled_channel():
+    rng = np.random.default_rng(1)
+    data = rng.normal(0, 1.5, size=(3, 500))
+    data[0, [0, 7, 499]] = np.nan
+    data[2] = np.nan
+    enabled, resolution = [True, True, False], [RESOLUTION] * 3
+
+    restored = decode_chunk(encode_chunk(data, enabled, resolution), 500, enabled, resolution)
+
+    np.testing.assert_array_equal(np.isnan(restored), np.isnan(data))
+    finite = ~np.isnan(data)
+    assert np.max(np.abs(restored[finite] - data[finite])) <= 0.5 / RESOLUTION + 1e-12
+
+
+def test_archive_random_access_across_chunks(tmp_path):
+    rng = np.random.default_rng(2)
+    data = np.round(rng.normal(0, 1, size=(3, 2500)), 3)
+    path = str(tmp_path / "rec.sigz")
+    with ArchiveWriter(path, fs=250, resolution=[1000] * 3, chunk_samples=512) as archive:
+        for start in range(0, data.shape[1], 300):
+            archive.write(data[:, start:start + 300])
+
+    archive = SignalArchive(path)
+    assert archive.fs == 250 and len(archive) == 2500
+    np.testing.assert_allclose(archive.read(), data, atol=1e-9)
+    np.testing.assert_allclose(archive.read(500, 1100), data[:, 500:1100], atol=1e-9)
+    assert archive.read(3000).shape == (3, 0)
+
+
+def test_resolution_follows_units(tmp_path):
+    counts = np.array([[0, 5, 1023]] * 3, dtype=np.float64)
+    assert pick_resolution(counts) == [1] * 3
+    assert pick_resolution(counts / 7, ["mV", "mV", "uS"]) == [UNIT_RESOLUTION["mV"], UNIT_RESOLUTION["mV"],
+                                                              UNIT_RESOLUTION["uS"]]
+    assert pick_resolution(counts / 7) == [RESOLUTION] * 3
+
+    path = str(tmp_path / "mv.sigz")
+    data = np.linspace(-1.5, 1.5, 3000).reshape(3, -1)
+    write_archive(path, data, 1000, units=["mV", "mV", "uS"])
+    assert np.max(np.abs(read_archive(path) - data)) <= 0.5 / UNIT_RESOLUTION["mV"] + 1e-12
+
+
+def test_unfinished_writer_leaves_no_file(tmp_path):
+    path = tmp_path / "broken.sigz"
+    with pytest.raises(RuntimeError):
+        with ArchiveWriter(str(path), fs=100) as archive:
+            archive.write(np.zeros((3, 10)))
+            raise RuntimeError
+    assert not path.exists()
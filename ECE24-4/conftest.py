@@ -0,0 +1,13 @@
+# conftest.py
+#   • the modules import each other by bare name across app/, processing/ and hardware/,
+#     so the tests get all three folders on the path
+#_______________________________________________________________________________#
+
+import os
+import sys
+
+_ROOT = os.path.dirname(os.path.abspath(__file__))
+for folder in ("app", "processing", "hardware"):
+    path = os.path.join(_ROOT, folder)
+    if path not in sys.path:
+        sys.path.insert(0, path)
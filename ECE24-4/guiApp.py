@@ -17,9 +17,8 @@ Supports two workflows from a single entry point:
 import tkinter as tk
 from tkinter import ttk, filedialog
 from ttkbootstrap import Style
+import io
 import os
-import json
-import shutil
 import threading
 import numpy as np
 import customtkinter as ctk
@@ -27,7 +26,6 @@ import platform
 from itertools import cycle
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
 from PIL import Image, ImageTk
-import pandas as pd
 
 from recFuncs import (
     check_utilities,
@@ -44,6 +42,9 @@ from recFuncs import (
     mac_options,
 )
 import procResult
+from figureRender import build_figure, get_renderer
+from sdCard import (ARCHIVED_SEQUENCE_FILES, SEQUENCE_FILES, SESSION_INFO, find_csvs, find_recordings,
+                    is_sd_folder, load_session_info, recording_fs, signal_sources)
 
 # DPI awareness for Windows high-DPI displays
 if platform.system() == "Windows":
@@ -84,99 +85,35 @@ def _make_banner(parent, title, back_cmd=None, next_cmd=None,
     return banner
 
 
-# ── SD card / CSV conversion helpers ────────────────────────────────────────
+# ── Result figures ──────────────────────────────────────────────────────────
 
-# Canonical column names the SD card might use (case-insensitive)
-_ECG_NAMES = {"ecg", "ecg_mv", "ecg_raw"}
-_EDA_NAMES = {"eda", "eda_us", "eda_raw"}
-_EMG_NAMES = {"emg", "emg_mv", "emg_raw"}
-
-def _detect_signal_columns(df):
+def _figure_panel(parent, spec, title):
     """
-    Locate ECG, EDA, EMG columns regardless of order or case.
-    Also handles a leading 'timestamp' column gracefully.
-
-    Returns:
-        (ecg_col, eda_col, emg_col) — column name strings, or None if absent.
-
-    Raises:
-        ValueError if none of the three signals can be found at all.
+    Frame showing a result figure as its rendered PNG (the same bytes as in
+    the patient workbook), with a button that opens a zoomable view.
     """
-    cols_lower = {c.lower(): c for c in df.columns}
-
-    ecg_col = next((cols_lower[k] for k in cols_lower if k in _ECG_NAMES), None)
-    eda_col = next((cols_lower[k] for k in cols_lower if k in _EDA_NAMES), None)
-    emg_col = next((cols_lower[k] for k in cols_lower if k in _EMG_NAMES), None)
-
-    # Fallback: if the file has no recognizable headers, assume positional order
-    # after dropping any timestamp column.
-    if ecg_col is None and eda_col is None and emg_col is None:
-        non_ts = [c for c in df.columns
-                  if "time" not in c.lower() and "stamp" not in c.lower()]
-        if len(non_ts) >= 3:
-            # We don't know the exact order — document says "idk what the order is"
-            # so we map by position: col0→ECG, col1→EDA, col2→EMG as a safe default.
-            ecg_col, eda_col, emg_col = non_ts[0], non_ts[1], non_ts[2]
-            print(f"[WARNING] Could not detect signal columns by name. "
-                  f"Assuming positional order: ECG={ecg_col}, EDA={eda_col}, EMG={emg_col}")
-        else:
-            raise ValueError(
-                f"Cannot find ECG/EDA/EMG columns. Found: {list(df.columns)}"
-            )
-
-    return ecg_col, eda_col, emg_col
-
-
-def convert_csv_in_folder(folder, baseline_seconds=30):
-    """
-    Finds the first CSV in *folder*, splits it into baseline and test halves,
-    writes baseline_sequence.txt and test_sequence.txt (space-separated,
-    columns: ECG EMG EDA — the order procFuncs.import_matrix_from_txt expects).
-
-    Returns True if conversion succeeded, False if no CSV was found.
-    Raises ValueError on malformed data.
-    """
-    csv_files = [f for f in os.listdir(folder) if f.endswith(".csv")]
-    if not csv_files:
-        return False
-
-    csv_path = os.path.join(folder, csv_files[0])
-    df = pd.read_csv(csv_path)
-
-    # Determine sampling rate (look for 'fs' column or fall back to 100 Hz)
-    if "fs" in df.columns:
-        fs = int(df["fs"].iloc[0])
-    else:
-        fs = 100
-        print(f"[WARNING] No 'fs' column found in {csv_files[0]}. Assuming {fs} Hz.")
-
-    ecg_col, eda_col, emg_col = _detect_signal_columns(df)
-
-    split_idx = baseline_seconds * fs
-    if split_idx >= len(df):
-        raise ValueError(
-            f"Baseline duration ({baseline_seconds}s × {fs}Hz = {split_idx} samples) "
-            f"exceeds recording length ({len(df)} samples)."
-        )
-
-    # procFuncs.import_matrix_from_txt reads columns as: EMG, ECG, EDA
-    col_order = [
-        ecg_col if emg_col is None else emg_col,  # col 0 → EMG
-        eda_col if ecg_col is None else ecg_col,  # col 1 → ECG
-        emg_col if eda_col is None else eda_col,  # col 2 → EDA
-    ]
-    # Compact rewrite: always use the detected names in the right slot
-    col_order = [emg_col or ecg_col, ecg_col or emg_col, eda_col or emg_col]
-
-    baseline_df = df.iloc[:split_idx][col_order]
-    test_df     = df.iloc[split_idx:][col_order]
-
-    baseline_df.to_csv(os.path.join(folder, "baseline_sequence.txt"),
-                       index=False, header=False, sep=" ")
-    test_df.to_csv(os.path.join(folder, "test_sequence.txt"),
-                   index=False, header=False, sep=" ")
-
-    return True
+    frame = tk.Frame(parent)
+    photo = ImageTk.PhotoImage(Image.open(io.BytesIO(get_renderer().png(spec))))
+    label = tk.Label(frame, image=photo)
+    label.image = photo # Tk does not keep a reference
+    label.pack(fill="both", expand=True)
+    ctk.CTkButton(frame, text="Interactive view", width=120,
+                  command=lambda: _open_interactive_figure(parent, spec, title)
+                  ).pack(anchor="e", pady=(5, 0))
+    return frame
+
+
+def _open_interactive_figure(parent, spec, title):
+    """Opens a window with the figure of a spec on a zoomable canvas (built on demand)."""
+    window = tk.Toplevel(parent)
+    window.title(title)
+    fig = build_figure(spec)
+    fig.set_size_inches(14, 6)
+    canvas = FigureCanvasTkAgg(fig, master=window)
+    canvas.draw()
+    canvas.get_tk_widget().pack(fill="both", expand=True)
+    tb = NavigationToolbar2Tk(canvas, window)
+    tb.update()
 
 
 # ============================================================================
@@ -908,13 +845,16 @@ class LoadDataPage(ttk.Frame):
 
     Accepted folder contents:
         baseline_sequence.txt + test_sequence.txt  (space-separated, columns: EMG ECG EDA)
-        OR a single CSV with columns: timestamp, ECG, EDA, EMG (any order/case)
+        OR their signalArchive archives: baseline_sequence.sigz + test_sequence.sigz
+        OR the firmware CSV export: Timestamp (ms), ECG (V), EMG (V), EDA (V) (any order/case,
+           one recording may be split over several CSVs)
+    A card with one subfolder per test lists the subfolders; pick one of them.
 
     Optional:
         session_info.json — auto-populates sample rate and channel settings.
     """
 
-    REQUIRED_FILES = ("baseline_sequence.txt", "test_sequence.txt")
+    REQUIRED_FILES = SEQUENCE_FILES
 
     def __init__(self, parent, controller):
         super().__init__(parent)
@@ -994,48 +934,44 @@ class LoadDataPage(ttk.Frame):
         for w in self.file_status_frame.winfo_children():
             w.destroy()
 
-        # Try CSV conversion if sequence files are absent
-        txt_missing = [f for f in self.REQUIRED_FILES
+        # Sequence files (or their archives) are read where they are; CSVs are split when the analysis runs
+        sequence_files = self.REQUIRED_FILES
+        if all(os.path.isfile(os.path.join(folder, f)) for f in ARCHIVED_SEQUENCE_FILES):
+            sequence_files = ARCHIVED_SEQUENCE_FILES
+        txt_missing = [f for f in sequence_files
                        if not os.path.isfile(os.path.join(folder, f))]
-
-        if txt_missing:
-            try:
-                baseline_sec = int(float(self.baseline_sec_var.get()))
-            except ValueError:
-                baseline_sec = 30
-
-            try:
-                converted = convert_csv_in_folder(folder, baseline_seconds=baseline_sec)
-                if converted:
-                    ttk.Label(self.file_status_frame,
-                              text="  ✓  CSV detected → converted to sequence files",
-                              font=("Calibri Light", 12), foreground="green").pack(anchor="w")
-            except Exception as e:
-                ttk.Label(self.file_status_frame,
-                          text=f"  ⚠  CSV conversion failed: {e}",
-                          font=("Calibri Light", 12), foreground="orange").pack(anchor="w")
+        csv_paths = find_csvs(folder) if txt_missing else []
 
         missing = []
-        for fname in self.REQUIRED_FILES:
-            present = os.path.isfile(os.path.join(folder, fname))
+        if csv_paths:
+            names = ", ".join(os.path.basename(p) for p in csv_paths[:3]) + (" …" if len(csv_paths) > 3 else "")
             ttk.Label(self.file_status_frame,
-                      text=f"  {'✓' if present else '✗'}  {fname}",
-                      font=("Calibri Light", 12),
-                      foreground="green" if present else "red"
-                      ).pack(anchor="w")
-            if not present:
-                missing.append(fname)
-
-        info_path = os.path.join(folder, "session_info.json")
-        if os.path.isfile(info_path):
+                      text=f"  ✓  {names}  (split into baseline / test when analyzed)",
+                      font=("Calibri Light", 12), foreground="green").pack(anchor="w")
+        else:
+            tests = [f for f in find_recordings(folder) if f != folder]
+            if tests:
+                ttk.Label(self.file_status_frame,
+                          text=f"  ▸  {len(tests)} test folders: "
+                               f"{', '.join(os.path.relpath(t, folder) for t in tests[:5])}"
+                               f"{' …' if len(tests) > 5 else ''}  (select one of them)",
+                          font=("Calibri Light", 12), foreground="orange").pack(anchor="w")
+            for fname in sequence_files:
+                present = fname not in txt_missing
+                ttk.Label(self.file_status_frame,
+                          text=f"  {'✓' if present else '✗'}  {fname}",
+                          font=("Calibri Light", 12),
+                          foreground="green" if present else "red"
+                          ).pack(anchor="w")
+                if not present:
+                    missing.append(fname)
+
+        if os.path.isfile(os.path.join(folder, SESSION_INFO)):
             try:
-                with open(info_path) as f:
-                    info = json.load(f)
-                self.sr_var.set(str(info.get("sample_rate", 100)))
-                ch = info.get("channels", {})
-                self.emg_var.set(bool(ch.get("emg", True)))
-                self.ecg_var.set(bool(ch.get("ecg", True)))
-                self.eda_var.set(bool(ch.get("eda", True)))
+                sample_rate, channels = load_session_info(folder)
+                self.sr_var.set(str(sample_rate or 100))
+                for var, recorded in zip((self.emg_var, self.ecg_var, self.eda_var), channels):
+                    var.set(recorded)
                 ttk.Label(self.file_status_frame,
                           text="  ✓  session_info.json  (parameters loaded)",
                           font=("Calibri Light", 12), foreground="green").pack(anchor="w")
@@ -1062,6 +998,8 @@ class LoadDataPage(ttk.Frame):
 
         missing = [f for f in self.REQUIRED_FILES
                    if not os.path.isfile(os.path.join(folder, f))]
+        if missing and is_sd_folder(folder):
+            missing = []
         if missing:
             self.status_label.config(
                 text=f"Missing required files: {', '.join(missing)}", foreground="red")
@@ -1084,11 +1022,9 @@ class LoadDataPage(ttk.Frame):
             return
 
         try:
-            for fname in self.REQUIRED_FILES:
-                shutil.copy(os.path.join(folder, fname), os.path.join(os.getcwd(), fname))
-        except Exception as e:
-            self.status_label.config(text=f"Could not copy data files: {e}", foreground="red")
-            return
+            baseline_sec = int(float(self.baseline_sec_var.get()))
+        except ValueError:
+            baseline_sec = 30
 
         from recFuncs import filepath, filename
         output_excel = os.path.join(os.getcwd(), filepath, filename)
@@ -1098,13 +1034,18 @@ class LoadDataPage(ttk.Frame):
 
         threading.Thread(
             target=self._run_analysis,
-            args=(output_excel, channels, sample_rate),
+            args=(folder, output_excel, channels, sample_rate, baseline_sec),
             daemon=True,
         ).start()
 
-    def _run_analysis(self, output_excel, channels, sample_rate):
+    def _run_analysis(self, folder, output_excel, channels, sample_rate, baseline_sec):
         try:
-            procResult.main(output_excel, channels, sample_rate, self.controller)
+            # a CSV is split at its own rate: analyze at that rate too
+            sample_rate = recording_fs(folder, sample_rate)
+            with procResult.AnalysisSession(output_excel, channels, sample_rate) as session:
+                # the sequence files are read from the folder; a CSV is split into the session's scratch directory
+                session.sources = signal_sources(folder, baseline_sec, session.workdir, sample_rate)
+                procResult.main(session, self.controller)
         except Exception as e:
             error_msg = str(e)
             self.controller.after(0, lambda: (
@@ -1381,7 +1322,7 @@ class ShapPage(ttk.Frame):
         self.no_shap_label.grid(row=2, column=1, sticky="nsew", pady=40)
 
     def display_results(self, ml_predictions):
-        """Render the ECG anomaly figure stored in ml_predictions['ecg']['fig']."""    
+        """Show the ECG anomaly figure stored in ml_predictions['ecg']['fig']."""    
         print("DEBUG: ShapPage display_results called")
 
         fig = (ml_predictions or {}).get("ecg", {}).get("fig")
@@ -1392,17 +1333,8 @@ class ShapPage(ttk.Frame):
 
         self.no_shap_label.grid_remove()
 
-        shap_frame = tk.Frame(self.frame)
+        shap_frame = _figure_panel(self.frame, fig, "ECG Anomaly Detection")
         shap_frame.grid(row=2, column=0, columnspan=3, sticky="nsew", padx=30, pady=20)
-        fig.set_size_inches(12, 5)
-
-        canvas = FigureCanvasTkAgg(fig, master=shap_frame)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill="both", expand=True)
-
-        tb = NavigationToolbar2Tk(canvas, shap_frame)
-        tb.update()
-        canvas._tkcanvas.pack(fill="both", expand=True)
 
 # ============================================================================
 # STATS RESULTS PAGE
@@ -1531,12 +1463,7 @@ class StatsResultsPage(ttk.Frame):
                 gf = tk.Frame(tab_frame.scrollable_frame, bd=1, relief="groove",
                               padx=30, pady=40)
                 gf.pack(fill="x", pady=10, padx=30)
-                canvas = FigureCanvasTkAgg(fig, master=gf)
-                canvas.draw()
-                canvas.get_tk_widget().pack(fill="both", expand=True)
-                tb = NavigationToolbar2Tk(canvas, gf)
-                tb.update()
-                canvas._tkcanvas.pack(fill="x")
+                _figure_panel(gf, fig, category).pack(fill="both", expand=True)
             self.notebook.add(tab_frame, text=category)
         self.update_idletasks()
 
@@ -1604,22 +1531,7 @@ class GraphPage(ttk.Frame):
                 title = f"{category.upper()} {data_type.capitalize()}"
                 self.figs.append(fig)
 
-                fig.set_size_inches(14, 6)
-                fig.tight_layout()
-
-                gf = tk.Frame(self.notebook)
-                gf.grid_rowconfigure(0, weight=1)
-                gf.grid_rowconfigure(1, weight=0)
-                gf.grid_columnconfigure(0, weight=1)
-
-                canvas = FigureCanvasTkAgg(fig, master=gf)
-                canvas.draw()
-                canvas.get_tk_widget().grid(row=0, column=0, sticky="nsew")
-
-                tb = NavigationToolbar2Tk(canvas, gf, pack_toolbar=False)
-                tb.update()
-                tb.grid(row=1, column=0, sticky="ew")
-
+                gf = _figure_panel(self.notebook, fig, title)
                 self.notebook.add(gf, text=title)
 
         self.update_idletasks()
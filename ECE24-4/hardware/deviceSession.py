@@ -0,0 +1,174 @@
+# deviceSession.py
+#   • one connection to the BITalino / ESP32 box shared by the baseline and test phases
+#   • a heartbeat keeps the link alive (and notices when it drops) while no phase is running
+#   • reconnects with exponential backoff, only after a failure, when the next phase starts
+#_______________________________________________________________________________#
+
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds between heartbeats while the device is idle
+KEEPALIVE_S = 2.0
+# Waits before each reconnection attempt (seconds); one attempt more than there are delays
+RECONNECT_DELAYS_S = (0.5, 1, 2, 4)
+# Heartbeats in a row without a byte from the ESP32 before the link counts as lost
+ESP32_SILENT_BEATS = 2
+
+
+class DeviceSession:
+    """
+    Keeps a device connected from the start of the baseline to the end of the
+    test.
+
+    Use phase() around each acquisition; between phases a background thread
+    sends a heartbeat (BITalino: a version request, ESP32: draining the
+    stream and checking it still flows). A failed heartbeat only drops the
+    link; the next phase() reconnects with backoff on the caller's thread,
+    so the heartbeat never holds the lock through retries.
+
+        session = DeviceSession('bitalino', mac_address)
+        if session.connect():
+            with session.phase() as device:
+                ...
+
+    Attributes:
+        kind (str): 'bitalino' or 'esp32'.
+        address (str): BITalino MAC address (unused for the ESP32).
+        device: The connected bitalino.BITalino or esp32Device.Device, or None.
+    """
+
+    def __init__(self, kind, address=None, on_retry=None, keepalive_s=KEEPALIVE_S):
+        self.kind = kind
+        self.address = address
+        self.on_retry = on_retry # called with the attempt number before each retry (e.g. to tell the user)
+        self.keepalive_s = keepalive_s
+        self.device = None
+
+        self._lock = threading.Lock()
+        self._busy = False
+        self._closed = threading.Event()
+        self._silent_beats = 0
+        self._thread = None
+
+    @property
+    def connected(self):
+        return self.device is not None
+
+    def matches(self, kind, address=None):
+        """True if this session is for the given device."""
+        return self.kind == kind and (kind != 'bitalino' or self.address == address)
+
+    def connect(self):
+        """
+        Connects (if not connected already), retrying with backoff.
+
+        Returns:
+            bool: True if the device is connected.
+        """
+        with self._lock:
+            ok = self._connect_with_backoff()
+        if ok and self._thread is None:
+            self._thread = threading.Thread(target=self._keepalive, daemon=True)
+            self._thread.start()
+        return ok
+
+    @contextmanager
+    def phase(self):
+        """
+        Holds the device for one acquisition and pauses the heartbeat.
+        Reconnects first if the link was lost since the last phase.
+        """
+        if not self.connect():
+            raise ConnectionError(f"{self.kind}: device not connected")
+        with self._lock:
+            self._busy = True
+        try:
+            yield self.device
+        finally:
+            with self._lock:
+                self._busy = False
+                self._silent_beats = 0
+
+    def close(self):
+        """Stops the heartbeat and closes the link."""
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            self._disconnect()
+
+    # ---------------------------------------------------------------------------
+
+    def _open(self):
+        if self.kind == 'bitalino':
+            from bitalino import BITalino
+            return BITalino(self.address)
+
+        from esp32Device import Device
+        device = Device()
+        if not device.connect():
+            raise ConnectionError("ESP32 box not found")
+        return device
+
+    def _connect_with_backoff(self):
+        if self.device is not None:
+            return True
+
+        for attempt, delay in enumerate((0,) + RECONNECT_DELAYS_S):
+            if delay:
+                if self.on_retry is not None:
+                    self.on_retry(attempt)
+                if self._closed.wait(delay):
+                    return False
+            try:
+                self.device = self._open()
+                self._silent_beats = 0
+                print(f"{self.kind}: connected")
+                return True
+            except Exception as e:
+                print(f"{self.kind}: connection attempt {attempt + 1} failed: {e}")
+
+        print(f"{self.kind}: could not connect after {len(RECONNECT_DELAYS_S) + 1} attempts")
+        return False
+
+    def _disconnect(self):
+        if self.device is None:
+            return
+        try:
+            if self.kind == 'bitalino':
+                self.device.close()
+            else:
+                self.device.stop()
+        except Exception as e:
+            print(f"{self.kind}: error while closing: {e}")
+        self.device = None
+
+    def _heartbeat(self):
+        """Raises if the link is gone."""
+        if self.kind == 'bitalino':
+            self.device.version()
+            return
+
+        # the box streams all the time; drop what piled up and check it keeps coming
+        ser = self.device.ser
+        if ser.in_waiting:
+            self._silent_beats = 0
+        else:
+            self._silent_beats += 1
+            if self._silent_beats >= ESP32_SILENT_BEATS:
+                raise ConnectionError("no data from the ESP32 box")
+        ser.reset_input_buffer()
+
+    def _keepalive(self):
+        while not self._closed.wait(self.keepalive_s):
+            with self._lock:
+                if self._busy or self.device is None:
+                    continue
+                try:
+                    self._heartbeat()
+                except Exception as e:
+                    # phase() reconnects; retrying here would block it on the lock
+                    print(f"{self.kind}: link lost ({e}), reconnecting at the next phase")
+                    self._disconnect()
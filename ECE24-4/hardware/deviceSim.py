@@ -0,0 +1,478 @@
+# deviceSim.py
+#   • stand-ins for the acquisition hardware, for running without an ESP32 box or BITalino
+#   • synthetic ECG/EMG/EDA, or replay of a recorded session (.rec, baseline_sequence.txt / .sigz, SD card CSV)
+#   • VirtualEsp32: streams CSV lines or binary frames through a pty-backed serial port
+#   • FakeBitalino: drop-in for bitalino.BITalino (start / read / stop / close)
+#   • 1x, Nx or max speed, optional delivery jitter and dropped frames
+#   • run as a script for an acquisition throughput / latency load test:
+#       python deviceSim.py esp32 --protocol binary --speed max --seconds 20
+#       python deviceSim.py bitalino --replay "Patient Records/Patient_x/x_3_test.rec"
+#
+# The virtual serial port needs a POSIX pty (Linux, macOS).
+#_______________________________________________________________________________#
+
+import argparse
+import os
+import threading
+import time
+
+import numpy as np
+
+from esp32Protocol import (ADS1115_VOLTS_PER_COUNT, SAMPLES_PER_FRAME, FRAME_BYTES,
+                           WIRE_ORDER, encode_frames)
+
+# speed value meaning "as fast as the consumer can take it"
+MAX_SPEED = None
+
+
+#===============================================================================
+# SIGNALS
+#===============================================================================
+def synthetic_signals(fs, duration, heart_rate=72, seed=None):
+    """
+    Generates plausible [EMG, ECG, EDA] front-end voltages.
+
+    ECG: PQRST beats (sum of Gaussians) with some beat-to-beat variability.
+    EMG: noise with occasional contraction bursts.
+    EDA: slow tonic drift plus skin conductance responses.
+
+    Returns:
+        np.ndarray: Shape (fs * duration, 3), volts around the 1.5 V mid rail.
+    """
+    rng = np.random.default_rng(seed)
+    n = int(fs * duration)
+    t = np.arange(n) / fs
+
+    # ECG: offset of every sample from its nearest beat
+    rr = 60 / heart_rate
+    beats = np.cumsum(rng.normal(rr, 0.04 * rr, int(duration / rr) + 2))
+    nxt = np.clip(np.searchsorted(beats, t), 1, len(beats) - 1)
+    prev = beats[nxt - 1]
+    d = np.where(t - prev < beats[nxt] - t, t - prev, t - beats[nxt])
+    waves = ((0.10, -0.20, 0.025), (-0.10, -0.03, 0.010), (1.00, 0.00, 0.012),
+             (-0.20, 0.03, 0.010), (0.30, 0.25, 0.060))
+    ecg = sum(a * np.exp(-((d - mu) / sd) ** 2 / 2) for a, mu, sd in waves)
+
+    # EMG: ~0.5 s bursts every few seconds on top of baseline noise
+    envelope = np.zeros(n)
+    for start in np.arange(rng.uniform(1, 3), duration, 4.0):
+        envelope += np.exp(-((t - start - 0.25) / 0.15) ** 2)
+    emg = rng.normal(0, 1, n) * (0.02 + 0.3 * envelope)
+
+    # EDA: tonic level, slow drift and responses (1 s rise, 3 s decay) every ~8 s
+    eda = 0.05 * np.sin(2 * np.pi * t / 60)
+    for onset in np.arange(rng.uniform(2, 6), duration, 8.0):
+        dt = np.clip(t - onset, 0, None)
+        eda += 0.1 * (1 - np.exp(-dt / 1.0)) * np.exp(-dt / 3.0)
+
+    samples = np.column_stack((emg, ecg, eda))
+    samples += rng.normal(0, 0.005, samples.shape)
+    samples += (1.5, 1.5, 1.0)
+    return samples
+
+
+def load_session(path, fs=None):
+    """
+    Loads a recorded session for replay.
+
+    Supports sessionRecorder .rec files, the baseline_sequence.txt /
+    test_sequence.txt dumps (EMG, ECG, EDA columns, comma or space separated),
+    signalArchive .sigz archives and SD card CSVs with named columns (plus an
+    optional 'fs' column).
+    Missing channels are filled with 1.
+
+    Returns:
+        tuple: (samples (n, 3) [EMG, ECG, EDA], fs or None if unknown,
+                units: procFuncs.BITALINO_UNITS for BITalino recordings, else 'V')
+    """
+    from procFuncs import load_signal_matrix, sniff_signal_file
+
+    fmt = sniff_signal_file(path)
+    samples = np.nan_to_num(load_signal_matrix(path).T, nan=1.0)
+    if fmt["format"] == "rec":
+        from sessionRecorder import read_header
+        header = read_header(path)
+        return samples, header["fs"], header.get("units") or "V"
+    if fmt["format"] == "archive":
+        from signalArchive import SignalArchive
+        return samples, fmt["fs"], SignalArchive(path).header.get("units") or "V"
+    if fmt.get("fs"):
+        fs = int(fmt["fs"])
+    return samples, fs, "V"
+
+
+def is_bitalino_units(units):
+    """True for samples a BITalino recorded (converted to procFuncs.BITALINO_UNITS)."""
+    from procFuncs import BITALINO_UNITS
+    return list(np.atleast_1d(units)) == BITALINO_UNITS
+
+
+def from_bitalino_units(samples):
+    """
+    BITalino counts (0-1023) of samples in procFuncs.BITALINO_UNITS: undoes
+    convert_raw_block, which is linear per channel, so a replayed BITalino
+    recording converts back to the values it was recorded with.
+    """
+    from procFuncs import convert_raw_block
+    zero = convert_raw_block(np.zeros((1, 3)))
+    step = convert_raw_block(np.ones((1, 3))) - zero
+    return np.round((np.asarray(samples, dtype=np.float64) - zero) / step)
+
+
+def to_bitalino_counts(samples):
+    """
+    Maps each channel linearly onto the 10-bit BITalino range (0-1023).
+    Only meant to give FakeBitalino realistic-looking counts from voltages.
+    """
+    samples = np.asarray(samples, dtype=np.float64)
+    lo = samples.min(axis=0)
+    span = np.maximum(samples.max(axis=0) - lo, 1e-12)
+    return np.round(64 + (samples - lo) / span * 895)
+
+
+#===============================================================================
+# PACING
+#===============================================================================
+class _Pacer:
+    """
+    Releases samples on an absolute schedule so delays (jitter, a slow
+    consumer) never accumulate into drift. Jitter delays each release by up to
+    jitter_s past its due time without lowering the average rate; it has no
+    effect at MAX_SPEED.
+    """
+
+    def __init__(self, fs, speed=1.0, jitter_s=0.0, rng=None):
+        self.rate = None if speed is MAX_SPEED else fs * speed
+        self.jitter_s = jitter_s
+        self.rng = rng or np.random.default_rng()
+        self.t0 = time.monotonic()
+
+    def wait(self, n_released):
+        """Sleeps until sample n_released is due."""
+        if self.rate is None:
+            return
+        due = self.t0 + n_released / self.rate
+        if self.jitter_s:
+            due += self.rng.uniform(0, self.jitter_s)
+        delay = due - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+#===============================================================================
+# ESP32 BOX
+#===============================================================================
+class VirtualEsp32:
+    """
+    Emulates the ESP32 box on a pseudo terminal.
+
+    A background thread writes samples to the pty master, in the same CSV or
+    binary frame format as the firmware, and esp32Device.Device reads the
+    slave end like any other serial port. In real time modes bytes that the
+    reader does not pick up in time are dropped (like an overrun UART) and
+    counted; at MAX_SPEED writes block instead, so the stream runs at the
+    reader's ceiling.
+
+        with VirtualEsp32(protocol="binary", speed=4) as sim:
+            device = Device()
+            device.com_ports = [sim.port]
+            device.port_cache = None
+            device.connect()
+
+    Attributes:
+        port (str): Path of the virtual serial port.
+        samples_sent (int): Samples written (dropped ones included).
+        samples_dropped (int): Samples skipped on purpose (drop_rate).
+        overflow_bytes (int): Bytes lost because the reader fell behind.
+    """
+
+    def __init__(self, samples=None, fs=1000, protocol="text", speed=1.0, jitter_s=0.0,
+                 drop_rate=0.0, loop=True, block_s=0.01, seed=None):
+        if protocol not in ("text", "binary"):
+            raise ValueError("protocol should be 'text' or 'binary'")
+
+        self.fs = fs
+        self.protocol = protocol
+        self.speed = speed
+        self.drop_rate = drop_rate
+        self.loop = loop
+        self._rng = np.random.default_rng(seed)
+        self._jitter_s = jitter_s
+
+        if samples is None:
+            samples = synthetic_signals(fs, 60, seed=seed)
+        wire = np.asarray(samples, dtype=np.float64)[:, WIRE_ORDER]
+
+        # encode once up front so the writer thread only slices and joins
+        if protocol == "text":
+            self._lines = [f"{a:.5f},{b:.5f},{c:.5f}\n".encode() for a, b, c in wire]
+        else:
+            counts = np.clip(np.round(wire / ADS1115_VOLTS_PER_COUNT), -32768, 32767)
+            self._counts = counts.astype(np.int16)
+        self._n = len(wire)
+
+        # whole frames per write in binary mode
+        self.block = max(SAMPLES_PER_FRAME, int(fs * block_s) // SAMPLES_PER_FRAME * SAMPLES_PER_FRAME)
+
+        self.samples_sent = 0
+        self.samples_dropped = 0
+        self.overflow_bytes = 0
+        self._send_ends = []
+        self._send_times = []
+
+        self.port = None
+        self._master = self._slave = None
+        self._thread = None
+        self._stop = threading.Event()
+        self.finished = threading.Event()
+
+    def start(self):
+        import tty
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        os.set_blocking(self._master, self.speed is MAX_SPEED)
+        self.port = os.ttyname(self._slave)
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+        for fd in (self._master, self._slave):
+            if fd is not None:
+                os.close(fd)
+        self._master = self._slave = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def sent_at(self, sample_index):
+        """
+        time.monotonic() at which the write containing sample_index went out
+        (stream numbering, i.e. counting dropped samples), or None.
+        """
+        i = np.searchsorted(self._send_ends, sample_index, side="right")
+        if i >= len(self._send_times):
+            return None
+        return self._send_times[i]
+
+    def _run(self):
+        pacer = _Pacer(self.fs, self.speed, self._jitter_s, self._rng)
+        n = 0
+        while not self._stop.is_set():
+            if not self.loop and n >= self._n:
+                break
+            pacer.wait(n + self.block)
+
+            idx = (n + np.arange(self.block)) % self._n
+            if not self.loop:
+                idx = idx[:self._n - n]
+            payload = self._encode(idx, n)
+
+            self._write(payload)
+            n += len(idx)
+            self.samples_sent = n
+            self._send_ends.append(n)
+            self._send_times.append(time.monotonic())
+        self.finished.set()
+
+    def _encode(self, idx, first):
+        if self.protocol == "text":
+            keep = self._keep(len(idx))
+            return b"".join(self._lines[i] for i in idx[keep])
+
+        data = encode_frames(self._counts[idx], first_seq=first)
+        keep = self._keep(len(idx) // SAMPLES_PER_FRAME)
+        if keep.all():
+            return data
+        frames = np.frombuffer(data, dtype=np.uint8).reshape(-1, FRAME_BYTES)
+        self.samples_dropped += (SAMPLES_PER_FRAME - 1) * int(np.count_nonzero(~keep))
+        return frames[keep].tobytes()
+
+    def _keep(self, n_units):
+        """Mask of frames (or lines) that survive the simulated link."""
+        if not self.drop_rate:
+            return np.ones(n_units, dtype=bool)
+        keep = self._rng.random(n_units) >= self.drop_rate
+        self.samples_dropped += int(np.count_nonzero(~keep))
+        return keep
+
+    def _write(self, payload):
+        view = memoryview(payload)
+        while view and not self._stop.is_set():
+            try:
+                written = os.write(self._master, view)
+            except BlockingIOError:
+                # real time mode: the reader is not keeping up, the rest is lost
+                self.overflow_bytes += len(view)
+                return
+            view = view[written:]
+
+
+#===============================================================================
+# BITALINO
+#===============================================================================
+class FakeBitalino:
+    """
+    Stand-in for bitalino.BITalino with the calls the app makes.
+
+    read(n) blocks until n samples are due at the simulated rate and returns
+    the same frame matrix layout as the real device: [seq, I1, I2, O1, O2,
+    A1, ...], where A1-A3 carry EMG, ECG and EDA counts and the remaining
+    analog inputs sit at mid scale. Dropped samples advance the 4-bit
+    sequence number, as they would on a lossy Bluetooth link.
+
+    Args:
+        samples (np.ndarray): (n, 3) [EMG, ECG, EDA] 10-bit counts; synthetic
+                              signals are used if omitted.
+    """
+
+    def __init__(self, macAddress=None, samples=None, speed=1.0, jitter_s=0.0,
+                 drop_rate=0.0, loop=True, seed=None):
+        self.macAddress = macAddress
+        self.speed = speed
+        self.drop_rate = drop_rate
+        self.loop = loop
+        self._jitter_s = jitter_s
+        self._rng = np.random.default_rng(seed)
+        self._samples = None if samples is None else np.asarray(samples, dtype=np.float64)
+
+        self.fs = None
+        self._analog = []
+        self._pacer = None
+        self._pos = 0
+        self.samples_dropped = 0
+
+    def start(self, SamplingRate=1000, analogChannels=[0, 1, 2, 3, 4, 5]):
+        self.fs = SamplingRate
+        self._analog = list(analogChannels)
+        if self._samples is None:
+            self._samples = to_bitalino_counts(synthetic_signals(SamplingRate, 60, seed=0))
+        self._pos = 0
+        self._pacer = _Pacer(SamplingRate, self.speed, self._jitter_s, self._rng)
+
+    def read(self, nSamples=100):
+        if self._pacer is None:
+            raise RuntimeError("The device is not in acquisition mode")
+
+        keep = np.ones(nSamples, dtype=bool)
+        if self.drop_rate:
+            # draw enough stream samples that nSamples survive
+            keep = self._rng.random(int(nSamples / (1 - self.drop_rate)) + 8) >= self.drop_rate
+            keep &= np.cumsum(keep) <= nSamples
+            keep = keep[:np.flatnonzero(keep)[-1] + 1]
+            self.samples_dropped += int(np.count_nonzero(~keep))
+
+        n_stream = len(keep)
+        if not self.loop and self._pos + n_stream > len(self._samples):
+            raise TimeoutError("Replay finished")
+        self._pacer.wait(self._pos + n_stream)
+
+        stream = self._pos + np.flatnonzero(keep)
+        self._pos += n_stream
+
+        frames = np.full((len(stream), 5 + len(self._analog)), 512.0)
+        frames[:, 0] = stream % 16
+        frames[:, 1:5] = 0
+        values = self._samples[stream % len(self._samples)]
+        for col, ch in enumerate(self._analog):
+            if ch < 3:
+                frames[:, 5 + col] = values[:, ch]
+        return frames
+
+    def version(self):
+        if self._pacer is not None:
+            raise RuntimeError("The device is not idle")
+        return "BITalino_v5.2 (simulated)"
+
+    def stop(self):
+        self._pacer = None
+
+    def close(self):
+        pass
+
+
+#===============================================================================
+# LOAD TEST
+#===============================================================================
+def _load_test(args):
+    from acqEngine import AcquisitionEngine, BitalinoSource, Esp32Source
+
+    speed = MAX_SPEED if args.speed == "max" else float(args.speed)
+    fs = args.fs
+    samples = None
+    if args.replay:
+        samples, rec_fs, units = load_session(args.replay, fs)
+        fs = rec_fs or fs
+        if is_bitalino_units(units):
+            samples = from_bitalino_units(samples)
+            if args.device == "esp32":
+                samples = samples * (3.3 / 1023)
+        elif args.device == "bitalino":
+            samples = to_bitalino_counts(samples)
+
+    latencies = []
+    channel = [True, True, True]
+    engine = AcquisitionEngine()
+
+    if args.device == "esp32":
+        from esp32Device import Device
+        sim = VirtualEsp32(samples, fs, args.protocol, speed, args.jitter, args.drop, seed=1).start()
+        device = Device()
+        device.com_ports = [sim.port]
+        device.port_cache = None # leave the real box's remembered port alone
+        source = engine.add_source(Esp32Source(device, fs, channel))
+
+        def measure(block):
+            # binary frames carry the stream position; lines do not
+            if device.last_seq is None or not len(device.last_seq):
+                return
+            seq = int(device.last_seq[len(block.samples) - 1])
+            seq += 65536 * round((sim.samples_sent - seq) / 65536)  # undo the 16-bit wrap
+            sent = sim.sent_at(seq)
+            if sent is not None:
+                latencies.append(block.timestamp - sent)
+        engine.subscribe(measure)
+    else:
+        sim = None
+        device = FakeBitalino(samples=samples, speed=speed, jitter_s=args.jitter, drop_rate=args.drop, seed=1)
+        source = engine.add_source(BitalinoSource(device, fs, channel))
+
+    t0 = time.perf_counter()
+    try:
+        engine.run_sync(args.seconds)
+    finally:
+        if sim is not None:
+            sim.close()
+    wall = time.perf_counter() - t0
+
+    received = engine.samples_received[source.name]
+    print(f"{source.name}: {received} samples in {wall:.2f} s "
+          f"({received / wall:.0f} samples/s, {received / wall / fs:.1f}x real time)")
+    if sim is not None:
+        print(f"  sent {sim.samples_sent}, dropped {sim.samples_dropped}, overflow {sim.overflow_bytes} bytes")
+    if args.device == "esp32" and args.protocol == "text":
+        print("  latency needs sequence numbers, run with --protocol binary")
+    elif latencies:
+        lat = np.asarray(latencies) * 1000
+        print(f"  latency (write -> block) p50 {np.percentile(lat, 50):.1f} ms, "
+              f"p95 {np.percentile(lat, 95):.1f} ms, max {lat.max():.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Acquisition load test against simulated devices")
+    parser.add_argument("device", choices=["esp32", "bitalino"])
+    parser.add_argument("--protocol", choices=["text", "binary"], default="text")
+    parser.add_argument("--fs", type=int, default=1000)
+    parser.add_argument("--seconds", type=float, default=10, help="seconds of signal to acquire")
+    parser.add_argument("--speed", default="1", help="playback speed factor or 'max'")
+    parser.add_argument("--jitter", type=float, default=0.0, help="max extra delay per write (s)")
+    parser.add_argument("--drop", type=float, default=0.0, help="probability of dropping a frame/sample")
+    parser.add_argument("--replay", help="recorded session (.rec, .txt or SD card .csv)")
+    _load_test(parser.parse_args())
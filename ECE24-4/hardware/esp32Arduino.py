@@ -21,6 +21,25 @@ String device_name = "ESP32-BT";
 //to start reading adc
 bool starting = true;
 
+// Stream format: false = "v0,v1,v2" text lines, true = compact binary frames
+// (layout documented in hardware/esp32Protocol.py, the host detects either one)
+#define BINARY_STREAM true
+#define SAMPLES_PER_FRAME 16
+#define FRAME_PAYLOAD (SAMPLES_PER_FRAME * 3 * 2)
+#define FRAME_BYTES (2 + 1 + 2 + FRAME_PAYLOAD + 2)
+
+// ADS1115 data rate, the same in both stream formats. Each loop reads the 3
+// channels one after another, so the sample rate the GUI is set to has to
+// match what this rate gives (acqStats reports the measured rate).
+#define ADS_DATA_RATE RATE_ADS1115_250SPS
+
+// true: print channel 0 on the USB serial monitor for every sample (slows the loop)
+#define DEBUG_SERIAL false
+
+uint8_t frame[FRAME_BYTES];
+int frame_samples = 0;   // samples currently packed into frame
+uint16_t sample_seq = 0; // sequence number of the next sample
+
 BluetoothSerial SerialBT;
 
 // setup()
@@ -48,14 +67,63 @@ void setup() {
 
    //set ADC gain and data rate
    ads.setGain(GAIN_ONE); //max voltage 4.096 V
-   ads.setDataRate(250); //250 samples/second
+   ads.setDataRate(ADS_DATA_RATE); //250 samples/second
+}
+
+// crc16()
+// ---------------------------------------------------------------
+// Purpose:
+//   CRC-16/CCITT (XModem: poly 0x1021, init 0), matches binascii.crc_hqx on the host.
+
+uint16_t crc16(const uint8_t* data, int len) {
+  uint16_t crc = 0;
+  for (int i = 0; i < len; i++) {
+    crc ^= (uint16_t)data[i] << 8;
+    for (int b = 0; b < 8; b++) {
+      crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : (crc << 1);
+    }
+  }
+  return crc;
+}
+
+// sendFrameSample()
+// ---------------------------------------------------------------
+// Purpose:
+//   Packs one sample of raw ADC counts into the current frame and sends the
+//   frame over Bluetooth once SAMPLES_PER_FRAME samples are collected.
+
+void sendFrameSample(int16_t adc0, int16_t adc1, int16_t adc2) {
+  if (frame_samples == 0) {
+    frame[0] = 0xA5;
+    frame[1] = 0x5A;
+    frame[2] = FRAME_PAYLOAD;
+    frame[3] = sample_seq & 0xFF;
+    frame[4] = sample_seq >> 8;
+  }
+
+  int16_t values[3] = {adc0, adc1, adc2};
+  uint8_t* p = frame + 5 + frame_samples * 6;
+  for (int ch = 0; ch < 3; ch++) {
+    p[ch * 2]     = values[ch] & 0xFF;
+    p[ch * 2 + 1] = (values[ch] >> 8) & 0xFF;
+  }
+  frame_samples++;
+  sample_seq++;
+
+  if (frame_samples == SAMPLES_PER_FRAME) {
+    uint16_t crc = crc16(frame + 2, FRAME_BYTES - 4);
+    frame[FRAME_BYTES - 2] = crc & 0xFF;
+    frame[FRAME_BYTES - 1] = crc >> 8;
+    SerialBT.write(frame, FRAME_BYTES);
+    frame_samples = 0;
+  }
 }
 
 // loop()
 // ---------------------------------------------------------------
 // Purpose:
 //   Continuously reads analog values from the ADS1115 and transmits
-//   them as comma-separated voltage readings over Bluetooth.
+//   them as comma-separated voltage readings (or binary frames) over Bluetooth.
 // Description:
 //   - Checks if ADC conversion is complete
 //   - Reads from channels 0, 1, and 2
@@ -75,13 +143,20 @@ void loop() {
     float volts2 = ads.computeVolts(adc2);
 
     // print one value (probs for debugging)
-    Serial.println(adc0);
-
-    // make csv fomat
-    String dataPacket = String(volts0) + "," + String(volts1) + "," + String(volts2);
-    
-    // send data over bluetooth
-    SerialBT.println(dataPacket);
+    if (DEBUG_SERIAL) {
+      Serial.println(adc0);
+    }
+
+    if (BINARY_STREAM) {
+      // raw counts, the host converts to volts
+      sendFrameSample(adc0, adc1, adc2);
+    } else {
+      // make csv fomat
+      String dataPacket = String(volts0) + "," + String(volts1) + "," + String(volts2);
+      
+      // send data over bluetooth
+      SerialBT.println(dataPacket);
+    }
 
     // done with first send, so only read/send data when the adc is done
     starting = false;
@@ -1,136 +1,175 @@
 import serial
-import serial.tools.list_ports
-import time
-import hearingTest as sound
+import numpy as np
+from esp32Protocol import FrameDecoder, WIRE_ORDER
+from portDiscovery import CACHE_PATH, discover
+
+NUM_FIELDS = 3
+
+
+def parse_csv_block(lines, n_fields=NUM_FIELDS):
+    """
+    Parses a list of complete comma-separated lines (bytes) into a float array.
+
+    Blank lines are skipped. Lines with the wrong field count are dropped and
+    counted instead of stopping the read, and the rest are converted in one
+    vectorized call.
+
+    Args:
+        lines (list[bytes]): Complete lines without the trailing newline.
+        n_fields (int): Expected values per line.
+
+    Returns:
+        tuple: (np.ndarray of shape (n, n_fields), int number of malformed lines)
+    """
+    if not lines:
+        return np.empty((0, n_fields)), 0
+
+    lines = np.char.strip(np.array(lines, dtype=bytes))
+    lines = lines[np.char.str_len(lines) > 0]
+    well_formed = np.char.count(lines, b',') == n_fields - 1
+    malformed = int(np.count_nonzero(~well_formed))
+    lines = lines[well_formed]
+
+    if lines.size == 0:
+        return np.empty((0, n_fields)), malformed
+
+    fields = b','.join(lines.tolist()).split(b',')
+    try:
+        block = np.array(fields).astype(np.float64).reshape(-1, n_fields)
+    except ValueError:
+        # a field that is not a number (e.g. a corrupted byte); sort it out per line
+        rows = []
+        for line in lines.tolist():
+            try:
+                rows.append([float(v) for v in line.split(b',')])
+            except ValueError:
+                malformed += 1
+        block = np.array(rows, dtype=np.float64).reshape(-1, n_fields)
+
+    return block, malformed
+
 
 # Device class for connecting to the ESP32 Hardware over Bluetooth
 class Device():
     def __init__(self):
         """
-        Initializes the Device object by scanning available COM ports
-        and setting up internal state variables.
+        Initializes the Device object and its internal state variables.
+        The COM ports are only scanned when connecting (see portDiscovery).
         """
 
-        self.com_ports = [port.device for port in list(serial.tools.list_ports.comports())]
+        self.com_ports = None # Candidate ports; None means every COM port
+        self.port_cache = CACHE_PATH # Where the port that worked is remembered between runs (None = not remembered)
         self.baud_rate = 115200  # Baud rate for the serial connection
         self.ser = None # Serial object to hold the connection
         self.device_found = False # Flag to check if the device is found
         self.signal_data = [] # List to store captured signal data
         self.port = None 
+        self._carry = None # Partial line left over from the last read (None = not synced to a line yet)
+        self.malformed_lines = 0 # Lines dropped by the parser during the last collection
+        self.protocol = None # 'text' (CSV lines) or 'binary' (esp32Protocol frames), detected on connect
+        self._decoder = None # FrameDecoder when streaming binary frames
+        self.last_seq = None # Sequence numbers of the samples returned by the last binary read_block
 
 
-    def collect_data(self, sampling_rate, duration, emg_vals, ecg_vals, eda_vals, channel, controller, audio_text):
+    def read_block(self):
         """
-        Connects to the ESP32 device via serial communication and collects
-        bioelectric signal data (EMG, ECG, EDA) for a specified duration.
-
-        Args:
-            sampling_rate (int): Data collection rate in Hz.
-            duration (int): Length of time (in seconds) to record data.
-            emg_vals (list): List to store EMG samples.
-            ecg_vals (list): List to store ECG samples.
-            eda_vals (list): List to store EDA samples.
-            channel (list[bool]): Boolean list [EMG, ECG, EDA] specifying
-                                  which signals are active.
-            controller (object): GUI controller object for managing pages.
-            audio_text (str): Audio message to announce at start of collection.
+        Drains every byte currently waiting on the serial port in one read and
+        parses the complete lines (or binary frames) it contains.
+
+        A partial line at the end of the read is kept and prepended to the next
+        read. Right after (re)starting, everything up to the first newline is
+        thrown away so a half-received sample is never parsed. In binary mode
+        the same is handled by the FrameDecoder.
 
         Returns:
-            int: Returns -1 if connection fails, otherwise None.
+            np.ndarray: Shape (n, 3) in wire order [ECG, EMG, EDA].
         """
+        waiting = self.ser.in_waiting
+        if not waiting:
+            return np.empty((0, NUM_FIELDS))
+
+        chunk = self.ser.read(waiting)
+        if self.protocol == 'binary':
+            block, self.last_seq = self._decoder.feed(chunk)
+            return block
+
+        if self._carry is None:
+            newline = chunk.find(b'\n')
+            if newline < 0:
+                return np.empty((0, NUM_FIELDS))
+            chunk = chunk[newline + 1:]
+            self._carry = b''
 
-        # If no port assigned yet, attempt to find the device automatically
+        lines = (self._carry + chunk).split(b'\n')
+        self._carry = lines.pop()
+
+        block, malformed = parse_csv_block(lines)
+        self.malformed_lines += malformed
+        return block
+
+
+    def _open_port(self, port):
+        """
+        Opens a serial port with the settings the box expects.
+        """
+        ser = serial.Serial(port, self.baud_rate, timeout=0.1)
+        try:
+            ser.setDTR(False) # Helps reduce lag on Arduino plotting
+        except OSError:
+            pass # port without modem control lines (e.g. a virtual port from deviceSim)
+        return ser
+
+
+    def connect(self):
+        """
+        Finds the ESP32 box among the COM ports (or reopens the port it was
+        found on before) and detects its stream format. The port that answered
+        is remembered in Utilities/ and probed first on the next launch.
+
+        Returns:
+            bool: True if the device is connected.
+        """
+
+        # If no port assigned yet, probe the cached port, then all the others at once
         if self.port is None:
-            sound.tts("Connecting to device, please wait", 150)
-            for port in self.com_ports:
-                try:
-                    # Attempt to open serial connection to each COM port
-                    try:
-                        ser = serial.Serial(port, self.baud_rate, timeout=0.1) 
-                        ser.setDTR(False) # Helps reduce lag on Arduino plotting
-                        print(f"Connected to {port} at {self.baud_rate} baud.")
-                    except Exception as e:
-                        print(f"Failed to open serial port: {port}")
-                        continue
-
-                    start_time = time.time()
-
-                    # Try reading one line to confirm the device identity
-                    while True:
-                        if ser.in_waiting > 0:
-                            data = ser.readline().decode('utf-8').rstrip() # Reads in comma seperated value to check if correct Com Port
-                            print(f"Data: {data}")
-                            
-                            # Device sends 3 comma-separated values (EMG, ECG, EDA)
-                            if len(data.split(',')) == 3:
-                                self.device_found = True
-                                self.ser = ser
-                                self.port = port
-                            break 
-
-                        # timeout after 1 second
-                        if time.time() - start_time > 1:
-                            break
-                        time.sleep(0.1) 
-                    
-                    if self.device_found:
-                        sound.tts("Connected to device.", 150)
-                        break
-                    else:
-                        print(f"Closing port {port}")
-                        ser.close()
-
-                except Exception as e:
-                    print("Failed to open serial port:", e)
-                    exit(1)
+            found = discover(self._open_port, self.com_ports, cache_path=self.port_cache)
+            if found is not None:
+                self.port, self.ser, self.protocol = found
+                self.device_found = True
+                print(f"Connected to {self.port} at {self.baud_rate} baud, {self.protocol} stream.")
         # If the port was already identified before, reconnect directly
         else:
             self.device_found = True
-            self.ser = serial.Serial(self.port, self.baud_rate, timeout=0.1)
-            self.ser.setDTR(False)
-        
-        # send an error if no device was found on any port
+            self.ser = self._open_port(self.port)
+
         if not self.device_found:
             print("Device not found on any of the specified COM ports.")
-            sound.tts("Unable to connect to device.", 150)
-            controller.show_frame("ErrorPage")
-            return -1
+        return self.device_found
 
-       # Notify the user and start data collection
-        sound.tts(audio_text, 150)
-        controller.frames["LoadingPage"].set_load_title("Collecting data...")
 
-        start_time = time.time()
-        num_samples = sampling_rate * duration
-        data_values = []
+    def start(self):
+        """
+        Resets the parser state and clears stale bytes before a collection.
+        """
+        self.malformed_lines = 0
+        self._carry = None
+        self._decoder = FrameDecoder()
 
         # clear out buffer before starting data collection
         self.ser.reset_input_buffer()
-        while len(ecg_vals) < num_samples and len(emg_vals) < num_samples and len(eda_vals) < num_samples:
-            while self.ser.in_waiting:
-                try:
-                    data_values = self.ser.readline().decode('utf-8').strip().split(',') # Reads in comma seperated ECG,EMG,EDA
-
-                    # Append data if enabled
-                    if channel[0] == True:
-                        emg_vals.append(float(data_values[1]))
-                    if channel[1] == True:
-                        ecg_vals.append(float(data_values[0]))
-                    if channel[2] == True:
-                        eda_vals.append(float(data_values[2]))
-
-                    # place holders are 1 if the channel is diabled
-                    if channel[0] == False:
-                        emg_vals.append(1)
-                    if channel[1] == False:
-                        ecg_vals.append(1)
-                    if channel[2] == False:
-                        eda_vals.append(1)
-
-                except Exception as e:
-                    print("Read error:", e)
-                    print(data_values)
-                    break
+
+
+    def log_read_errors(self):
+        """
+        Prints how much data the parser had to drop during the last collection.
+        """
+        if self.malformed_lines:
+            print(f"Dropped {self.malformed_lines} malformed lines")
+        decoder = self._decoder
+        if decoder is not None and (decoder.crc_errors or decoder.lost_samples or decoder.repeated_frames):
+            print(f"Dropped {decoder.crc_errors} corrupted and {decoder.repeated_frames} repeated frames, "
+                  f"{decoder.lost_samples} samples lost")
+
 
     def stop(self):
         """
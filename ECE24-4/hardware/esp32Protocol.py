@@ -0,0 +1,220 @@
+# esp32Protocol.py
+#   • compact binary streaming format for the ESP32 box (alternative to CSV text lines)
+#   • frame layout, CRC, encoder (for tests/simulation) and a streaming decoder
+#   • text vs. binary detection used by esp32Device.Device on connect
+#
+# Frame layout (little endian, 103 bytes for 16 samples):
+#   sync     2 bytes   0xA5 0x5A
+#   length   1 byte    payload length in bytes (SAMPLES_PER_FRAME * 3 * 2)
+#   seq      2 bytes   uint16 sequence number of the first sample in the frame (wraps)
+#   payload  N*6 bytes int16 ADS1115 counts, 3 per sample in wire order ECG, EMG, EDA
+#   crc      2 bytes   CRC-16/CCITT (XModem, poly 0x1021, init 0) over length+seq+payload
+#_______________________________________________________________________________#
+
+import binascii
+import numpy as np
+
+SYNC = b'\xA5\x5A'
+# 16 samples per frame: header + CRC are 7 of 103 bytes (6.4 bytes per sample,
+# the int16 payload alone is 6) and a frame still arrives well within the port probe
+SAMPLES_PER_FRAME = 16
+NUM_CHANNELS = 3
+PAYLOAD_BYTES = SAMPLES_PER_FRAME * NUM_CHANNELS * 2
+FRAME_BYTES = len(SYNC) + 1 + 2 + PAYLOAD_BYTES + 2
+
+FRAME_DTYPE = np.dtype([
+    ('sync', '<u2'),
+    ('length', 'u1'),
+    ('seq', '<u2'),
+    ('adc', '<i2', (SAMPLES_PER_FRAME, NUM_CHANNELS)),
+    ('crc', '<u2'),
+])
+
+_SYNC_WORD = int.from_bytes(SYNC, 'little')
+
+# The box sends ECG, EMG, EDA per sample; columns to pick for [EMG, ECG, EDA]
+# (the swap is its own inverse, so the same list maps [EMG, ECG, EDA] to wire order)
+WIRE_ORDER = [1, 0, 2]
+
+# A frame up to this many samples behind the expected sequence number is a repeat
+# (e.g. resent after a Bluetooth reconnect) and is dropped; a larger step back
+# means the box restarted its counter, and the numbering simply continues
+REPLAY_WINDOW = 1024
+
+# ADS1115 at GAIN_ONE: +/-4.096 V full scale over 15 bits (same as ads.computeVolts)
+ADS1115_VOLTS_PER_COUNT = 4.096 / 32768
+
+
+def crc16(data):
+    """CRC-16/CCITT (XModem) as computed by the firmware."""
+    return binascii.crc_hqx(data, 0)
+
+
+def encode_frames(counts, first_seq=0):
+    """
+    Packs ADC counts into binary frames.
+
+    Args:
+        counts (array-like): Shape (n, 3) int16 counts in wire order. n is
+                             truncated to a whole number of frames.
+        first_seq (int): Sequence number of the first sample.
+
+    Returns:
+        bytes: Concatenated frames.
+    """
+    counts = np.asarray(counts, dtype='<i2')
+    n_frames = len(counts) // SAMPLES_PER_FRAME
+
+    frames = np.zeros(n_frames, dtype=FRAME_DTYPE)
+    frames['sync'] = _SYNC_WORD
+    frames['length'] = PAYLOAD_BYTES
+    frames['seq'] = (first_seq + np.arange(n_frames) * SAMPLES_PER_FRAME) & 0xFFFF
+    frames['adc'] = counts[:n_frames * SAMPLES_PER_FRAME].reshape(n_frames, SAMPLES_PER_FRAME, NUM_CHANNELS)
+
+    raw = bytearray(frames.tobytes())
+    for i in range(n_frames):
+        start = i * FRAME_BYTES
+        crc = crc16(bytes(raw[start + 2:start + FRAME_BYTES - 2]))
+        raw[start + FRAME_BYTES - 2:start + FRAME_BYTES] = crc.to_bytes(2, 'little')
+    return bytes(raw)
+
+
+def _frame_ok(frame):
+    return (frame[:2] == SYNC
+            and frame[2] == PAYLOAD_BYTES
+            and crc16(frame[2:-2]) == int.from_bytes(frame[-2:], 'little'))
+
+
+def detect_protocol(data):
+    """
+    Decides which format the box is streaming from a few hundred received bytes.
+
+    Returns:
+        str or None: 'binary' if a frame with a valid CRC is found, 'text' if a
+        complete line of 3 comma-separated numbers is found, None if unsure.
+    """
+    i = data.find(SYNC)
+    while 0 <= i <= len(data) - FRAME_BYTES:
+        if _frame_ok(data[i:i + FRAME_BYTES]):
+            return 'binary'
+        i = data.find(SYNC, i + 1)
+
+    # skip the first (possibly partial) line and the unterminated last one
+    for line in data.split(b'\n')[1:-1]:
+        values = line.strip().split(b',')
+        if len(values) == NUM_CHANNELS:
+            try:
+                [float(v) for v in values]
+                return 'text'
+            except ValueError:
+                continue
+    return None
+
+
+class FrameDecoder:
+    """
+    Streaming decoder for binary frames.
+
+    feed() accepts any chunk of received bytes, keeps incomplete frames for
+    the next call, and decodes runs of back-to-back frames with a single
+    np.frombuffer. After a corrupted frame it resynchronizes on the next
+    sync word.
+
+    Attributes:
+        crc_errors (int): Frames dropped because of a bad CRC or header.
+        lost_samples (int): Samples missing according to the sequence counter.
+        repeated_frames (int): Frames dropped because their samples were already received.
+    """
+
+    def __init__(self):
+        self._buf = b''
+        self._next_seq = None
+        self.crc_errors = 0
+        self.lost_samples = 0
+        self.repeated_frames = 0
+
+    def feed(self, data):
+        """
+        Returns:
+            tuple: (volts (n, 3) float64 in wire order, seq (n,) int64 sample numbers)
+        """
+        buf = self._buf + data
+        counts, seqs = [], []
+
+        pos = buf.find(SYNC)
+        while 0 <= pos <= len(buf) - FRAME_BYTES:
+            n_frames = (len(buf) - pos) // FRAME_BYTES
+            frames = np.frombuffer(buf, dtype=FRAME_DTYPE, count=n_frames, offset=pos)
+
+            # header check for the whole run at once, CRC per frame (C implementation)
+            good = (frames['sync'] == _SYNC_WORD) & (frames['length'] == PAYLOAD_BYTES)
+            n_good = n_frames if good.all() else int(np.argmin(good))
+            for i in range(n_good):
+                start = pos + i * FRAME_BYTES
+                if crc16(buf[start + 2:start + FRAME_BYTES - 2]) != int(frames['crc'][i]):
+                    n_good = i
+                    break
+
+            if n_good:
+                seq, keep = self._unwrap(frames['seq'][:n_good])
+                counts.append(frames['adc'][:n_good][keep].reshape(-1, NUM_CHANNELS))
+                seqs.append(seq)
+                pos += n_good * FRAME_BYTES
+
+            if n_good < n_frames:
+                # corrupted frame: skip past its sync word and look for the next one
+                self.crc_errors += 1
+                pos = buf.find(SYNC, pos + 1)
+
+        if pos < 0:
+            # keep a trailing byte in case it is the first half of a sync word
+            self._buf = buf[-1:] if buf.endswith(SYNC[:1]) else b''
+        else:
+            self._buf = buf[pos:]
+
+        if not counts:
+            return np.empty((0, NUM_CHANNELS)), np.empty(0, dtype=np.int64)
+
+        volts = np.concatenate(counts).astype(np.float64) * ADS1115_VOLTS_PER_COUNT
+        return volts, np.concatenate(seqs)
+
+    def _unwrap(self, frame_seq):
+        """
+        Expands 16-bit frame sequence numbers into increasing per-sample numbers.
+
+        Returns:
+            tuple: (seq (k * SAMPLES_PER_FRAME,) int64, keep (n,) bool mask of
+                   the k frames to use; repeated frames are left out)
+        """
+        frame_seq = frame_seq.astype(np.int64)
+        if self._next_seq is None:
+            self._next_seq = int(frame_seq[0])
+
+        # signed distance of each frame from the number expected after the previous
+        # one, modulo the 16-bit wrap: > 0 samples lost, < 0 a step backwards
+        expected = np.concatenate(([self._next_seq], frame_seq[:-1] + SAMPLES_PER_FRAME))
+        skips = (frame_seq - expected + 0x8000) % 0x10000 - 0x8000
+        keep = np.ones(len(frame_seq), dtype=bool)
+
+        if (skips >= 0).all():
+            first = self._next_seq + np.cumsum(skips) + np.arange(len(frame_seq)) * SAMPLES_PER_FRAME
+            self.lost_samples += int(skips.sum())
+        else:
+            # a step backwards: go frame by frame against the last frame kept
+            first = np.empty(len(frame_seq), dtype=np.int64)
+            next_seq = self._next_seq
+            for i, seq in enumerate(frame_seq.tolist()):
+                skip = (seq - next_seq + 0x8000) % 0x10000 - 0x8000
+                if -REPLAY_WINDOW <= skip < 0:
+                    keep[i] = False
+                    self.repeated_frames += 1
+                    continue
+                skip = max(skip, 0)
+                self.lost_samples += skip
+                first[i] = next_seq + skip
+                next_seq = first[i] + SAMPLES_PER_FRAME
+            first = first[keep]
+
+        if len(first):
+            self._next_seq = int(first[-1]) + SAMPLES_PER_FRAME
+        return (first[:, None] + np.arange(SAMPLES_PER_FRAME)).ravel(), keep
@@ -0,0 +1,164 @@
+# portDiscovery.py
+#   • finds the serial port the ESP32 box is streaming on
+#   • the port that worked last time (or one with the same USB fingerprint) is probed first
+#   • every other candidate port is probed at the same time, so a slow port does not hold up the rest
+#   • the port that answered and its fingerprint are kept in Utilities/ for the next launch
+#_______________________________________________________________________________#
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import serial.tools.list_ports
+
+from esp32Protocol import detect_protocol
+
+# Last port the box was found on (relative to the app's working directory, like the other Utilities files)
+CACHE_PATH = os.path.join('Utilities', 'esp32_port.json')
+# How long a port gets to send a recognisable line or frame (seconds)
+PROBE_TIMEOUT_S = 1.0
+
+# USB descriptor fields that identify the box across re-plugs and renumbered ports
+_FINGERPRINT_FIELDS = ('vid', 'pid', 'serial_number', 'manufacturer', 'product')
+
+
+def fingerprint(port_info):
+    """USB identity of a serial port (all None for ports that are not USB)."""
+    return {field: getattr(port_info, field, None) for field in _FINGERPRINT_FIELDS}
+
+
+def load_cache(path=CACHE_PATH):
+    """Returns the saved {'port', 'fingerprint', 'protocol'}, or None."""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_cache(port, port_info, protocol, path=CACHE_PATH):
+    if not path:
+        return
+    try:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump({
+                'port': port,
+                'fingerprint': fingerprint(port_info) if port_info is not None else None,
+                'protocol': protocol,
+            }, f, indent=2)
+    except OSError as e:
+        print(f"Could not save the device port: {e}")
+
+
+def probe(port, open_port, timeout=PROBE_TIMEOUT_S, cancel=None):
+    """
+    Opens a port and listens for the box's stream.
+
+    Args:
+        port (str): Port to probe.
+        open_port (callable): Opens a port name and returns a serial.Serial.
+        timeout (float): Seconds to wait for a recognisable stream.
+        cancel (threading.Event): Stops the probe early when set.
+
+    Returns:
+        tuple: (serial.Serial, protocol) with the port left open, or None.
+    """
+    try:
+        ser = open_port(port)
+    except Exception:
+        return None
+
+    received = b''
+    deadline = time.monotonic() + timeout
+    try:
+        while time.monotonic() < deadline and not (cancel and cancel.is_set()):
+            waiting = ser.in_waiting
+            if waiting:
+                received += ser.read(waiting)
+                protocol = detect_protocol(received)
+                if protocol is not None:
+                    return ser, protocol
+            time.sleep(0.05)
+    except Exception:
+        pass
+    ser.close()
+    return None
+
+
+def _order(ports, infos, cache):
+    """Splits the candidates into the ones to try first (cached) and the rest."""
+    if cache is None:
+        return [], list(ports)
+
+    cached_fp = cache.get('fingerprint') or {}
+    usb = cached_fp.get('vid') is not None
+
+    first = []
+    for port in ports:
+        same_usb = usb and infos.get(port) is not None and fingerprint(infos[port]) == cached_fp
+        if port == cache.get('port') or same_usb:
+            first.append(port)
+    return first, [p for p in ports if p not in first]
+
+
+def discover(open_port, ports=None, timeout=PROBE_TIMEOUT_S, cache_path=CACHE_PATH):
+    """
+    Finds the port the ESP32 box is streaming on.
+
+    The cached port (or a port with the cached USB fingerprint) is probed on
+    its own first; if it does not answer, all remaining ports are probed
+    concurrently and the first one to answer wins.
+
+    Args:
+        open_port (callable): Opens a port name and returns a serial.Serial.
+        ports (list[str]): Candidate ports; defaults to every COM port.
+        timeout (float): Seconds each port gets to answer.
+        cache_path (str): Where the found port is remembered (None to not remember it).
+
+    Returns:
+        tuple: (port, serial.Serial, protocol) with the port open, or None.
+    """
+    infos = {info.device: info for info in serial.tools.list_ports.comports()}
+    if ports is None:
+        ports = list(infos)
+
+    first, rest = _order(ports, infos, load_cache(cache_path))
+
+    for port in first:
+        found = probe(port, open_port, timeout)
+        if found is not None:
+            print(f"Found device on cached port {port}")
+            save_cache(port, infos.get(port), found[1], cache_path)
+            return (port,) + found
+
+    if not rest:
+        return None
+
+    cancel = threading.Event()
+    winner = None
+
+    def run(port):
+        found = probe(port, open_port, timeout, cancel)
+        if found is not None:
+            cancel.set()
+        return port, found
+
+    with ThreadPoolExecutor(max_workers=len(rest)) as pool:
+        for future in as_completed([pool.submit(run, port) for port in rest]):
+            port, found = future.result()
+            if found is None:
+                continue
+            if winner is None:
+                winner = (port,) + found
+            else:
+                found[0].close() # a second port answered at the same time; keep the first
+
+    if winner is not None:
+        print(f"Found device on {winner[0]}")
+        save_cache(winner[0], infos.get(winner[0]), winner[2], cache_path)
+    return winner
@@ -0,0 +1,64 @@
+# test_esp32Device.py
+#   • parse_csv_block: the vectorized parse matches parsing line by line, malformed lines are counted
+#_______________________________________________________________________________#
+
+import numpy as np
+
+from esp32Device import parse_csv_block
+
+
+def _per_line(lines, n_fields=3):
+    # reference: the straightforward per-line parse
+    rows, malformed = [], 0
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        values = line.split(b",")
+        try:
+            if len(values) != n_fields:
+                raise ValueError
+            rows.append([float(v) for v in values])
+        except ValueError:
+            malformed += 1
+    return np.array(rows, dtype=np.float64).reshape(-1, n_fields), malformed
+
+
+def test_matches_per_line_parse():
+    rng = np.random.default_rng(0)
+    values = rng.uniform(0, 3.3, size=(500, 3))
+    lines = [b"%.2f,%.2f,%.2f" % tuple(row) for row in values]
+
+    block, malformed = parse_csv_block(lines)
+    expected, expected_malformed = _per_line(lines)
+
+    np.testing.assert_array_equal(block, expected)
+    assert malformed == expected_malformed == 0
+
+
+def test_malformed_lines_are_counted():
+    lines = [b"1.0,2.0,3.0", b"", b"4.0,5.0", b" 6.0,7.0,8.0\r", b"1.0,2.0,3.0,4.0", b"9.0,1.0,2.0"]
+
+    block, malformed = parse_csv_block(lines)
+    expected, expected_malformed = _per_line(lines)
+
+    np.testing.assert_array_equal(block, expected)
+    assert malformed == expected_malformed == 2
+
+
+def test_non_numeric_field_falls_back_to_per_line():
+    lines = [b"1.0,2.0,3.0", b"4.0,x\xff,6.0", b"7.0,8.0,9.0"]
+
+    block, malformed = parse_csv_block(lines)
+    expected, expected_malformed = _per_line(lines)
+
+    np.testing.assert_array_equal(block, expected)
+    assert malformed == expected_malformed == 1
+
+
+def test_empty_input():
+    block, malformed = parse_csv_block([])
+    assert block.shape == (0, 3) and malformed == 0
+
+    block, malformed = parse_csv_block([b"", b"  "])
+    assert block.shape == (0, 3) and malformed == 0
@@ -0,0 +1,93 @@
+# test_esp32Protocol.py
+#   • frame encode / decode round trip, CRC rejection and resync on the next sync word
+#   • sequence numbers: 16-bit wrap, lost and repeated frames, counter restart
+#   • text vs. binary detection
+#_______________________________________________________________________________#
+
+import numpy as np
+
+from esp32Protocol import (ADS1115_VOLTS_PER_COUNT, FRAME_BYTES, SAMPLES_PER_FRAME, SYNC, FrameDecoder,
+                           crc16, detect_protocol, encode_frames)
+
+
+def _counts(n_frames, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.integers(-32768, 32767, size=(n_frames * SAMPLES_PER_FRAME, 3), dtype=np.int16)
+
+
+def _frames(raw):
+    return [raw[i:i + FRAME_BYTES] for i in range(0, len(raw), FRAME_BYTES)]
+
+
+def test_crc_is_xmodem():
+    assert crc16(b"123456789") == 0x31C3
+
+
+def test_round_trip_in_odd_chunks():
+    counts = _counts(10)
+    raw = encode_frames(counts, first_seq=100)
+    decoder = FrameDecoder()
+
+    volts, seqs = [], []
+    for i in range(0, len(raw), 37):
+        v, s = decoder.feed(raw[i:i + 37])
+        volts.append(v)
+        seqs.append(s)
+
+    np.testing.assert_array_equal(np.concatenate(volts), counts * ADS1115_VOLTS_PER_COUNT)
+    np.testing.assert_array_equal(np.concatenate(seqs), np.arange(100, 100 + len(counts)))
+    assert decoder.crc_errors == decoder.lost_samples == decoder.repeated_frames == 0
+
+
+def test_bad_crc_is_dropped_and_decoder_resyncs():
+    counts = _counts(4)
+    frames = _frames(bytearray(encode_frames(counts)))
+    frames[1][20] ^= 0xFF                       # corrupt one payload byte of frame 1
+    raw = b"\x00\x01" + SYNC + b"".join(frames)  # noise and a stray sync word in front
+
+    decoder = FrameDecoder()
+    volts, seqs = decoder.feed(raw)
+
+    keep = np.r_[0:SAMPLES_PER_FRAME, 2 * SAMPLES_PER_FRAME:4 * SAMPLES_PER_FRAME]
+    np.testing.assert_array_equal(volts, counts[keep] * ADS1115_VOLTS_PER_COUNT)
+    np.testing.assert_array_equal(seqs, keep)
+    assert decoder.crc_errors >= 1
+    assert decoder.lost_samples == SAMPLES_PER_FRAME
+
+
+def test_sequence_wraps_without_loss():
+    counts = _counts(6)
+    first = 0x10000 - 3 * SAMPLES_PER_FRAME
+    decoder = FrameDecoder()
+    _, seqs = decoder.feed(encode_frames(counts, first_seq=first))
+
+    np.testing.assert_array_equal(seqs, first + np.arange(len(counts)))
+    assert decoder.lost_samples == 0
+
+
+def test_repeated_frame_is_dropped():
+    counts = _counts(3)
+    frames = _frames(encode_frames(counts))
+    decoder = FrameDecoder()
+    volts, seqs = decoder.feed(b"".join([frames[0], frames[1], frames[1], frames[2]]))
+
+    np.testing.assert_array_equal(volts, counts * ADS1115_VOLTS_PER_COUNT)
+    np.testing.assert_array_equal(seqs, np.arange(len(counts)))
+    assert decoder.repeated_frames == 1
+    assert decoder.lost_samples == 0
+
+
+def test_counter_restart_continues_numbering():
+    decoder = FrameDecoder()
+    decoder.feed(encode_frames(_counts(2), first_seq=30000))
+    _, seqs = decoder.feed(encode_frames(_counts(2), first_seq=0))
+
+    np.testing.assert_array_equal(seqs, 30000 + 2 * SAMPLES_PER_FRAME + np.arange(2 * SAMPLES_PER_FRAME))
+    assert decoder.lost_samples == 0
+    assert decoder.repeated_frames == 0
+
+
+def test_detect_protocol():
+    assert detect_protocol(b"\x07" + encode_frames(_counts(2))) == "binary"
+    assert detect_protocol(b"0.1,0.2\n1.25,0.50,2.00\n0.3,") == "text"
+    assert detect_protocol(b"hello\n") is None
@@ -4,12 +4,16 @@
 #   • requires user to input ecg data (excel format)
 #   • excel format looking for a sheet named 'Baseline Data' and 'Test Data'
 #       • using the ECE24-4 format of data collection
+#       • reads the session store next to the workbook instead when there is one (<name>.session/)
 #   • includes functions for bandpass and lowpass filtering
 #   • includes plotting functions for visualizing original vs filtered signals
 #_______________________________________________________________________________#
 
 # last updated: 2/12/26
 
+import json
+import os
+
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
@@ -24,6 +28,31 @@ def get_sampling_rate(info_df):
             return float(row[1])
     raise ValueError("Sample Rate not found in Recording Info")
 
+# sheet name -> phase in the session store (see ECE24-4/app/sessionStore.py)
+STORE_PHASES = {'Baseline Data': 'baseline', 'Test Data': 'test'}
+
+def load_session_store(file_path, sheets):
+    # raw data and sampling rate from the <name>.session store next to the workbook,
+    # memory-mapped instead of parsed from the sheets; None if there is no complete store
+    store = os.path.splitext(file_path)[0] + '.session'
+    meta_file = os.path.join(store, 'meta.json')
+    if not os.path.exists(meta_file):
+        return None
+
+    with open(meta_file) as f:
+        phases = json.load(f).get('phases', {})
+
+    data = {}
+    for sheet in sheets:
+        info = phases.get(STORE_PHASES.get(sheet))
+        npy = os.path.join(store, f"{STORE_PHASES.get(sheet)}.npy")
+        if info is None or not os.path.exists(npy):
+            return None
+        columns = np.load(npy, mmap_mode='r')
+        data[sheet] = pd.DataFrame({name: columns[i] for i, name in enumerate(info['channels']) if info['enabled'][i]})
+
+    return data, float(phases[STORE_PHASES[sheets[0]]]['fs'])
+
 def filter_ecg_for_r_peaks(ecg, fs):
     b, a = butter(4, [5/(fs/2), 15/(fs/2)], btype='bandpass')
     return filtfilt(b, a, ecg)
@@ -148,21 +177,19 @@ def plot_signal_spectra(orig_signal, processed_signal=None, fs=1.0, title_prefix
 # -------------------------------
 
 def run_ecg_filtering(file_path, sheets=['Baseline Data', 'Test Data']):
-    #read excel sheet
-    recording_info = pd.read_excel(
-        file_path,
-        sheet_name='Recording Info',
-        header=None
-    )
-
-    data = {sheet: pd.read_excel(file_path, sheet_name=sheet) for sheet in sheets}
-    info_df = pd.read_excel(file_path, sheet_name='Recording Info', header=None)
+    # prefer the session store, read the excel sheets otherwise
+    stored = load_session_store(file_path, sheets)
+    if stored is not None:
+        data, fs = stored
+    else:
+        data = {sheet: pd.read_excel(file_path, sheet_name=sheet) for sheet in sheets}
+        info_df = pd.read_excel(file_path, sheet_name='Recording Info', header=None)
+        fs = get_sampling_rate(info_df)
 
     # -------------------------------
     # Apply filters & plot
     # -------------------------------
     # sampling rates
-    fs = get_sampling_rate(info_df)
     print(f"Using sampling rate: {fs} Hz")
     fs_ecg = fs  # Hz
     fs_emg = fs  # Hz
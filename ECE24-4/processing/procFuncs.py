@@ -7,6 +7,7 @@
 #   • Error statistics computation and visualization tools
 #   • Least Means Squared (LMS) Adaptive Filter for error tracking
 #   • Import/conversion functions for sensor data (e.g., ECG, EDA, EMG)
+#   • Result plots (sectioned stats, ECG anomaly detection)
 #   • Peak detection and rate calculation utilities for physiological signals
 #
 #_______________________________________________________________________________#
@@ -17,8 +18,12 @@ import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import os
-from matplotlib.backends.backend_agg import FigureCanvasAgg
 from matplotlib.figure import Figure
+from sessionRecorder import load_recording
+from sessionStore import SessionStore
+from signalArchive import SignalArchive, is_archive
+from adaptiveFilter import AdaptiveFilter
+from acqStats import load_stats
 #_______________________________________________________________________________#
 
 #Classes
@@ -89,6 +94,9 @@ class DiscreteWaveletTransform:
         """
         Applies wavelet decomposition and soft thresholding to remove high-frequency noise.
         """
+        #pywt needs a writable buffer; store phases are read-only memory maps
+        data = np.require(data, dtype=np.float64, requirements="W")
+
         #Perform Discrete Wavelet Transform (DWT)
         coeffs = pywt.wavedec(data, self.wavelet, level=self.level)
 
@@ -213,8 +221,10 @@ class error_stats:
         mean_values = []
         std_dev_values = []
 
-        for section_name, stats in stats_result.items():
-            section_numbers.append(section_name)
+        for i, (section_name, stats) in enumerate(stats_result.items(), 1):
+            # numeric axis: one tick label per section (a categorical axis) crowds the plot and
+            # makes it slow to draw for long recordings
+            section_numbers.append(int(section_name) if str(section_name).isdigit() else i)
             max_values.append(stats['max'])
             min_values.append(stats['min'])
             mean_values.append(stats['mean'])
@@ -249,25 +259,40 @@ class error_stats:
 
         fig.tight_layout(pad=2.0)
 
-        canvas = FigureCanvasAgg(fig)
-        canvas.draw()
-        
+        # not drawn here: figureRender rasterizes it (or a GUI canvas draws it) when it is shown
         return fig
     
 #===============================================================================
 # CLASS: LMSAdaptiveFilter
 #===============================================================================
+# Upper bounds of the LMS error response levels; above the last: "unknown"
+RESPONSE_THRESHOLDS = np.array([15, 25, 35, 45, 55])
+RESPONSE_LEVELS = ("normal", "slight response", "mild response", "moderate response", "severe response", "unknown")
+
+def _section_levels(levels, size):
+    # majority level of each run of `size` samples; ties go to the lower level
+    if len(levels) == 0:
+        return np.empty(0, dtype=np.int8)
+    sections = -(-len(levels) // size)
+    section = np.arange(len(levels)) // size
+    counts = np.bincount(section * len(RESPONSE_LEVELS) + levels,
+                         minlength=sections * len(RESPONSE_LEVELS)).reshape(sections, len(RESPONSE_LEVELS))
+    return counts.argmax(axis=1).astype(np.int8)
+
 class LMSAdaptiveFilter:
     """
     Implements the Least Mean Squares (LMS) adaptive filtering algorithm.
     Used to minimize estimation error between actual and predicted signals.
 
     Tracks filter coefficients (a1Hat, b1Hat) over time and visualizes their convergence.
+    The adaptation runs in the block engine of adaptiveFilter ('lms', 'nlms' or 'block').
     """
-    def __init__(self, data):
-        # Ensure numpy + normalized input (prevents overflow)
+    def __init__(self, data, mode="lms", normalize=True):
+        # Ensure numpy + normalized input (prevents overflow); normalize=False
+        # for input that is normalized already (LMSResult.filter)
         self.y = np.array(data, dtype=np.float64)
-        self.y = (self.y - np.mean(self.y)) / (np.std(self.y) + 1e-8)
+        if normalize:
+            self.y = (self.y - np.mean(self.y)) / (np.std(self.y) + 1e-8)
 
         self.N = len(self.y)
         self.n = np.arange(self.N)
@@ -281,12 +306,26 @@ class LMSAdaptiveFilter:
         self.b1Hat = np.zeros(self.N)
         self.e = np.zeros(self.N)
 
-        self.error_range = []
+        self.levels = np.empty(0, dtype=np.int8)
 
         # Smaller step size → prevents divergence
         self.u = 1e-5
+        self.mode = mode
 
-    def update(self):
+    def update(self, per_sample=False):
+        """
+        Adapts a1Hat / b1Hat over the signal and fills yHat and e. The block
+        engine matches the per-sample loop (per_sample=True) to rounding.
+        """
+        if per_sample:
+            self._update_per_sample()
+            return
+        if self.N < 2:
+            return
+        out = AdaptiveFilter(self.u, self.mode).process(self.y, self.x)
+        self.yHat, self.e, self.a1Hat, self.b1Hat = out
+
+    def _update_per_sample(self):
         for i in range(1, self.N - 1):
             self.yHat[i] = self.a1Hat[i] * self.x[i-1] + self.b1Hat[i] * self.y[i-1]
             self.e[i] = self.y[i] - self.yHat[i]
@@ -299,61 +338,31 @@ class LMSAdaptiveFilter:
         self.e[-1] = self.y[-1] - self.yHat[-1]
 
     def error(self):
-        """Classifies error magnitudes into qualitative response levels."""
-        threshold_1 = 15  # normal
-        threshold_2 = 25  # slight response
-        threshold_3 = 35  # mild response
-        threshold_4 = 45  # moderate response
-        threshold_5 = 55  # severe response
-        for i in range(1, len(self.n)): 
-            if self.e[i] <= threshold_1:
-                self.error_range.append((i, "normal"))
-            elif threshold_1 < self.e[i] <= threshold_2:
-                self.error_range.append((i, "slight response"))
-            elif threshold_2 < self.e[i] <= threshold_3:
-                self.error_range.append((i, "mild response"))
-            elif threshold_3 < self.e[i] <= threshold_4:
-                self.error_range.append((i, "moderate response"))
-            elif threshold_4 < self.e[i] <= threshold_5:
-                self.error_range.append((i, "severe response"))
-            else:
-                self.error_range.append((i, "unknown"))
+        """
+        Classifies error magnitudes into qualitative response levels: one
+        int8 index into RESPONSE_LEVELS per sample from the second on.
+        """
+        self.levels = np.digitize(self.e[1:], RESPONSE_THRESHOLDS, right=True).astype(np.int8)
+
+    @property
+    def error_range(self):
+        """(sample, level name) of every classified sample, built when asked for."""
+        return [(i, RESPONSE_LEVELS[level]) for i, level in enumerate(self.levels.tolist(), start=1)]
+
+    def section_levels(self, section_size, sampling_rate=1000):
+        """Majority level (RESPONSE_LEVELS index) of each section of section_size seconds."""
+        return _section_levels(self.levels, section_size * sampling_rate)
 
     def error_lms_section(self, section_size, sampling_rate = 1000):
-        section_size = section_size * sampling_rate
-        sections = [self.error_range[i:i + section_size] for i in range(0, len(self.error_range), section_size)]
-        section_labels = []
-        for section in sections:
-            labels = {}
-            for _, label in section:
-                if label in labels:
-                    labels[label] += 1
-                else:
-                    labels[label] = 1
-            if labels:
-                max_label = max(labels, key=labels.get)
-                section_labels.append(max_label)
-            else:
-                section_labels.append("unknown")
-        return section_labels
-        
-    def average_threshold(self):
-        label_counts = {
-            "normal": 0,
-            "slight response": 0,
-            "mild response": 0,
-            "moderate response": 0,
-            "severe response": 0,
-            "unknown": 0
-        }
-        for _, label in self.error_range:
-            if label in label_counts:
-                label_counts[label] += 1
-                
-        max_label = max(label_counts, key=label_counts.get)
-        return max_label
+        return [RESPONSE_LEVELS[level] for level in self.section_levels(section_size, sampling_rate)]
 
+    def average_threshold(self):
+        counts = np.bincount(self.levels, minlength=len(RESPONSE_LEVELS))
+        return RESPONSE_LEVELS[int(counts.argmax())]
 
+    def result(self):
+        """The compact LMSResult kept in the analysis results (after update() and error())."""
+        return LMSResult(self)
 
     def plot(self): 
         """Plots estimated signal vs true signal, error evolution, and parameter updates."""
@@ -362,11 +371,10 @@ class LMSAdaptiveFilter:
         plt.plot(self.n, self.yHat, 'b', label='estimated mV values')
         plt.plot(self.n, self.e, 'r', label='estimation error')
         #error annotations
-        # Plotting error reactions based on error_range
-        for i, error_type in self.error_range:
-            if error_type == "normal":
-                pass  # Do nothing for "normal" case
-            elif error_type == "slight response":
+        # Plotting error reactions based on the response levels (normal ones are not annotated)
+        for i in np.flatnonzero(self.levels) + 1:
+            error_type = RESPONSE_LEVELS[self.levels[i - 1]]
+            if error_type == "slight response":
                 plt.annotate('Slight Response', xy=(i, self.e[i]), xytext=(i, self.e[i]+0.1),
                             arrowprops=dict(facecolor='black', shrink=0.05))
             elif error_type == "mild response":
@@ -407,6 +415,55 @@ class LMSAdaptiveFilter:
         # plt.show()
 
         return graph1, graph2
+
+
+#===============================================================================
+# CLASS: LMSResult
+#===============================================================================
+class LMSResult:
+    """
+    What the analysis keeps of an LMSAdaptiveFilter run: final weights,
+    error summary and the response level of every sample (int8), plus the
+    normalized input (float64, ~9 bytes per sample instead of six float64
+    traces and a tuple per sample).
+
+    The full-resolution traces (yHat, e, a1Hat, b1Hat) are not kept;
+    filter() runs the filter again on the stored input when they are needed
+    (e.g. for plot()) and gets the same traces as the original run.
+    """
+    __slots__ = ("N", "mode", "a1", "b1", "error_mean", "error_std", "error_max", "levels", "level", "_signal")
+
+    def __init__(self, lms):
+        self.N = lms.N
+        self.mode = lms.mode
+        self.a1 = float(lms.a1Hat[-1]) if lms.N else 0.0
+        self.b1 = float(lms.b1Hat[-1]) if lms.N else 0.0
+        e = lms.e[1:]
+        self.error_mean = float(np.mean(e)) if len(e) else 0.0
+        self.error_std = float(np.std(e)) if len(e) else 0.0
+        self.error_max = float(np.max(np.abs(e))) if len(e) else 0.0
+        self.levels = lms.levels
+        self.level = lms.average_threshold()
+        self._signal = lms.y
+
+    def section_levels(self, section_size, sampling_rate=1000):
+        return _section_levels(self.levels, section_size * sampling_rate)
+
+    def error_lms_section(self, section_size, sampling_rate=1000):
+        return [RESPONSE_LEVELS[level] for level in self.section_levels(section_size, sampling_rate)]
+
+    def average_threshold(self):
+        return self.level
+
+    def filter(self):
+        """A full LMSAdaptiveFilter, run again on the stored (already normalized) input."""
+        lms = LMSAdaptiveFilter(self._signal, self.mode, normalize=False)
+        lms.update()
+        lms.error()
+        return lms
+
+    def plot(self):
+        return self.filter().plot()
 #_______________________________________________________________________________#
 
 
@@ -427,20 +484,120 @@ def import_array_from_txt(filename):
 
 
 
-def import_matrix_from_txt(filename):
+# Signal columns, in the order every loader returns them
+SIGNAL_NAMES = ("emg", "ecg", "eda")
+
+# Bytes read from a file to work out its format
+SNIFF_BYTES = 4096
+
+def _is_number(field):
     try:
-        df = pd.read_csv(filename)
+        float(field)
+        return True
+    except ValueError:
+        return False
+
 
-        # Clean column names
-        df.columns = [c.strip().lower().replace(" ", "") for c in df.columns]
+def sniff_signal_file(filename):
+    """
+    Works out how a signal file is stored from its first bytes.
+
+    Recognises NumPy .npy files (session store), sessionRecorder .rec files,
+    signalArchive .sigz files and delimited text (sequence dumps, SD card exports) with or without a
+    header row. Header-less text is taken to be EMG, ECG, EDA columns, the
+    order of the baseline_sequence.txt / test_sequence.txt dumps.
+
+    Returns:
+        dict: "format" ('npy', 'rec', 'archive' or 'text'); for archives also
+              "fs"; for text also "delimiter"
+              (None for whitespace), "header" (bool), "columns" (column index
+              of EMG, ECG, EDA, None if missing), "time" (column index of a
+              timestamp, or None) and "fs" (value of an 'fs' column, or None).
+    """
+    with open(filename, "rb") as f:
+        head = f.read(SNIFF_BYTES)
+
+    if head.startswith(b"\x93NUMPY"):
+        return {"format": "npy"}
+    if head.lstrip().startswith(b"{"):
+        return {"format": "rec"}
+    if is_archive(head):
+        return {"format": "archive", "fs": SignalArchive(filename).fs}
+
+    lines = [line for line in head.decode("utf-8", errors="replace").splitlines() if line.strip()]
+    if not lines:
+        raise ValueError(f"{filename} is empty")
+    first = lines[0]
+
+    delimiter = next((d for d in (",", "\t", ";") if d in first), None)
+    fields = [f.strip() for f in first.split(delimiter)]
+    header = not all(_is_number(f) for f in fields if f)
+
+    fs = time = None
+    if header:
+        names = [f.lower().replace(" ", "") for f in fields]
+        columns = [next((i for i, name in enumerate(names) if key in name), None) for key in SIGNAL_NAMES]
+        time = next((i for i, name in enumerate(names) if "time" in name), None)
+        if "fs" in names and len(lines) > 1:
+            fs = float(lines[1].split(delimiter)[names.index("fs")])
+    else:
+        columns = [i if i < len(fields) else None for i in range(len(SIGNAL_NAMES))]
+
+    if all(col is None for col in columns):
+        raise ValueError(f"No EMG/ECG/EDA columns in {filename}: {fields}")
+
+    return {"format": "text", "delimiter": delimiter, "header": header, "columns": columns, "time": time, "fs": fs}
+
+
+def load_signal_matrix(filename):
+    """
+    Loads a signal file of any format sniff_signal_file recognises.
+
+    Text is parsed in one pass of pandas' C reader with the delimiter,
+    header row and signal columns already known, straight into float64 (no
+    column name or type inference); .npy files are memory-mapped and .sigz
+    archives decoded chunk by chunk.
+
+    Returns:
+        np.ndarray: (3, n) float64, rows EMG, ECG, EDA (one contiguous row per
+                    channel, like the session store). Rows of channels the
+                    file does not have are NaN.
+    """
+    fmt = sniff_signal_file(filename)
 
-        ecg_col = next(c for c in df.columns if "ecg" in c)
-        emg_col = next(c for c in df.columns if "emg" in c)
-        eda_col = next(c for c in df.columns if "eda" in c)
+    if fmt["format"] == "npy":
+        data = np.load(filename, mmap_mode="r", allow_pickle=False)
+        if data.ndim == 2 and data.shape[0] != len(SIGNAL_NAMES) and data.shape[1] == len(SIGNAL_NAMES):
+            data = np.ascontiguousarray(data.T)
+        return data
 
-        ecg = df[ecg_col].to_numpy(dtype=float)
-        emg = df[emg_col].to_numpy(dtype=float)
-        eda = df[eda_col].to_numpy(dtype=float)
+    if fmt["format"] == "rec":
+        _, data = load_recording(filename)
+        return np.ascontiguousarray(data.T)
+
+    if fmt["format"] == "archive":
+        return SignalArchive(filename).read()
+
+    # pandas returns the used columns in file order, whatever the order of usecols
+    usecols = sorted(col for col in fmt["columns"] if col is not None)
+    values = pd.read_csv(filename, sep=fmt["delimiter"] or r"\s+", header=None, skiprows=int(fmt["header"]),
+                         usecols=usecols, dtype=np.float64, engine="c").to_numpy()
+
+    data = np.full((len(SIGNAL_NAMES), len(values)), np.nan)
+    for row, col in enumerate(fmt["columns"]):
+        if col is not None:
+            data[row] = values[:, usecols.index(col)]
+    return data
+
+
+def import_matrix_from_txt(filename):
+    """
+    Imports a signal file (sequence dump, SD card export, ...) through
+    load_signal_matrix. Channels the file does not have come back as None.
+    """
+    try:
+        data = load_signal_matrix(filename)
+        emg, ecg, eda = [None if np.isnan(row).all() else row for row in data]
 
         # Return order expected by procResult:
         # emg_raw, ecg_raw, eda_raw, error
@@ -449,8 +606,80 @@ def import_matrix_from_txt(filename):
     except Exception as e:
         print(f"Error importing {filename}: {e}")
         return None, None, None, True
-    
-    
+
+
+def import_matrix_from_recording(filename, resample=False):
+    """
+    Imports a sessionRecorder .rec file written during a live session.
+    Samples are already in physical units; channels that were disabled
+    (header "enabled" mask) come back as None.
+
+    With resample=True the signals are resampled onto the nominal sampling
+    rate when the measured rate (acqStats sidecar) is off by more than
+    RESAMPLE_TOLERANCE_PPM.
+    """
+    try:
+        header, data = load_recording(filename)
+        enabled = header.get("enabled", [True, True, True])
+
+        if resample:
+            stats = load_stats(filename)
+            if stats and stats.get("effective_fs") and abs(stats["drift_ppm"]) > RESAMPLE_TOLERANCE_PPM:
+                print(f"Resampling {filename}: measured {stats['effective_fs']:.2f} Hz, nominal {header['fs']} Hz")
+                data = resample_to_nominal(data, stats["effective_fs"], header["fs"])
+
+        emg, ecg, eda = [data[:, col] if enabled[col] else None for col in range(3)]
+
+        # Same order as import_matrix_from_txt: emg_raw, ecg_raw, eda_raw, error
+        return emg, ecg, eda, False
+
+    except Exception as e:
+        print(f"Error importing {filename}: {e}")
+        return None, None, None, True
+
+
+def import_matrix_from_store(store_dir, phase, resample=False):
+    """
+    Imports one phase of a sessionStore store (memory-mapped, in physical
+    units). Disabled channels come back as None; resample works as in
+    import_matrix_from_recording, using the timing stored with the phase.
+    """
+    try:
+        store = SessionStore(store_dir)
+        info = store.phase_info(phase)
+        data = store.load_phase(phase)
+
+        timing = info.get("timing")
+        if resample and timing and timing.get("effective_fs") and abs(timing["drift_ppm"]) > RESAMPLE_TOLERANCE_PPM:
+            print(f"Resampling {phase}: measured {timing['effective_fs']:.2f} Hz, nominal {info['fs']} Hz")
+            data = resample_to_nominal(data.T, timing["effective_fs"], info["fs"]).T
+
+        emg, ecg, eda = [data[col] if info["enabled"][col] else None for col in range(3)]
+
+        # Same order as import_matrix_from_txt: emg_raw, ecg_raw, eda_raw, error
+        return emg, ecg, eda, False
+
+    except Exception as e:
+        print(f"Error importing {phase} from {store_dir}: {e}")
+        return None, None, None, True
+
+
+# Clock drift (parts per million) tolerated before a recording is resampled
+RESAMPLE_TOLERANCE_PPM = 1000
+
+def resample_to_nominal(data, fs_measured, fs_nominal):
+    #linear interpolation of (n, channels) samples taken at fs_measured onto a fs_nominal grid
+    data = np.asarray(data, dtype=np.float64)
+    n_out = int(round(len(data) * fs_nominal / fs_measured))
+    t_in = np.arange(len(data)) / fs_measured
+    t_out = np.arange(n_out) / fs_nominal
+
+    out = np.empty((n_out, data.shape[1]))
+    for col in range(data.shape[1]):
+        out[:, col] = np.interp(t_out, t_in, data[:, col])
+
+    return out
+
 
 #data Conversion to proper voltage range
 def convert_raw_to_voltage(raw_data, input_range=3.3):
@@ -470,8 +699,9 @@ def convert_raw_ecg(adc_data):
     #note that only 4 channels can be run at 10 bit at once for BITalino
     n = 10      #bit resolution 
 
-    ecg_v = [(((adc_val)/(2**(n))-0.5)*vcc)/gain for adc_val in adc_data]
-    ecg_mv = [ecg_v * 1000 for ecg_v in ecg_v]
+    adc_data = np.asarray(adc_data, dtype=np.float64)
+    ecg_v = ((adc_data/(2**(n))-0.5)*vcc)/gain
+    ecg_mv = ecg_v * 1000
 
     return ecg_mv
 
@@ -483,7 +713,8 @@ def convert_raw_eda(adc_data):
     #note that only 4 channels can be run at 10 bit at once for BITalino
     n = 10          #bit resolution
 
-    eda_us = [(((adc_val)/(2**(n)))*vcc)/(gain) for adc_val in adc_data]
+    adc_data = np.asarray(adc_data, dtype=np.float64)
+    eda_us = ((adc_data/(2**(n)))*vcc)/(gain)
     #eda_s = [eda_us * 1 * (10^(-6)) for ecg_v in eda_s] #optional conversion to s
 
     return eda_us
@@ -496,13 +727,82 @@ def convert_raw_emg(adc_data):
     #note that only 4 channels can be run at 10 bit at once for BITalino
     n = 10      #bit resolution
 
-    emg_v = [((adc_val)/(2**(n))-0.5)*vcc/gain for adc_val in adc_data]
-    emg_mv = [emg_v * 1000 for emg_v in emg_v]
+    adc_data = np.asarray(adc_data, dtype=np.float64)
+    emg_v = (adc_data/(2**(n))-0.5)*vcc/gain
+    emg_mv = emg_v * 1000
 
 
     return emg_mv
 
+# BITalino units after conversion, per [EMG, ECG, EDA] column
+BITALINO_UNITS = ["mV", "mV", "uS"]
+
+def convert_raw_block(block, enabled=(True, True, True)):
+    #converts an (n, 3) block of BITalino counts in [EMG, ECG, EDA] order in one go
+    #disabled channels are not converted and come back as NaN
+    block = np.asarray(block, dtype=np.float64)
+    converted = np.full(block.shape, np.nan)
+    for col, convert in enumerate((convert_raw_emg, convert_raw_ecg, convert_raw_eda)):
+        if enabled[col]:
+            converted[:, col] = convert(block[:, col])
+
+    return converted
+
 #Simple Threshold setter for peak identification
+#===============================================================================
+# PLOTTING FUNCTIONS
+#===============================================================================
+def plot_ecg_ml(signal, anomaly_indices, fs, reconstruction=None, title="ECG ML Result"):
+    """
+    Plots a processed ECG signal, its autoencoder reconstruction and the
+    detected anomalies.
+
+    Accepts 1-D or 2-D (n, 1) arrays. Builds a plain Figure (not through
+    pyplot), so it can be rendered in a figureRender worker or embedded in
+    a GUI canvas.
+    """
+    signal = np.asarray(signal, dtype=np.float64).flatten()
+
+    fig = Figure(figsize=(10, 4))
+    ax = fig.add_subplot()
+
+    if signal.size == 0:
+        ax.set_title(title)
+        ax.text(0.5, 0.5, "No ECG data available", ha="center", va="center")
+        ax.set_xlabel("Time (s)")
+        ax.set_ylabel("Amplitude")
+        fig.tight_layout()
+        return fig
+
+    t = np.arange(signal.size) / float(fs)
+    ax.plot(t, signal, label="Processed ECG")
+
+    if reconstruction is not None:
+        reconstruction = np.asarray(reconstruction, dtype=np.float64).flatten()
+        n = min(signal.size, reconstruction.size)
+        if n > 0:
+            ax.plot(t[:n], reconstruction[:n], label="Reconstruction", alpha=0.8)
+
+    anomaly_indices = np.asarray(anomaly_indices, dtype=int).flatten()
+    anomaly_indices = anomaly_indices[(anomaly_indices >= 0) & (anomaly_indices < signal.size)]
+
+    if anomaly_indices.size > 0:
+        ax.scatter(
+            t[anomaly_indices],
+            signal[anomaly_indices],
+            label="Anomalies",
+            s=20,
+        )
+
+    ax.set_title(title)
+    ax.set_xlabel("Time (s)")
+    ax.set_ylabel("Amplitude")
+    ax.legend(loc="best")
+    ax.grid(True)
+    fig.tight_layout()
+    return fig
+
+
 #===============================================================================
 # PEAK DETECTION FUNCTIONS
 #===============================================================================
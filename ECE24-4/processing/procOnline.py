@@ -0,0 +1,419 @@
+# procOnline.py
+#   • incremental analysis of a test phase while it is being recorded
+#   • subscribes to the acquisition engine; the work runs on its own thread
+#   • EMG / EDA: segmented wavelet denoising, running stats and sectioned stats
+#   • ECG: streaming decimation to the model rate and autoencoder scoring in window batches
+#   • when the phase ends only the tail is flushed and the LMS filter runs
+#
+# Results have the same shape as the file based analysis in procResult, so
+# the rest of the pipeline (Excel, result pages) does not care where they
+# came from. They can differ slightly from it: the wavelet threshold is
+# pooled over segments instead of computed over the whole phase, and the ECG
+# is decimated with a FIR filter instead of FFT resampling.
+#_______________________________________________________________________________#
+
+import queue
+import threading
+import traceback
+
+import numpy as np
+import pywt
+import torch
+from scipy.signal import firwin, lfilter, lfilter_zi
+
+import procFuncs as proc
+from ringBuffer import EMG, ECG, EDA
+
+from filtering.app.app_anomalies import TARGET_FS, detect_anomalies
+
+# Section length used for the sectioned stats plots (samples)
+SECTION_SIZE = 2000
+# Autoencoder windows scored per batch
+SCORE_BATCH = 512
+
+
+#===============================================================================
+# CLASS: RunningStats
+#===============================================================================
+class RunningStats:
+    """
+    Max, min, mean and standard deviation over a stream, updated a block at a
+    time (Chan et al. parallel variance). result() matches
+    error_stats.calculate_stats.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, x):
+        x = np.asarray(x, dtype=np.float64)
+        if x.size == 0:
+            return
+        n_b = x.size
+        mean_b = x.mean()
+        m2_b = np.square(x - mean_b).sum()
+
+        delta = mean_b - self.mean
+        total = self.n + n_b
+        self.mean += delta * n_b / total
+        self.m2 += m2_b + delta ** 2 * self.n * n_b / total
+        self.n = total
+        self.min = min(self.min, x.min())
+        self.max = max(self.max, x.max())
+
+    def result(self):
+        return {
+            'max': np.round(self.max, 3),
+            'min': np.round(self.min, 3),
+            'mean': np.round(self.mean, 3),
+            'std_dev': np.round(np.sqrt(self.m2 / self.n), 3),
+        }
+
+
+#===============================================================================
+# CLASS: SectionedStats
+#===============================================================================
+class SectionedStats:
+    """
+    Streaming error_stats.calculate_sectioned_stats: each section is
+    summarized as soon as it is complete; an incomplete last section is
+    dropped, as in the batch version.
+    """
+
+    def __init__(self, section_size=SECTION_SIZE):
+        self.section_size = section_size
+        self.stats = {}
+        self._partial = np.empty(0)
+
+    def update(self, x):
+        data = np.concatenate((self._partial, x))
+        n_full = len(data) // self.section_size
+        sections = data[:n_full * self.section_size].reshape(n_full, self.section_size)
+        self._partial = data[n_full * self.section_size:]
+
+        values = np.round(np.stack((sections.max(axis=1), sections.min(axis=1),
+                                    sections.mean(axis=1), sections.std(axis=1))), 3)
+        first = len(self.stats)
+        for i in range(n_full):
+            self.stats[f'{first + i + 1}'] = {
+                'max': values[0, i],
+                'min': values[1, i],
+                'mean': values[2, i],
+                'std_dev': values[3, i],
+            }
+
+
+#===============================================================================
+# CLASS: SegmentDenoiser
+#===============================================================================
+class SegmentDenoiser:
+    """
+    Streaming DiscreteWaveletTransform.clean_wave_data.
+
+    The stream is cleaned in segments; each one is decomposed together with
+    `margin` samples of context on both sides so its edges are free of
+    boundary effects, and only the segment itself is kept. The threshold
+    uses the standard deviation of the finest detail coefficients pooled over
+    all segments so far and the expected length of the whole phase.
+    """
+
+    def __init__(self, wavelet='db4', level=7, expected_len=None, segment=8192):
+        self.wavelet = wavelet
+        self.level = level
+        self.expected_len = expected_len
+        self.segment = segment
+        # reach of one sample through `level` filter stages
+        self.margin = (pywt.Wavelet(wavelet).dec_len - 1) * 2 ** level
+
+        self._buf = np.empty(0)
+        self._buf_start = 0   # absolute index of _buf[0]
+        self._pos = 0         # absolute index of the first sample not cleaned yet
+        self._d_n = 0
+        self._d_sum = 0.0
+        self._d_sumsq = 0.0
+
+    def update(self, x):
+        """Adds samples, returns the samples that could be cleaned so far."""
+        self._buf = np.concatenate((self._buf, x))
+        out = []
+        while self._buf_start + len(self._buf) - self._pos >= self.segment + self.margin:
+            out.append(self._clean(self._pos, self._pos + self.segment))
+            self._pos += self.segment
+
+            # keep one margin of history for the next segment
+            drop = self._pos - self.margin - self._buf_start
+            if drop > 0:
+                self._buf = self._buf[drop:]
+                self._buf_start += drop
+        return np.concatenate(out) if out else np.empty(0)
+
+    def flush(self):
+        """Cleans whatever is left at the end of the stream."""
+        end = self._buf_start + len(self._buf)
+        if end <= self._pos:
+            return np.empty(0)
+        out = self._clean(self._pos, end)
+        self._pos = end
+        return out
+
+    def _clean(self, start, stop):
+        lo = max(start - self.margin, self._buf_start)
+        hi = min(stop + self.margin, self._buf_start + len(self._buf))
+        data = self._buf[lo - self._buf_start:hi - self._buf_start]
+
+        coeffs = pywt.wavedec(data, self.wavelet, level=self.level)
+        detail = coeffs[-1]
+        self._d_n += detail.size
+        self._d_sum += detail.sum()
+        self._d_sumsq += np.square(detail).sum()
+
+        mean = self._d_sum / self._d_n
+        std = np.sqrt(max(self._d_sumsq / self._d_n - mean ** 2, 0.0))
+        n = max(self.expected_len or 0, stop)
+        threshold = std * np.sqrt(2 * np.log(n))
+
+        new_coeffs = [pywt.threshold(c, threshold, mode='soft') for c in coeffs]
+        cleaned = pywt.waverec(new_coeffs, self.wavelet)[:len(data)]
+        return cleaned[start - lo:stop - lo]
+
+
+#===============================================================================
+# CLASS: EcgScorer
+#===============================================================================
+class EcgScorer:
+    """
+    Streaming app_anomalies.detect_anomalies.
+
+    Samples are low-pass filtered and decimated to TARGET_FS as they arrive
+    (FIR with carried state, group delay removed), and every SCORE_BATCH
+    complete windows are run through the autoencoder. Window errors and the
+    overlap-averaged reconstruction accumulate as the phase goes on.
+
+    If fs is not a multiple of TARGET_FS the samples are only collected and
+    detect_anomalies runs on them in finish().
+    """
+
+    def __init__(self, fs, model_params, expected_len=0):
+        self.fs = fs
+        self.model, self.mean, self.scale, self.threshold, self.window = model_params
+        self.streaming = fs % TARGET_FS == 0
+        self._n_in = 0
+
+        if not self.streaming:
+            self._raw = []
+            return
+
+        self.q = fs // TARGET_FS
+        if self.q > 1:
+            self._taps = firwin(16 * self.q + 1, 0.8 * TARGET_FS / 2, fs=fs)
+            self._delay = (len(self._taps) - 1) // 2
+            self._zi = None
+        else:
+            self._delay = 0
+
+        capacity = int(expected_len // self.q) + 1
+        self._signal = np.empty(capacity)
+        self._recon = np.zeros(capacity)
+        self._counts = np.zeros(capacity)
+        self._n = 0            # decimated samples so far
+        self._scored = 0       # windows scored so far
+        self._errors = []
+
+    def update(self, x):
+        if not self.streaming:
+            self._raw.append(np.array(x, dtype=np.float64))
+            return
+        self._append(self._decimate(np.asarray(x, dtype=np.float64)))
+        # the final length may still lose a sample when it is trimmed, keep one spare
+        self._score(self._n - self.window - 1)
+
+    def finish(self):
+        if not self.streaming:
+            signals = np.concatenate(self._raw).reshape(-1, 1) if self._raw else np.empty((0, 1))
+            return detect_anomalies(self.model, signals, self.fs, self.mean, self.scale,
+                                    self.threshold, self.window)
+
+        n_total = self._n_in
+        if self.q > 1 and n_total:
+            # push the last group delay worth of samples out of the filter
+            last = self._last
+            self._append(self._decimate(np.full(self._delay, last), padding=True))
+        self._n = min(self._n, int(n_total * TARGET_FS / self.fs))
+        self._score(self._n - self.window, final=True)
+
+        n = self._n
+        errors = np.concatenate(self._errors) if self._errors else np.empty((0, 1))
+        anomalies = errors.mean(axis=1) > self.threshold
+        counts = self._counts[:n].copy()
+        counts[counts == 0] = 1
+
+        return {
+            "errors":          errors,
+            "anomalies":       anomalies,
+            "anomaly_indices": np.flatnonzero(anomalies).astype(np.int64),
+            "reconstruction":  (self._recon[:n] / counts).reshape(-1, 1),
+            "proc_signals":    self._signal[:n].reshape(-1, 1).copy(),
+        }
+
+    def _decimate(self, x, padding=False):
+        if not padding:
+            self._n_in += len(x)
+            if len(x):
+                self._last = x[-1]
+        if self.q == 1:
+            return x
+
+        if self._zi is None:
+            if len(x) == 0:
+                return x
+            self._zi = lfilter_zi(self._taps, 1.0) * x[0]
+            self._filtered = 0
+        y, self._zi = lfilter(self._taps, 1.0, x, zi=self._zi)
+
+        # output k approximates input k - delay; keep inputs 0, q, 2q, ...
+        k = self._filtered + np.arange(len(y))
+        self._filtered += len(y)
+        keep = (k >= self._delay) & ((k - self._delay) % self.q == 0)
+        return y[keep]
+
+    def _append(self, x):
+        end = self._n + len(x)
+        if end > len(self._signal):
+            grow = max(end, 2 * len(self._signal))
+            for name in ('_signal', '_recon', '_counts'):
+                old = getattr(self, name)
+                new = np.zeros(grow)
+                new[:self._n] = old[:self._n]
+                setattr(self, name, new)
+        self._signal[self._n:end] = x
+        self._n = end
+
+    def _score(self, n_windows, final=False):
+        # windows i = 0 .. n_windows-1, like create_windows' range(len - window)
+        while self._scored < n_windows:
+            i0 = self._scored
+            i1 = min(n_windows, i0 + SCORE_BATCH)
+            if i1 - i0 < SCORE_BATCH and not final:
+                break  # wait for a full batch while the phase is still running
+
+            scaled = (self._signal[i0:i1 + self.window - 1].reshape(-1, 1) - self.mean) / self.scale
+            X = torch.tensor(
+                np.lib.stride_tricks.sliding_window_view(scaled, (self.window, 1))[:, 0],
+                dtype=torch.float32,
+            )
+            with torch.no_grad():
+                recon = self.model(X)
+                self._errors.append(((recon - X) ** 2).mean(dim=2).numpy())
+
+            values = recon[:, :, 0].numpy() * self.scale[0] + self.mean[0]
+            for k in range(self.window):
+                self._recon[i0 + k:i1 + k] += values[:, k]
+                self._counts[i0 + k:i1 + k] += 1
+            self._scored = i1
+
+
+#===============================================================================
+# CLASS: PhaseAnalyzer
+#===============================================================================
+class PhaseAnalyzer:
+    """
+    Acquisition subscriber that analyzes one phase (baseline or test) while
+    it is recorded.
+
+    __call__ only queues the block; a worker thread does the processing so
+    the acquisition loop is never held up. close() marks the end of the
+    phase and lets the worker finish in the background; result() waits for
+    it and returns
+
+        {'emg': {'clean', 'stats', 'sections', 'lms'} or None,
+         'eda': {...} or None,
+         'ecg': detect_anomalies style dict or None}
+    """
+
+    def __init__(self, fs, channels, duration, ecg_model=None, section_size=SECTION_SIZE):
+        expected = int(fs * duration)
+        self.fs = fs
+        self.samples = 0   # samples received so far
+        self.tracks = {}
+        for name, col in (('emg', EMG), ('eda', EDA)):
+            if channels[col]:
+                self.tracks[name] = (col, SegmentDenoiser('db4', 7, expected),
+                                     RunningStats(), SectionedStats(section_size), [])
+        self.ecg = EcgScorer(fs, ecg_model, expected) if channels[ECG] and ecg_model is not None else None
+
+        self.error = None
+        self._result = None
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def __call__(self, block):
+        """Subscriber entry point for acqEngine (accepts a Block)."""
+        self._queue.put(block.samples)
+
+    def close(self):
+        """Ends the phase; finalization carries on in the background."""
+        self._queue.put(None)
+
+    def result(self):
+        """Waits for the worker and returns the phase results (None if it failed)."""
+        self._thread.join()
+        return self._result
+
+    def _run(self):
+        try:
+            while True:
+                samples = self._queue.get()
+                if samples is None:
+                    break
+                self._process(samples)
+            self._result = self._finish()
+        except Exception as e:
+            print(f"Online analysis failed: {e}")
+            traceback.print_exc()
+            self.error = e
+
+    def _process(self, samples):
+        self.samples += len(samples)
+        for col, denoiser, stats, sections, cleaned in self.tracks.values():
+            self._consume(denoiser.update(samples[:, col]), stats, sections, cleaned)
+        if self.ecg is not None:
+            self.ecg.update(samples[:, ECG])
+
+    @staticmethod
+    def _consume(x, stats, sections, cleaned):
+        if len(x):
+            stats.update(x)
+            sections.update(x)
+            cleaned.append(x)
+
+    def _finish(self):
+        result = {'emg': None, 'eda': None, 'ecg': None}
+        for name, (col, denoiser, stats, sections, cleaned) in self.tracks.items():
+            self._consume(denoiser.flush(), stats, sections, cleaned)
+            clean = np.concatenate(cleaned) if cleaned else np.empty(0)
+            result[name] = {
+                'clean': clean,
+                'stats': stats.result() if stats.n else None,
+                'sections': sections.stats,
+                'lms': _lms(clean),
+            }
+        if self.ecg is not None:
+            result['ecg'] = self.ecg.finish()
+        return result
+
+
+def _lms(signal):
+    try:
+        lms = proc.LMSAdaptiveFilter(signal)
+        lms.update()
+        lms.error()
+        # only the compact result stays in the analysis results, not the filter's traces
+        return lms.result()
+    except Exception as e:
+        print(f"LMS filter failed: {e}")
+        return None
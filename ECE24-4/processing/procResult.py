@@ -1,52 +1,109 @@
 # procResult.py
 #   • processes baseline + test biosignals
 #   • calls detect_anomalies() directly (no localhost server needed)
-#   • computes stats, LMS filters, and plots
+#   • computes stats, LMS filters, and plots (figure specs, rasterized by figureRender in worker processes)
+#   • uses the results of online analysis (procOnline) when the phase was analyzed while recorded
+#     (unless its clock drifted, then the resampled recording is analyzed instead)
+#   • every analysis is an AnalysisSession: its own scratch directory and results, source files read in place,
+#     so several recordings can be analyzed at once (analyze_sessions runs them in worker processes)
 # _______________________________________________________________________________
 
+import multiprocessing
+import os
+import shutil
+import tempfile
 import traceback
+from concurrent.futures import ProcessPoolExecutor
 
 import numpy as np
-import matplotlib.pyplot as plt
 
 import procFuncs as proc
+import procOnline
 import saveFuncs as sv
 import hearingTest as sound
+from acqStats import load_stats
+from sessionRecorder import recording_path
+from sessionStore import SessionStore
+from patientCatalog import PatientCatalog
+from figureRender import figure_spec, get_renderer
 
 from filtering.app.app_anomalies import load_model, detect_anomalies
 
+# Put live recordings back on their nominal sampling rate if the device clock drifted
+RESAMPLE_TO_NOMINAL = True
 
 # =============================================================================
-# GLOBAL STATE
+# SESSION
 # =============================================================================
 
-analysis_results = {
-    'ecg': {'baseline': None, 'test': None, 'diff': None, 'flags': None, 'filter': None},
-    'emg': {'baseline': None, 'test': None, 'diff': None, 'flags': None, 'filter': None},
-    'eda': {'baseline': None, 'test': None, 'diff': None, 'flags': None, 'filter': None},
-}
-
-graphs = {
-    'Baseline Stats': [],
-    'Test Stats': [],
-    'LMS Adaptive Filtering': [],
-}
-
-ml_predictions = {'ecg': {}}
-
-ml_graphs = {
-    'ecg': {'baseline': None, 'test': None},
-    'emg': {'baseline': None, 'test': None},
-    'eda': {'baseline': None, 'test': None},
-}
-
-ml_data = {
-    'ecg': {
-        'baseline_data': {},
-        'test_data': {},
-        'percent_difference': {},
-    }
-}
+class AnalysisSession:
+    """
+    One analysis of a recording: where its data comes from, a scratch
+    directory and the results.
+
+    A live session's phases are found next to the workbook (session store or
+    recordings); loaded data names its files in sources, which are read
+    where they are. Use it as a context manager so the scratch directory is
+    removed afterwards:
+
+        with AnalysisSession(excel_file, channels, fs, sources) as session:
+            main(session, controller)
+
+    Attributes:
+        file_path (str): Patient workbook the results are saved to.
+        channels (list[bool]): Channels recorded [EMG, ECG, EDA].
+        samplingRate (int): Sampling rate (Hz).
+        sources (dict): Signal file of each phase ('baseline', 'test'), for
+            data that is not a live session.
+        workdir (str): Scratch directory while the session is open, else None.
+    """
+
+    def __init__(self, file_path, channels, samplingRate, sources=None):
+        self.file_path = file_path
+        self.channels = list(channels)
+        self.samplingRate = samplingRate
+        self.sources = dict(sources or {})
+        self.workdir = None
+
+        self.analysis_results = {
+            'ecg': {'baseline': None, 'test': None, 'diff': None, 'flags': None, 'filter': None},
+            'emg': {'baseline': None, 'test': None, 'diff': None, 'flags': None, 'filter': None},
+            'eda': {'baseline': None, 'test': None, 'diff': None, 'flags': None, 'filter': None},
+        }
+
+        self.graphs = {
+            'Baseline Stats': [],
+            'Test Stats': [],
+            'LMS Adaptive Filtering': [],
+        }
+
+        self.ml_predictions = {'ecg': {}}
+
+        self.ml_graphs = {
+            'ecg': {'baseline': None, 'test': None},
+            'emg': {'baseline': None, 'test': None},
+            'eda': {'baseline': None, 'test': None},
+        }
+
+        self.ml_data = {
+            'ecg': {
+                'baseline_data': {},
+                'test_data': {},
+                'percent_difference': {},
+            }
+        }
+
+    def __enter__(self):
+        self.workdir = tempfile.mkdtemp(prefix="analysis_")
+        return self
+
+    def __exit__(self, *exc):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+        self.workdir = None
+
+
+# Analyzers of phases being recorded, keyed by (file_path, phase)
+online_phases = {}
 
 _model_cache = None
 
@@ -58,6 +115,36 @@ def _get_model():
     return _model_cache
 
 
+def start_online_phase(file_path, phase, channels, samplingRate, duration):
+    """
+    Creates the online analyzer of a phase that is about to be recorded.
+    Subscribe it to the acquisition engine and close() it when the phase
+    ends; the analysis of the session with the same file_path picks up its
+    results.
+    """
+    model = None
+    if channels[1]:
+        try:
+            model = _get_model()
+        except Exception as e:
+            print(f"[ML ERROR] {e}")
+
+    analyzer = procOnline.PhaseAnalyzer(samplingRate, channels, duration, ecg_model=model)
+    online_phases[(file_path, phase)] = analyzer
+    return analyzer
+
+
+def discard_online_phase(file_path, phase):
+    """
+    Drops the online analyzer of a phase whose results will not be used
+    (the recording was aborted or the analysis is over), so it does not
+    stay in online_phases for the life of the process.
+    """
+    analyzer = online_phases.pop((file_path, phase), None)
+    if analyzer is not None:
+        analyzer.close()
+
+
 # =============================================================================
 # HELPERS
 # =============================================================================
@@ -75,15 +162,106 @@ def _run_ecg_ml(ecg_signal, fs):
     except Exception as e:
         print(f"[ML ERROR] {e}")
         traceback.print_exc()
+        return _empty_ecg_result(len(ecg_signal))
 
-        n = len(ecg_signal)
-        return {
-            "errors": np.zeros((max(n - 100, 0), 1)),
-            "anomalies": np.zeros(max(n - 100, 0), dtype=bool),
-            "anomaly_indices": np.array([], dtype=np.int64),
-            "reconstruction": np.zeros((n, 1)),
-            "proc_signals": np.zeros((n, 1)),
-        }
+
+def _empty_ecg_result(n):
+    """detect_anomalies style result without anomalies, for n ECG samples the model could not score."""
+    return {
+        "errors": np.zeros((max(n - 100, 0), 1)),
+        "anomalies": np.zeros(max(n - 100, 0), dtype=bool),
+        "anomaly_indices": np.array([], dtype=np.int64),
+        "reconstruction": np.zeros((n, 1)),
+        "proc_signals": np.zeros((n, 1)),
+    }
+
+
+def _phase_drift_ppm(session, phase):
+    """
+    Clock drift measured while a live phase was recorded (timing in the
+    store, else the recording's acqStats sidecar), or None if unknown.
+    """
+    if not session.file_path:
+        return None
+    timing = None
+    store = SessionStore.for_workbook(session.file_path)
+    if store.exists() and phase in store.phases():
+        timing = store.phase_info(phase).get("timing")
+    if timing is None:
+        timing = load_stats(recording_path(session.file_path, phase))
+    if timing and timing.get("effective_fs"):
+        return timing["drift_ppm"]
+    return None
+
+
+def _import_phase(session, phase):
+    """
+    Loads one phase. A signal file named in session.sources is read in
+    place (SD card / loaded data); otherwise a live session's store next to
+    the workbook is used when it has the phase, then its recording. Phases
+    whose measured sampling rate drifted are put back on the nominal rate,
+    so the ML resample step sees the rate it is told.
+    """
+    if phase in session.sources:
+        return proc.import_matrix_from_txt(session.sources[phase])
+
+    if session.file_path:
+        store = SessionStore.for_workbook(session.file_path)
+        if store.exists() and phase in store.phases():
+            return proc.import_matrix_from_store(store.path, phase, resample=RESAMPLE_TO_NOMINAL)
+
+        rec_path = recording_path(session.file_path, phase)
+        if os.path.exists(rec_path):
+            return proc.import_matrix_from_recording(rec_path, resample=RESAMPLE_TO_NOMINAL)
+
+    print(f"No {phase} data for {session.file_path}")
+    return None, None, None, True
+
+
+def _phase_summary(session, phase):
+    """
+    Cleaned signals, stats, sectioned stats, LMS filters and ECG results of
+    one phase. Taken from the online analyzer when the phase had one,
+    otherwise computed from the store / recording / signal file. The online
+    analyzer saw the samples at the rate they arrived, so a phase whose
+    clock drifted by more than RESAMPLE_TOLERANCE_PPM is analyzed again from
+    the resampled data instead (with RESAMPLE_TO_NOMINAL).
+    """
+    channels, samplingRate = session.channels, session.samplingRate
+
+    analyzer = online_phases.pop((session.file_path, phase), None)
+    if analyzer is not None:
+        drift = _phase_drift_ppm(session, phase) if RESAMPLE_TO_NOMINAL else None
+        if drift is not None and abs(drift) > proc.RESAMPLE_TOLERANCE_PPM:
+            print(f"{phase}: clock drift {drift:+.0f} ppm, analyzing the resampled recording instead of the online results")
+            analyzer.close()
+        else:
+            summary = analyzer.result()
+            if summary is not None:
+                if channels[1] and summary['ecg'] is None:
+                    # the model could not be loaded for the phase: same shape as the file path gives
+                    summary['ecg'] = _empty_ecg_result(analyzer.samples)
+                return summary
+
+    emg_raw, ecg_raw, eda_raw, error = _import_phase(session, phase)
+    if error:
+        raise ValueError(f"Error loading the {phase} data")
+
+    summary = {'emg': None, 'eda': None, 'ecg': None}
+    for name, raw, enabled in (('emg', emg_raw, channels[0]), ('eda', eda_raw, channels[2])):
+        if enabled and raw is not None:
+            clean = proc.DiscreteWaveletTransform('db4', 7).clean_wave_data(raw)
+            summary[name] = {
+                'clean': clean,
+                'stats': proc.error_stats(clean).calculate_stats(),
+                'sections': proc.error_stats.calculate_sectioned_stats(clean, procOnline.SECTION_SIZE),
+                'lms': _apply_lms_filter(clean),
+            }
+
+    if channels[1] and ecg_raw is not None:
+        summary['ecg'] = _run_ecg_ml(np.asarray(ecg_raw, dtype=np.float64), samplingRate)
+
+    return summary
 
 
 def _apply_lms_filter(signal):
@@ -91,7 +269,8 @@ def _apply_lms_filter(signal):
         lms = proc.LMSAdaptiveFilter(signal)
         lms.update()
         lms.error()
-        return lms
+        # only the compact result stays in the analysis results, not the filter's traces
+        return lms.result()
 
     except Exception as e:
         print(f"LMS filter failed: {e}")
@@ -99,9 +278,8 @@ def _apply_lms_filter(signal):
         return None
 
 
-def _create_stats_plot(signal, title, section_size=2000):
-    stats_result = proc.error_stats.calculate_sectioned_stats(signal, section_size)
-    return proc.error_stats.plot_sectioned_stats(stats_result, title)
+def _create_stats_plot(sections, title):
+    return figure_spec(proc.error_stats.plot_sectioned_stats, sections, title)
 
 
 def _percent_difference_dict(baseline_stats, test_stats):
@@ -120,83 +298,45 @@ def _percent_difference_dict(baseline_stats, test_stats):
 
 def _plot_ecg_ml(signal, anomaly_indices, fs, reconstruction=None, title="ECG ML Result"):
     """
-    Local ECG plotting helper.
-
-    This replaces filtering.app.app_anomalies.plot_anomalies because that function
-    expects a 2-D array and indexes proc_signal[:, 0]. This helper accepts either
-    1-D or 2-D arrays and always flattens safely for plotting.
+    Spec of the ECG anomaly plot (procFuncs.plot_ecg_ml), rendered by
+    figureRender for the workbook and the GUI pages.
     """
-    signal = np.asarray(signal, dtype=np.float64).flatten()
-
-    if signal.size == 0:
-        fig, ax = plt.subplots(figsize=(10, 4))
-        ax.set_title(title)
-        ax.text(0.5, 0.5, "No ECG data available", ha="center", va="center")
-        ax.set_xlabel("Time (s)")
-        ax.set_ylabel("Amplitude")
-        fig.tight_layout()
-        return fig
-
-    t = np.arange(signal.size) / float(fs)
-
-    fig, ax = plt.subplots(figsize=(10, 4))
-    ax.plot(t, signal, label="Processed ECG")
-
-    if reconstruction is not None:
-        reconstruction = np.asarray(reconstruction, dtype=np.float64).flatten()
-        n = min(signal.size, reconstruction.size)
-        if n > 0:
-            ax.plot(t[:n], reconstruction[:n], label="Reconstruction", alpha=0.8)
-
-    anomaly_indices = np.asarray(anomaly_indices, dtype=int).flatten()
-    anomaly_indices = anomaly_indices[(anomaly_indices >= 0) & (anomaly_indices < signal.size)]
-
-    if anomaly_indices.size > 0:
-        ax.scatter(
-            t[anomaly_indices],
-            signal[anomaly_indices],
-            label="Anomalies",
-            s=20,
-        )
+    return figure_spec(proc.plot_ecg_ml, signal, anomaly_indices, fs,
+                       reconstruction=reconstruction, title=title)
+
 
-    ax.set_title(title)
-    ax.set_xlabel("Time (s)")
-    ax.set_ylabel("Amplitude")
-    ax.legend(loc="best")
-    ax.grid(True)
-    fig.tight_layout()
-    return fig
+def _session_figures(session):
+    """Every figure spec of a session (stats graphs and ML graphs)."""
+    specs = [spec for specs in session.graphs.values() for spec in specs]
+    specs += [spec for phases in session.ml_graphs.values() for spec in phases.values()]
+    return [spec for spec in specs if spec is not None]
 
 
 # =============================================================================
 # BASELINE ANALYSIS
 # =============================================================================
 
-def analyze_baseline(channels, samplingRate, controller):
-    global analysis_results, ml_graphs, graphs
+def analyze_baseline(session):
+    analysis_results, graphs, ml_graphs = session.analysis_results, session.graphs, session.ml_graphs
 
     for k in graphs:
         graphs[k] = []
 
-    emg_raw, ecg_raw, eda_raw, error = proc.import_matrix_from_txt('baseline_sequence.txt')
-    if error:
-        raise ValueError("Error loading baseline_sequence.txt")
+    summary = _phase_summary(session, 'baseline')
 
     # ── EDA ──────────────────────────────────────────────────────────────────
-    if channels[2] and eda_raw is not None:
-        eda_clean = proc.DiscreteWaveletTransform('db4', 7).clean_wave_data(eda_raw)
-
-        analysis_results['eda']['baseline'] = proc.error_stats(eda_clean).calculate_stats()
-        analysis_results['eda']['filter'] = _apply_lms_filter(eda_clean)
+    eda = summary['eda']
+    if eda is not None:
+        analysis_results['eda']['baseline'] = eda['stats']
+        analysis_results['eda']['filter'] = eda['lms']
 
         graphs['Baseline Stats'].append(
-            _create_stats_plot(eda_clean, "EDA Baseline Stats")
+            _create_stats_plot(eda['sections'], "EDA Baseline Stats")
         )
 
     # ── ECG ──────────────────────────────────────────────────────────────────
-    if channels[1] and ecg_raw is not None:
-        ecg_arr = np.asarray(ecg_raw, dtype=np.float64)
-        result = _run_ecg_ml(ecg_arr, samplingRate)
+    result = summary['ecg']
+    if result is not None:
 
         print("DEBUG baseline proc_signals shape:", np.asarray(result["proc_signals"]).shape)
         print("DEBUG baseline proc_signals min/max:", np.min(result["proc_signals"]), np.max(result["proc_signals"]))
@@ -221,31 +361,28 @@ def analyze_baseline(channels, samplingRate, controller):
         )
 
     # ── EMG ──────────────────────────────────────────────────────────────────
-    if channels[0] and emg_raw is not None:
-        emg_clean = proc.DiscreteWaveletTransform('db4', 7).clean_wave_data(emg_raw)
-
-        analysis_results['emg']['baseline'] = proc.error_stats(emg_clean).calculate_stats()
-        analysis_results['emg']['filter'] = _apply_lms_filter(emg_clean)
+    emg = summary['emg']
+    if emg is not None:
+        analysis_results['emg']['baseline'] = emg['stats']
+        analysis_results['emg']['filter'] = emg['lms']
 
 
 # =============================================================================
 # TEST ANALYSIS
 # =============================================================================
 
-def analyze_result(channels, samplingRate, controller):
-    global analysis_results, ml_predictions, graphs, ml_graphs, ml_data
+def analyze_result(session):
+    analysis_results, graphs, ml_graphs = session.analysis_results, session.graphs, session.ml_graphs
+    ml_predictions, ml_data = session.ml_predictions, session.ml_data
 
-    emg_raw, ecg_raw, eda_raw, error = proc.import_matrix_from_txt('test_sequence.txt')
-    if error:
-        raise ValueError("Error loading test_sequence.txt")
+    summary = _phase_summary(session, 'test')
 
     print("DEBUG: loaded test_sequence")
 
     # ── EDA ──────────────────────────────────────────────────────────────────
-    if channels[2] and eda_raw is not None:
-        eda_clean = proc.DiscreteWaveletTransform('db4', 7).clean_wave_data(eda_raw)
-
-        analysis_results['eda']['test'] = proc.error_stats(eda_clean).calculate_stats()
+    eda = summary['eda']
+    if eda is not None:
+        analysis_results['eda']['test'] = eda['stats']
         analysis_results['eda']['diff'] = proc.error_stats.calculate_percent_difference(
             analysis_results['eda']['baseline'],
             analysis_results['eda']['test'],
@@ -253,23 +390,19 @@ def analyze_result(channels, samplingRate, controller):
         analysis_results['eda']['flags'] = proc.error_stats.assign_flags(
             analysis_results['eda']['diff']
         )
-        analysis_results['eda']['test_filter'] = _apply_lms_filter(eda_clean)
+        analysis_results['eda']['test_filter'] = eda['lms']
 
         graphs['Test Stats'].append(
-            _create_stats_plot(eda_clean, "EDA Test Stats")
+            _create_stats_plot(eda['sections'], "EDA Test Stats")
         )
 
-    print("DEBUG channels:", channels)
-    print("DEBUG ecg_raw is None?", ecg_raw is None)
+    print("DEBUG channels:", session.channels)
+    print("DEBUG ecg result is None?", summary['ecg'] is None)
 
     # ── ECG ──────────────────────────────────────────────────────────────────
-    if channels[1] and ecg_raw is not None:
+    result = summary['ecg']
+    if result is not None:
         print("DEBUG: entering ECG test block")
-
-        ecg_arr = np.asarray(ecg_raw, dtype=np.float64)
-        result = _run_ecg_ml(ecg_arr, samplingRate)
-
-        print("DEBUG: finished _run_ecg_ml")
         print("DEBUG test proc_signals shape:", np.asarray(result["proc_signals"]).shape)
         print("DEBUG test proc_signals min/max:", np.min(result["proc_signals"]), np.max(result["proc_signals"]))
         print("DEBUG test reconstruction shape:", np.asarray(result["reconstruction"]).shape)
@@ -328,10 +461,9 @@ def analyze_result(channels, samplingRate, controller):
         ml_data['ecg']['percent_difference'] = analysis_results['ecg']['diff']
 
     # ── EMG ──────────────────────────────────────────────────────────────────
-    if channels[0] and emg_raw is not None:
-        emg_clean = proc.DiscreteWaveletTransform('db4', 7).clean_wave_data(emg_raw)
-
-        analysis_results['emg']['test'] = proc.error_stats(emg_clean).calculate_stats()
+    emg = summary['emg']
+    if emg is not None:
+        analysis_results['emg']['test'] = emg['stats']
         analysis_results['emg']['diff'] = proc.error_stats.calculate_percent_difference(
             analysis_results['emg']['baseline'],
             analysis_results['emg']['test'],
@@ -339,10 +471,10 @@ def analyze_result(channels, samplingRate, controller):
         analysis_results['emg']['flags'] = proc.error_stats.assign_flags(
             analysis_results['emg']['diff']
         )
-        analysis_results['emg']['test_filter'] = _apply_lms_filter(emg_clean)
+        analysis_results['emg']['test_filter'] = emg['lms']
 
         graphs['Test Stats'].append(
-            _create_stats_plot(emg_clean, "EMG Test Stats")
+            _create_stats_plot(emg['sections'], "EMG Test Stats")
         )
 
 
@@ -350,29 +482,103 @@ def analyze_result(channels, samplingRate, controller):
 # MAIN PIPELINE
 # =============================================================================
 
-def main(file_path, channels, samplingRate, controller):
+def analyze(session):
+    """Analyzes both phases of a session and saves the results; returns the session."""
+    renderer = get_renderer()
+    renderer.start()
+
     try:
         print("DEBUG: starting baseline")
-        analyze_baseline(channels, samplingRate, controller)
+        analyze_baseline(session)
+        # the baseline figures render while the test phase is analyzed
+        renderer.submit_all(_session_figures(session))
 
         print("DEBUG: starting test")
-        analyze_result(channels, samplingRate, controller)
+        analyze_result(session)
+        renderer.submit_all(_session_figures(session))
+    finally:
+        # analyzers a failed analysis did not get to
+        for phase in ('baseline', 'test'):
+            discard_online_phase(session.file_path, phase)
+
+    print("DEBUG: finished analyze_result")
+
+    # one load and one save of the patient workbook for every result sheet
+    print("DEBUG: saving results")
+    with sv.WorkbookReport(session.file_path) as report:
+        report.add_graphs(session.graphs)
+        report.add_stats_results(session.analysis_results)
+
+        if session.channels[1]:
+            report.add_ml_results(session.ml_predictions, session.ml_data)
+            report.add_ml_graphs(session.ml_graphs)
+
+    # numeric results also go to the session store, for tools that should not parse the workbook
+    SessionStore.for_workbook(session.file_path).write_results(
+        session.analysis_results, session.ml_predictions if session.channels[1] else None)
+    try:
+        PatientCatalog().record_results(session.file_path, session.analysis_results,
+                                        session.ml_predictions if session.channels[1] else None)
+    except Exception as e:
+        print(f"Could not update the patient catalogue: {e}")
+    return session
+
+
+def init_worker():
+    """
+    Initializer of analysis worker processes: loads the ECG model once per
+    worker, before its first session, and renders figures in the worker
+    itself (it is already one of several processes, no pool of its own).
+    """
+    get_renderer().workers = 0
+    try:
+        _get_model()
+    except Exception as e:
+        # sessions without ECG still run; _run_ecg_ml reports the error per session
+        print(f"[ML ERROR] {e}")
 
-        print("DEBUG: finished analyze_result")
 
-        print("DEBUG: saving graphs")
-        sv.save_graphs_to_excel(file_path, graphs)
+def _analyze_in_worker(session):
+    with session:
+        analyze(session)
+    return session.file_path
 
-        print("DEBUG: saving stats")
-        sv.save_stats_results_to_excel(file_path, analysis_results)
 
-        if channels[1]:
-            print("DEBUG: saving ML")
-            sv.save_ml_results_to_excel(file_path, ml_predictions, ml_data)
+def analyze_sessions(sessions, workers=None):
+    """
+    Analyzes several sessions at once, each in its own worker process, and
+    saves each one's results to its workbook.
+
+    Args:
+        sessions (list[AnalysisSession]): Sessions to analyze (not open).
+        workers (int): Worker processes; defaults to one per CPU.
+
+    Returns:
+        dict: {file_path: None if it succeeded, else the error message}.
+    """
+    # spawn, not fork: the GUI process runs Tk and other threads
+    context = multiprocessing.get_context("spawn")
+    outcome = {}
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=init_worker) as pool:
+        futures = {pool.submit(_analyze_in_worker, session): session.file_path for session in sessions}
+        for future, file_path in futures.items():
+            try:
+                future.result()
+                outcome[file_path] = None
+            except Exception as e:
+                traceback.print_exc()
+                outcome[file_path] = str(e)
+    return outcome
+
+
+def main(session, controller):
+    try:
+        analyze(session)
 
-            print("DEBUG: saving ML graphs")
-            sv.save_ml_graphs_to_excel(file_path, ml_graphs)
+        analysis_results, graphs = session.analysis_results, session.graphs
+        ml_predictions, ml_data, ml_graphs = session.ml_predictions, session.ml_data, session.ml_graphs
 
+        if session.channels[1]:
             print("DEBUG: scheduling ResultsPage display")
             controller.after(
                 0,
@@ -0,0 +1,273 @@
+# reanalyze.py
+#   • re-runs the full analysis (procResult.analyze) over many sessions, without the GUI
+#   • sessions: SD card folders (sequence files or a CSV), patient workbooks (.xlsx) and session stores (.session/)
+#     found under the given paths, or picked from the patient catalogue
+#   • sessions are analyzed in a process pool; each worker loads the ECG model once (procResult.init_worker)
+#   • every session's results go to its workbook, store and catalogue entry as after a live test;
+#     one row per session goes to a summary table (CSV)
+#
+# Re-score the whole archive, e.g. after new thresholds or a retrained autoencoder:
+#   python3 processing/reanalyze.py "Patient Records"
+#   python3 processing/reanalyze.py --catalog --patient x --since 2026-01-01
+#   python3 processing/reanalyze.py sd_card_copies/ --fs 250 --baseline-seconds 60 --workers 4
+#_______________________________________________________________________________#
+
+import argparse
+import csv
+import datetime
+import multiprocessing
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import procResult
+from patientCatalog import CATALOG_PATH, RECORDS_DIR, PatientCatalog
+from sdCard import is_sd_folder, load_session_info, recording_fs, signal_sources
+from sessionRecorder import read_header, recording_path
+from sessionStore import PHASE_SHEETS, STORE_EXT, SessionStore, read_recording_info, store_path
+
+# Settings of SD card folders without a session_info.json
+DEFAULT_FS = 100
+DEFAULT_CHANNELS = [True, True, True]
+BASELINE_SECONDS = 30
+
+SUMMARY_FIELDS = ["session", "kind", "workbook", "status", "seconds",
+                  "emg_flags", "ecg_flags", "eda_flags",
+                  "ecg_class", "ecg_confidence", "ecg_anomalies", "error"]
+
+
+# =============================================================================
+# DISCOVERY
+# =============================================================================
+
+def discover(paths):
+    """
+    Sessions under the given folders / files, as jobs for reanalyze_sessions.
+
+    A folder with the sequence files or a CSV is an SD card session (and is
+    not searched further); a workbook or a store is a live session, the
+    store standing for the workbook next to it.
+
+    Returns:
+        list[dict]: {'kind': 'sd' | 'workbook', 'path': folder or workbook}.
+    """
+    jobs, seen = [], set()
+
+    def add(kind, path):
+        path = os.path.normpath(path)
+        if path not in seen:
+            seen.add(path)
+            jobs.append({'kind': kind, 'path': path})
+
+    def add_file(path):
+        name = os.path.basename(path)
+        if name.endswith(".xlsx") and not name.startswith("~$"):
+            add('workbook', path)
+
+    for root in paths:
+        if os.path.isfile(root):
+            add_file(root)
+            continue
+        if root.endswith(STORE_EXT):
+            add('workbook', root[:-len(STORE_EXT)] + ".xlsx")
+            continue
+        for folder, dirs, files in os.walk(root):
+            dirs.sort()
+            if is_sd_folder(folder):
+                # its own results workbook is written into it, not a session of its own
+                add('sd', folder)
+                dirs[:] = []
+                continue
+            for d in list(dirs):
+                if d.endswith(STORE_EXT):
+                    add('workbook', os.path.join(folder, d[:-len(STORE_EXT)] + ".xlsx"))
+                    dirs.remove(d)
+            for name in sorted(files):
+                add_file(os.path.join(folder, name))
+    return jobs
+
+
+def catalog_jobs(catalog_path=CATALOG_PATH, patient=None, since=None):
+    """Jobs for the sessions of the patient catalogue (recorded ones only)."""
+    return [{'kind': 'workbook', 'path': os.path.normpath(s['workbook'])}
+            for s in PatientCatalog(catalog_path).sessions(patient, since=since)
+            if os.path.exists(s['workbook']) or os.path.exists(s['store'])]
+
+
+# =============================================================================
+# ONE SESSION (runs in a worker)
+# =============================================================================
+
+def sd_results_workbook(folder):
+    """Workbook the results of an SD card folder are saved to: <folder>/<folder name>_results.xlsx."""
+    return os.path.join(folder, f"{os.path.basename(os.path.abspath(folder))}_results.xlsx")
+
+
+def _workbook_settings(excel_file):
+    """
+    Sampling rate and channels of a live session, from its store, its
+    baseline recording or, for sessions older than both, the workbook's
+    Recording Info sheet. Phases only in the workbook's raw data sheets are
+    copied to the store first, so the analysis reads them from there.
+    """
+    store = SessionStore.for_workbook(excel_file)
+    info = (store.meta.get("recording_info") or {}) if store.exists() else {}
+    fs, channels = info.get("sample_rate"), info.get("signals")
+
+    rec_path = recording_path(excel_file, "baseline")
+    if (fs is None or channels is None) and os.path.exists(rec_path):
+        header = read_header(rec_path)
+        fs = fs or header.get("fs")
+        channels = channels or header.get("enabled")
+
+    missing = [phase for phase in PHASE_SHEETS
+               if phase not in store.phases() and not os.path.exists(recording_path(excel_file, phase))]
+    if fs is None or channels is None or missing:
+        if not os.path.exists(excel_file):
+            raise FileNotFoundError(f"No recording, store or workbook for {excel_file}")
+        info = read_recording_info(excel_file)
+        fs = fs or info.get("sample_rate")
+        channels = channels or info.get("signals")
+        if fs is None or channels is None:
+            raise ValueError(f"Sample rate / channels unknown for {excel_file}")
+        for phase in missing:
+            print(f"Copying the {phase} data of {excel_file} to {store_path(excel_file)}")
+            store.write_phase_from_workbook(phase, excel_file, int(fs), channels)
+        if not store.meta.get("recording_info"):
+            store.update_meta(recording_info=info)
+
+    return int(fs), list(channels)
+
+
+def _summary_row(session):
+    row = {}
+    for channel in ('emg', 'ecg', 'eda'):
+        flags = session.analysis_results[channel].get('flags')
+        if isinstance(flags, dict):
+            raised = sum(1 for flag in flags.values() if flag not in ('Normal', 'N/A'))
+            row[f"{channel}_flags"] = f"{raised}/{len(flags)}"
+    ecg = session.ml_predictions.get('ecg') or {}
+    if ecg and session.channels[1]:
+        row.update(ecg_class=ecg.get('classification'),
+                   ecg_confidence=round(float(ecg.get('confidence', 0)), 3),
+                   ecg_anomalies=ecg.get('anomaly_count'))
+    return row
+
+
+def reanalyze_one(job, fs=DEFAULT_FS, baseline_seconds=BASELINE_SECONDS):
+    """
+    Analyzes one discovered session and saves its results.
+
+    Returns:
+        dict: Its summary row (SUMMARY_FIELDS); status 'ok' or 'failed'.
+    """
+    start = time.perf_counter()
+    row = {'session': job['path'], 'kind': job['kind'], 'status': 'ok'}
+    try:
+        if job['kind'] == 'sd':
+            folder = job['path']
+            info_fs, channels = load_session_info(folder)
+            workbook = sd_results_workbook(folder)
+            # a CSV is split at its own rate: analyze at that rate too
+            folder_fs = recording_fs(folder, info_fs or fs)
+            with procResult.AnalysisSession(workbook, channels or DEFAULT_CHANNELS, folder_fs) as session:
+                session.sources = signal_sources(folder, baseline_seconds, session.workdir, folder_fs)
+                procResult.analyze(session)
+        else:
+            workbook = job['path']
+            session_fs, channels = _workbook_settings(workbook)
+            with procResult.AnalysisSession(workbook, channels, session_fs) as session:
+                procResult.analyze(session)
+        row['workbook'] = workbook
+        row.update(_summary_row(session))
+    except Exception as e:
+        traceback.print_exc()
+        row.update(status='failed', error=str(e))
+    row['seconds'] = round(time.perf_counter() - start, 1)
+    return row
+
+
+# =============================================================================
+# BATCH
+# =============================================================================
+
+def reanalyze_sessions(jobs, workers=None, fs=DEFAULT_FS, baseline_seconds=BASELINE_SECONDS, on_done=None):
+    """
+    Analyzes sessions in worker processes, one session per worker at a time.
+
+    Args:
+        jobs (list[dict]): From discover() or catalog_jobs().
+        workers (int): Worker processes; defaults to one per CPU.
+        fs (int): Sampling rate of SD card folders without a session_info.json.
+        baseline_seconds (int): Baseline length of SD card CSVs.
+        on_done (callable): Called with each summary row as its session finishes.
+
+    Returns:
+        list[dict]: Summary rows, in the order of jobs.
+    """
+    rows = [None] * len(jobs)
+    # spawn, not fork: matplotlib and the ML backend do not survive a fork with threads running
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=procResult.init_worker) as pool:
+        futures = {pool.submit(reanalyze_one, job, fs, baseline_seconds): i for i, job in enumerate(jobs)}
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                rows[i] = future.result()
+            except Exception as e:
+                # the worker itself died
+                rows[i] = {'session': jobs[i]['path'], 'kind': jobs[i]['kind'], 'status': 'failed', 'error': str(e)}
+            if on_done is not None:
+                on_done(rows[i])
+    return rows
+
+
+def write_summary(rows, path):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def print_summary(rows):
+    print(f"\n{'session':<50} {'status':<7} {'sec':>6}  EMG    ECG    EDA    ECG class")
+    for row in rows:
+        ecg_class = "" if row.get('ecg_class') is None else f"{row['ecg_class']} ({row['ecg_confidence']:.2f})"
+        print(f"{row['session'][-50:]:<50} {row['status']:<7} {row.get('seconds', ''):>6}  "
+              f"{row.get('emg_flags', '-'):<6} {row.get('ecg_flags', '-'):<6} {row.get('eda_flags', '-'):<6} {ecg_class}")
+    failed = sum(row['status'] != 'ok' for row in rows)
+    print(f"\n{len(rows) - failed} analyzed, {failed} failed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-run the analysis of many sessions without the GUI.")
+    parser.add_argument("paths", nargs="*", default=[],
+                        help=f"folders / workbooks / stores to analyze (default: {RECORDS_DIR})")
+    parser.add_argument("--catalog", action="store_true", help="analyze the sessions of the patient catalogue")
+    parser.add_argument("--patient", help="with --catalog: only this patient's sessions")
+    parser.add_argument("--since", help="with --catalog: only sessions created since YYYY-MM-DD")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--fs", type=int, default=DEFAULT_FS,
+                        help=f"sampling rate of SD card folders without session_info.json (default: {DEFAULT_FS})")
+    parser.add_argument("--baseline-seconds", type=int, default=BASELINE_SECONDS,
+                        help=f"baseline length of SD card CSVs (default: {BASELINE_SECONDS})")
+    parser.add_argument("--summary", help="summary CSV (default: reanalysis_<date>_<time>.csv)")
+    args = parser.parse_args()
+
+    if args.catalog:
+        jobs = catalog_jobs(patient=args.patient, since=args.since)
+    else:
+        jobs = discover(args.paths or [RECORDS_DIR])
+    if not jobs:
+        parser.exit(1, "No sessions found\n")
+
+    print(f"{len(jobs)} sessions to analyze")
+    rows = reanalyze_sessions(jobs, args.workers, args.fs, args.baseline_seconds,
+                              on_done=lambda row: print(f"[{row['status']}] {row['session']}"))
+
+    summary = args.summary or f"reanalysis_{datetime.datetime.now():%Y%m%d_%H%M%S}.csv"
+    write_summary(rows, summary)
+    print_summary(rows)
+    print(f"Summary written to {summary}")
@@ -0,0 +1,237 @@
+# sdCard.py
+#   • reads recordings copied from the patient's SD card (no GUI, shared by LoadDataPage and batch re-analysis)
+#   • a folder holds baseline_sequence.txt + test_sequence.txt (or their .sigz archives), or the CSV
+#     export of the firmware ("Timestamp (ms), ECG (V), EMG (V), EDA (V)", possibly split over several
+#     files); a card may hold one such folder per test
+#   • CSVs are streamed in chunks into baseline / test .npy arrays (no text round trip)
+#   • optional session_info.json: {"sample_rate": 100, "channels": {"emg": true, "ecg": true, "eda": true}}
+#_______________________________________________________________________________#
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from procFuncs import sniff_signal_file
+from signalArchive import ARCHIVE_EXT
+
+SEQUENCE_FILES = ("baseline_sequence.txt", "test_sequence.txt")
+# The sequence files archived by signalArchive (read instead of the text when present)
+ARCHIVED_SEQUENCE_FILES = tuple(os.path.splitext(f)[0] + ARCHIVE_EXT for f in SEQUENCE_FILES)
+SESSION_INFO = "session_info.json"
+# Phases of a CSV recording, written by convert_csv_in_folder
+PHASE_FILES = {"baseline": "baseline_sequence.npy", "test": "test_sequence.npy"}
+
+# Rows parsed per chunk when streaming a CSV
+CSV_CHUNK_ROWS = 1 << 18
+# Bytes read per block when counting the rows of a CSV
+COUNT_BLOCK_BYTES = 1 << 24
+
+
+def find_csvs(folder):
+    """CSVs in *folder*, in name order (the firmware may split one recording over several files)."""
+    return [os.path.join(folder, f) for f in sorted(os.listdir(folder)) if f.lower().endswith(".csv")]
+
+
+def find_csv(folder):
+    """First CSV in *folder*, or None."""
+    csv_files = find_csvs(folder)
+    return csv_files[0] if csv_files else None
+
+
+def _count_rows(path, header):
+    # newlines counted in large binary blocks: disk speed, no parsing
+    rows, last = 0, b"\n"
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(COUNT_BLOCK_BYTES), b""):
+            rows += block.count(b"\n")
+            last = block[-1:]
+    return rows + (last != b"\n") - int(header)
+
+
+def _csv_fs(path, fmt):
+    # an 'fs' column, else the median step of the timestamps (ms), else None
+    if fmt["fs"]:
+        return int(round(fmt["fs"]))
+    if fmt["time"] is None:
+        return None
+    stamps = pd.read_csv(path, sep=fmt["delimiter"] or r"\s+", header=None, skiprows=int(fmt["header"]),
+                         usecols=[fmt["time"]], dtype=np.float64, nrows=1000, engine="c").to_numpy().ravel()
+    step = np.median(np.diff(stamps)) if len(stamps) > 1 else 0
+    return int(round(1000.0 / step)) if step > 0 else None
+
+
+def _csv_chunks(path, fmt):
+    # (rows, 3) float64 blocks in EMG, ECG, EDA order; NaN for a channel the file does not have
+    usecols = sorted(col for col in fmt["columns"] if col is not None)
+    reader = pd.read_csv(path, sep=fmt["delimiter"] or r"\s+", header=None, skiprows=int(fmt["header"]),
+                         usecols=usecols, dtype=np.float64, engine="c", chunksize=CSV_CHUNK_ROWS)
+    with reader:
+        for chunk in reader:
+            values = chunk.to_numpy()
+            block = np.full((len(values), len(fmt["columns"])), np.nan)
+            for out, col in enumerate(fmt["columns"]):
+                if col is not None:
+                    block[:, out] = values[:, usecols.index(col)]
+            yield block
+
+
+def convert_csv_in_folder(folder, baseline_seconds=30, out_dir=None, fs=None):
+    """
+    Streams the CSVs in *folder* (one recording; several files are joined
+    in name order) into baseline_sequence.npy and test_sequence.npy in
+    *out_dir* (default: *folder*): (3, n) float64, rows EMG, ECG, EDA, the
+    layout of the session store, read by procFuncs.load_signal_matrix.
+
+    Files are parsed CSV_CHUNK_ROWS rows at a time and written straight
+    into the memory-mapped outputs, so memory use does not grow with the
+    recording. Signal columns are found by name (e.g. "Timestamp (ms),
+    ECG (V), EMG (V), EDA (V)", any order); the sampling rate comes from an
+    'fs' column, the timestamps, or *fs* (default 100 Hz).
+
+    Returns:
+        dict: {'baseline': path, 'test': path}, or None if no CSV was found.
+
+    Raises:
+        ValueError: The files have no signal columns, or the recording is
+                    shorter than the baseline.
+    """
+    csv_paths = find_csvs(folder)
+    if not csv_paths:
+        return None
+    out_dir = out_dir or folder
+
+    formats = [sniff_signal_file(path) for path in csv_paths]
+    for path, fmt in zip(csv_paths, formats):
+        if fmt["format"] != "text":
+            raise ValueError(f"{os.path.basename(path)} is not a CSV export")
+
+    csv_fs = _csv_fs(csv_paths[0], formats[0])
+    if csv_fs is None:
+        csv_fs = fs or 100
+        if fs is None:
+            print(f"[WARNING] No 'fs' column or timestamps in {os.path.basename(csv_paths[0])}. Assuming {csv_fs} Hz.")
+
+    total = sum(_count_rows(path, fmt["header"]) for path, fmt in zip(csv_paths, formats))
+    split_idx = int(baseline_seconds * csv_fs)
+    if split_idx >= total:
+        raise ValueError(
+            f"Baseline duration ({baseline_seconds}s × {csv_fs}Hz = {split_idx} samples) "
+            f"exceeds recording length ({total} samples)."
+        )
+
+    paths = {phase: os.path.join(out_dir, name) for phase, name in PHASE_FILES.items()}
+    outputs = {
+        'baseline': np.lib.format.open_memmap(paths['baseline'], mode="w+", dtype=np.float64, shape=(3, split_idx)),
+        'test': np.lib.format.open_memmap(paths['test'], mode="w+", dtype=np.float64, shape=(3, total - split_idx)),
+    }
+
+    # position in the joined recording; a chunk may straddle the baseline / test boundary
+    pos = 0
+    for path, fmt in zip(csv_paths, formats):
+        for block in _csv_chunks(path, fmt):
+            block = block[:total - pos]
+            start, stop = pos, pos + len(block)
+            if start < split_idx:
+                n = min(stop, split_idx) - start
+                outputs['baseline'][:, start:start + n] = block[:n].T
+                block, start = block[n:], start + n
+            if len(block):
+                outputs['test'][:, start - split_idx:stop - split_idx] = block.T
+            pos = stop
+
+    for data in outputs.values():
+        data.flush()
+    del outputs
+
+    if pos < total:
+        # blank lines were counted as rows: cut the unwritten tail off
+        if pos <= split_idx:
+            raise ValueError(f"Recording shorter than the baseline ({pos} samples)")
+        test = np.load(paths['test'], mmap_mode="r")[:, :pos - split_idx].copy()
+        np.save(paths['test'], test)
+
+    return paths
+
+
+def signal_sources(folder, baseline_seconds=30, workdir=None, fs=None):
+    """
+    Signal file of each phase of a folder: its sequence files (archived or
+    text), read in place, or its CSVs split into *workdir* (an
+    AnalysisSession's scratch directory; *fs* is used if the CSVs give no
+    sampling rate).
+
+    Returns:
+        dict: {'baseline': path, 'test': path}, as AnalysisSession sources.
+    """
+    for files in (ARCHIVED_SEQUENCE_FILES, SEQUENCE_FILES):
+        if all(os.path.isfile(os.path.join(folder, f)) for f in files):
+            return {'baseline': os.path.join(folder, files[0]),
+                    'test': os.path.join(folder, files[1])}
+    sources = convert_csv_in_folder(folder, baseline_seconds=baseline_seconds, out_dir=workdir, fs=fs)
+    if sources is None:
+        raise FileNotFoundError(f"No sequence files or CSV in {folder}")
+    return sources
+
+
+def recording_fs(folder, fs):
+    """
+    Sampling rate to analyze the recording in *folder* at: the rate its
+    CSVs give ('fs' column or timestamps), or *fs* (the rate that was set)
+    for sequence files and CSVs without one. A warning is printed when the
+    two differ, since the CSV is split into phases at its own rate.
+    """
+    if any(all(os.path.isfile(os.path.join(folder, f)) for f in files)
+           for files in (ARCHIVED_SEQUENCE_FILES, SEQUENCE_FILES)):
+        return fs
+    csv_path = find_csv(folder)
+    if csv_path is None:
+        return fs
+    fmt = sniff_signal_file(csv_path)
+    csv_fs = _csv_fs(csv_path, fmt) if fmt["format"] == "text" else None
+    if csv_fs is None:
+        return fs
+    if fs is not None and csv_fs != fs:
+        print(f"[WARNING] {os.path.basename(csv_path)} was recorded at {csv_fs} Hz, not {fs} Hz. "
+              f"Analyzing at {csv_fs} Hz.")
+    return csv_fs
+
+
+def is_sd_folder(folder):
+    """True if *folder* holds a recording: both sequence files (archived or text), or a CSV."""
+    has_sequences = any(all(os.path.isfile(os.path.join(folder, f)) for f in files)
+                        for files in (ARCHIVED_SEQUENCE_FILES, SEQUENCE_FILES))
+    return has_sequences or find_csv(folder) is not None
+
+
+def find_recordings(root):
+    """
+    Folders under *root* (itself included) that hold a recording; a card
+    with one subfolder per test gives one folder per test.
+    """
+    found = []
+    for folder, dirs, _ in os.walk(root):
+        dirs.sort()
+        if is_sd_folder(folder):
+            found.append(folder)
+            dirs[:] = []
+    return found
+
+
+def load_session_info(folder):
+    """
+    Sample rate and channels from the folder's session_info.json.
+
+    Returns:
+        tuple: (sample_rate or None, [emg, ecg, eda] or None); (None, None)
+               without the file.
+    """
+    info_path = os.path.join(folder, SESSION_INFO)
+    if not os.path.isfile(info_path):
+        return None, None
+    with open(info_path) as f:
+        info = json.load(f)
+    ch = info.get("channels", {})
+    channels = [bool(ch.get("emg", True)), bool(ch.get("ecg", True)), bool(ch.get("eda", True))]
+    return info.get("sample_rate"), channels
@@ -0,0 +1,114 @@
+# test_adaptiveFilter.py
+#   • the block engine against plain per-sample loops (LMS, NLMS, block LMS), lengths around GROUP / SCAN_BLOCK
+#   • a stream fed block by block (down to single samples) against one call
+#_______________________________________________________________________________#
+
+import numpy as np
+import pytest
+
+from adaptiveFilter import DEFAULT_INPUT, GROUP, SCAN_BLOCK, AdaptiveFilter, _per_sample
+
+# large enough that the weights move a lot (a wrong composition order would show), small enough to stay stable
+MU = 2e-3
+LENGTHS = [2, 3, GROUP - 1, GROUP, GROUP + 1, 3 * GROUP + 5, 1000, SCAN_BLOCK + 37]
+
+
+def _signal(n, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(n) / 250.0
+    y = np.sin(2 * np.pi * 1.2 * t) + 0.3 * rng.standard_normal(n)
+    return (y - y.mean()) / (y.std() + 1e-8)
+
+
+def _nlms_per_sample(y, x, mu, eps=1e-8):
+    n = len(y)
+    y_hat, e, a, b = np.zeros(n), np.zeros(n), np.zeros(n), np.zeros(n)
+    w1 = w2 = 0.0
+    for i in range(1, n):
+        a[i], b[i] = w1, w2
+        y_hat[i] = w1 * x[i - 1] + w2 * y[i - 1]
+        e[i] = y[i] - y_hat[i]
+        step = mu / (eps + x[i - 1] ** 2 + y[i - 1] ** 2)
+        w1, w2 = w1 + step * x[i - 1] * e[i], w2 + step * y[i - 1] * e[i]
+    return y_hat, e, a, b
+
+
+def _block_per_sample(y, x, mu, size):
+    # weights fixed over each block of regressors (samples 1..size, size+1..2 size, ...)
+    n = len(y)
+    y_hat, e, a, b = np.zeros(n), np.zeros(n), np.zeros(n), np.zeros(n)
+    w1 = w2 = 0.0
+    for start in range(1, n, size):
+        stop = min(start + size, n)
+        g1 = g2 = 0.0
+        for i in range(start, stop):
+            a[i], b[i] = w1, w2
+            y_hat[i] = w1 * x[i - 1] + w2 * y[i - 1]
+            e[i] = y[i] - y_hat[i]
+            g1 += x[i - 1] * e[i]
+            g2 += y[i - 1] * e[i]
+        w1, w2 = w1 + mu * g1 / (stop - start), w2 + mu * g2 / (stop - start)
+    return y_hat, e, a, b
+
+
+def _assert_close(out, ref):
+    for got, expected in zip(out, ref):
+        np.testing.assert_allclose(got, expected, rtol=0, atol=1e-10)
+
+
+@pytest.mark.parametrize("n", LENGTHS)
+def test_lms_matches_per_sample_loop(n):
+    y = _signal(n)
+    x = np.full(n, DEFAULT_INPUT)
+    _assert_close(AdaptiveFilter(MU, "lms").process(y, x), _per_sample(y, x, MU))
+
+
+@pytest.mark.parametrize("n", [2, GROUP + 1, 1000])
+def test_nlms_matches_per_sample_loop(n):
+    y = _signal(n, seed=1)
+    x = np.full(n, DEFAULT_INPUT)
+    _assert_close(AdaptiveFilter(0.05, "nlms").process(y, x), _nlms_per_sample(y, x, 0.05))
+
+
+@pytest.mark.parametrize("n", [2, 33, 1000])
+def test_block_lms_matches_its_loop(n):
+    y = _signal(n, seed=2)
+    x = np.full(n, DEFAULT_INPUT)
+    _assert_close(AdaptiveFilter(MU, "block", block_size=32).process(y, x), _block_per_sample(y, x, MU, 32))
+
+
+def test_default_input_is_constant():
+    y = _signal(500)
+    _assert_close(AdaptiveFilter(MU).process(y), AdaptiveFilter(MU).process(y, np.full(500, DEFAULT_INPUT)))
+
+
+@pytest.mark.parametrize("mode", ["lms", "nlms"])
+def test_streamed_blocks_match_one_call(mode):
+    n = SCAN_BLOCK + 3 * GROUP + 11
+    y = _signal(n, seed=3)
+    whole = AdaptiveFilter(MU, mode).process(y)
+
+    # uneven cuts: single samples, an empty block, lengths around GROUP and one past SCAN_BLOCK
+    cuts = np.cumsum([1, 1, 0, GROUP - 1, GROUP + 1, 5, SCAN_BLOCK + 1])
+    engine = AdaptiveFilter(MU, mode)
+    parts = [engine.process(y[start:stop]) for start, stop in zip(np.r_[0, cuts], np.r_[cuts, n])]
+
+    for field in range(4):
+        streamed = np.concatenate([part[field] for part in parts])
+        np.testing.assert_allclose(streamed, whole[field], rtol=0, atol=1e-10)
+
+
+def test_single_sample_and_empty_input():
+    engine = AdaptiveFilter(MU)
+    out = engine.process([0.5])
+    assert out.y_hat.tolist() == [0.0] and out.error.tolist() == [0.0]
+    assert len(engine.process([]).error) == 0
+
+    # the next sample predicts from the one before it
+    out = engine.process([0.25])
+    assert out.y_hat[0] == 0.0 and out.error[0] == 0.25
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        AdaptiveFilter(mode="rls")
@@ -0,0 +1,199 @@
+# test_procFuncs.py
+#   • LMS response levels (np.digitize into int8) against the original if/elif string classification:
+#     every threshold edge, just past it, negatives and NaN
+#   • section majority and overall level, including ties, and what LMSResult keeps of them
+#   • sniff_signal_file / load_signal_matrix: every format it recognises, reordered and missing columns
+#_______________________________________________________________________________#
+
+import numpy as np
+import pytest
+
+from procFuncs import (RESPONSE_LEVELS, RESPONSE_THRESHOLDS, LMSAdaptiveFilter, import_matrix_from_txt,
+                       load_signal_matrix, sniff_signal_file)
+from sessionRecorder import ChunkRecorder
+from signalArchive import write_archive
+
+
+def _old_error_range(e):
+    # the per-sample classification LMSAdaptiveFilter.error() used to build
+    error_range = []
+    for i in range(1, len(e)):
+        if e[i] <= 15:
+            error_range.append((i, "normal"))
+        elif 15 < e[i] <= 25:
+            error_range.append((i, "slight response"))
+        elif 25 < e[i] <= 35:
+            error_range.append((i, "mild response"))
+        elif 35 < e[i] <= 45:
+            error_range.append((i, "moderate response"))
+        elif 45 < e[i] <= 55:
+            error_range.append((i, "severe response"))
+        else:
+            error_range.append((i, "unknown"))
+    return error_range
+
+
+def _old_sections(error_range, size):
+    # majority label per section; a tie went to the label seen first in the section
+    labels = []
+    for start in range(0, len(error_range), size):
+        counts = {}
+        for _, label in error_range[start:start + size]:
+            counts[label] = counts.get(label, 0) + 1
+        labels.append(max(counts, key=counts.get))
+    return labels
+
+
+def _old_average(error_range):
+    counts = dict.fromkeys(RESPONSE_LEVELS, 0)
+    for _, label in error_range:
+        counts[label] += 1
+    return max(counts, key=counts.get)
+
+
+def _filter_with_error(e):
+    lms = LMSAdaptiveFilter(np.zeros(len(e)))
+    lms.e = np.asarray(e, dtype=np.float64)
+    lms.error()
+    return lms
+
+
+def test_threshold_edges_match_old_classification():
+    edges = np.asarray(RESPONSE_THRESHOLDS, dtype=np.float64)
+    e = np.concatenate(([0.0], edges, np.nextafter(edges, np.inf), edges - 0.5,
+                        [-1e9, -15.0, 0.0, 1e9, np.inf, -np.inf, np.nan]))
+    lms = _filter_with_error(e)
+
+    assert lms.levels.dtype == np.int8
+    assert lms.error_range == _old_error_range(e)
+    # exactly on an edge is still the lower level
+    assert [RESPONSE_LEVELS[level] for level in lms.levels[:5]] == list(RESPONSE_LEVELS[:5])
+
+
+def test_random_errors_match_old_classification():
+    e = np.random.default_rng(0).uniform(-10, 70, 20_000).round(1)
+    lms = _filter_with_error(e)
+
+    old = _old_error_range(e)
+    assert lms.error_range == old
+    assert lms.error_lms_section(1, 1000) == _old_sections(old, 1000)
+    assert lms.average_threshold() == _old_average(old)
+
+
+def test_section_ties_go_to_lower_level():
+    # sections of 4 samples; e[0] is not classified
+    e = [0.0,
+         20, 20, 5, 5,      # slight seen first, 2-2 tie: old code said slight, now normal
+         5, 5, 20, 20,      # normal seen first: both say normal
+         40, 30, 40, 30,    # moderate seen first, 2-2: now mild
+         60, 60, 60]        # short last section: unknown
+    lms = _filter_with_error(e)
+    old = _old_sections(_old_error_range(np.array(e)), 4)
+
+    assert lms.error_lms_section(4, 1) == ["normal", "normal", "mild response", "unknown"]
+    assert old == ["slight response", "normal", "moderate response", "unknown"]
+
+
+def test_overall_tie_goes_to_lower_level_as_before():
+    e = [0.0, 50, 50, 20, 20]
+    lms = _filter_with_error(e)
+    assert lms.average_threshold() == _old_average(_old_error_range(np.array(e))) == "slight response"
+
+
+def test_error_is_idempotent():
+    lms = _filter_with_error([0.0, 1.0, 30.0])
+    lms.error()
+    assert len(lms.levels) == 2
+
+
+@pytest.mark.parametrize("n", [2, 5000])
+def test_result_keeps_levels(n):
+    rng = np.random.default_rng(n)
+    lms = LMSAdaptiveFilter(np.cumsum(rng.standard_normal(n)))
+    lms.update()
+    lms.error()
+    result = lms.result()
+
+    np.testing.assert_array_equal(result.levels, lms.levels)
+    assert result.error_lms_section(1, 500) == lms.error_lms_section(1, 500)
+    assert result.average_threshold() == lms.average_threshold()
+
+    again = result.filter()
+    np.testing.assert_array_equal(again.e, lms.e)
+    np.testing.assert_array_equal(again.levels, lms.levels)
+
+
+# ── signal files ────────────────────────────────────────────────────────────
+
+SIGNALS = np.array([[0.5, 0.25, -1.0, 2.0],      # EMG
+                    [1.0, 1.5, 0.125, -0.5],     # ECG
+                    [3.0, 3.25, 3.5, 3.75]])     # EDA
+
+
+def _write_text(path, text):
+    path.write_text(text)
+    return str(path)
+
+
+@pytest.mark.parametrize("delimiter, expected", [(",", ","), (" ", None), ("\t", "\t"), (";", ";")])
+def test_headerless_text_is_emg_ecg_eda(tmp_path, delimiter, expected):
+    path = _write_text(tmp_path / "baseline_sequence.txt",
+                       "\n".join(delimiter.join(str(v) for v in row.tolist()) for row in SIGNALS.T) + "\n")
+
+    fmt = sniff_signal_file(path)
+    assert fmt == {"format": "text", "delimiter": expected, "header": False, "columns": [0, 1, 2],
+                   "time": None, "fs": None}
+    np.testing.assert_array_equal(load_signal_matrix(path), SIGNALS)
+
+
+def test_named_columns_in_any_order(tmp_path):
+    rows = [f"{t},{ecg},{eda},{emg},250" for t, (emg, ecg, eda) in zip(range(0, 16, 4), SIGNALS.T)]
+    path = _write_text(tmp_path / "sd.csv", "Timestamp (ms),ECG (V),EDA (V),EMG (V),fs\n" + "\n".join(rows) + "\n")
+
+    fmt = sniff_signal_file(path)
+    assert fmt["header"] and fmt["columns"] == [3, 1, 2] and fmt["time"] == 0 and fmt["fs"] == 250
+    np.testing.assert_array_equal(load_signal_matrix(path), SIGNALS)
+
+
+def test_missing_channel_is_nan(tmp_path):
+    rows = [f"{ecg},{emg}" for emg, ecg, _ in SIGNALS.T]
+    path = _write_text(tmp_path / "two.csv", "ECG,EMG\n" + "\n".join(rows) + "\n")
+
+    data = load_signal_matrix(path)
+    np.testing.assert_array_equal(data[:2], SIGNALS[:2])
+    assert np.isnan(data[2]).all()
+    emg, ecg, eda, error = import_matrix_from_txt(path)
+    assert not error and eda is None and list(ecg) == list(SIGNALS[1])
+
+
+@pytest.mark.parametrize("layout", ["channels_first", "samples_first"])
+def test_npy(tmp_path, layout):
+    path = str(tmp_path / "test_sequence.npy")
+    np.save(path, SIGNALS if layout == "channels_first" else SIGNALS.T)
+
+    assert sniff_signal_file(path) == {"format": "npy"}
+    np.testing.assert_array_equal(load_signal_matrix(path), SIGNALS)
+
+
+def test_recording(tmp_path):
+    path = str(tmp_path / "x_baseline.rec")
+    with ChunkRecorder(path, 100, "ESP32", chunk_size=3) as recorder:
+        recorder.write(SIGNALS.T)
+
+    assert sniff_signal_file(path) == {"format": "rec"}
+    np.testing.assert_array_equal(load_signal_matrix(path), SIGNALS)
+
+
+def test_archive(tmp_path):
+    path = str(tmp_path / "baseline_sequence.sigz")
+    write_archive(path, SIGNALS, 500)
+
+    assert sniff_signal_file(path) == {"format": "archive", "fs": 500}
+    np.testing.assert_allclose(load_signal_matrix(path), SIGNALS, atol=1e-5)
+
+
+def test_unreadable_text(tmp_path):
+    with pytest.raises(ValueError):
+        sniff_signal_file(_write_text(tmp_path / "empty.txt", "\n\n"))
+    with pytest.raises(ValueError):
+        sniff_signal_file(_write_text(tmp_path / "other.csv", "a,b\n1,2\n"))
@@ -0,0 +1,145 @@
+# test_sdCard.py
+#   • CSV export split into baseline / test at the CSV's own rate ('fs' column or timestamps, else *fs*),
+#     several files joined in name order, chunks straddling the file and phase boundaries
+#   • recording_fs, signal_sources (sequence files first), find_recordings, session_info.json
+#_______________________________________________________________________________#
+
+import json
+import os
+
+import numpy as np
+import pytest
+
+import sdCard
+from sdCard import (convert_csv_in_folder, find_recordings, load_session_info, recording_fs,
+                    signal_sources)
+
+
+def _signals(n):
+    # rows EMG, ECG, EDA
+    index = np.arange(n, dtype=np.float64)
+    return np.vstack((index, index + 0.25, index + 0.5))
+
+
+def _write_csvs(folder, signals, step_ms=4, files=1, fs_column=None, timestamps=True):
+    # the firmware's export: "Timestamp (ms), ECG (V), EMG (V), EDA (V)", split over *files* files
+    folder.mkdir(parents=True, exist_ok=True)
+    header = ["ECG (V)", "EMG (V)", "EDA (V)"]
+    if timestamps:
+        header.insert(0, "Timestamp (ms)")
+    if fs_column:
+        header.append("fs")
+    n = signals.shape[1]
+    bounds = np.linspace(0, n, files + 1).astype(int)
+    for k in range(files):
+        lines = [",".join(header)]
+        for i in range(bounds[k], bounds[k + 1]):
+            row = [signals[1, i], signals[0, i], signals[2, i]]
+            if timestamps:
+                row.insert(0, i * step_ms)
+            if fs_column:
+                row.append(fs_column)
+            lines.append(",".join(str(v) for v in row))
+        (folder / f"log_{k:02d}.csv").write_text("\n".join(lines) + "\n")
+
+
+def _load(paths):
+    return np.load(paths["baseline"]), np.load(paths["test"])
+
+
+def test_split_at_csv_rate(tmp_path):
+    signals = _signals(1000)
+    _write_csvs(tmp_path / "sd", signals, step_ms=4, files=3)          # 250 Hz
+
+    # fs=100 is what the app was set to; the split follows the timestamps
+    paths = convert_csv_in_folder(str(tmp_path / "sd"), baseline_seconds=2, out_dir=str(tmp_path), fs=100)
+    baseline, test = _load(paths)
+    assert paths["baseline"] == str(tmp_path / "baseline_sequence.npy")
+    np.testing.assert_array_equal(baseline, signals[:, :500])
+    np.testing.assert_array_equal(test, signals[:, 500:])
+
+
+def test_chunks_straddle_files_and_phases(tmp_path, monkeypatch):
+    monkeypatch.setattr(sdCard, "CSV_CHUNK_ROWS", 7)
+    signals = _signals(333)
+    _write_csvs(tmp_path, signals, step_ms=10, files=2)               # 100 Hz, split at 150
+
+    baseline, test = _load(convert_csv_in_folder(str(tmp_path), baseline_seconds=1.5))
+    np.testing.assert_array_equal(baseline, signals[:, :150])
+    np.testing.assert_array_equal(test, signals[:, 150:])
+
+
+def test_fs_column(tmp_path):
+    signals = _signals(100)
+    _write_csvs(tmp_path, signals, files=1, fs_column=20, timestamps=False)
+
+    baseline, test = _load(convert_csv_in_folder(str(tmp_path), baseline_seconds=3, fs=100))
+    assert baseline.shape == (3, 60) and test.shape == (3, 40)
+
+
+def test_fallback_rate(tmp_path, capsys):
+    signals = _signals(100)
+    _write_csvs(tmp_path, signals, timestamps=False)
+
+    baseline, _ = _load(convert_csv_in_folder(str(tmp_path), baseline_seconds=2, fs=25))
+    assert baseline.shape == (3, 50)
+    assert "WARNING" not in capsys.readouterr().out
+
+    baseline, _ = _load(convert_csv_in_folder(str(tmp_path), baseline_seconds=0.5))
+    assert baseline.shape == (3, 50)                                   # 100 Hz assumed
+    assert "Assuming 100 Hz" in capsys.readouterr().out
+
+
+def test_baseline_longer_than_recording(tmp_path):
+    _write_csvs(tmp_path, _signals(100), step_ms=10)
+    with pytest.raises(ValueError):
+        convert_csv_in_folder(str(tmp_path), baseline_seconds=1)
+
+
+def test_no_csv(tmp_path):
+    assert convert_csv_in_folder(str(tmp_path)) is None
+    with pytest.raises(FileNotFoundError):
+        signal_sources(str(tmp_path))
+
+
+def test_recording_fs(tmp_path, capsys):
+    _write_csvs(tmp_path / "csv", _signals(20), step_ms=4)
+    assert recording_fs(str(tmp_path / "csv"), 100) == 250
+    assert "recorded at 250 Hz, not 100 Hz" in capsys.readouterr().out
+    assert recording_fs(str(tmp_path / "csv"), 250) == 250
+    assert capsys.readouterr().out == ""
+
+    _write_csvs(tmp_path / "plain", _signals(20), timestamps=False)
+    assert recording_fs(str(tmp_path / "plain"), 100) == 100
+
+
+def test_signal_sources_prefers_sequence_files(tmp_path):
+    _write_csvs(tmp_path, _signals(400), step_ms=10)
+    for name in sdCard.SEQUENCE_FILES:
+        np.savetxt(tmp_path / name, _signals(10).T)
+
+    sources = signal_sources(str(tmp_path), baseline_seconds=1, workdir=str(tmp_path / "work"))
+    assert sources == {"baseline": str(tmp_path / "baseline_sequence.txt"),
+                       "test": str(tmp_path / "test_sequence.txt")}
+
+    os.remove(tmp_path / "test_sequence.txt")                         # one sequence file is not enough
+    (tmp_path / "work").mkdir()
+    sources = signal_sources(str(tmp_path), baseline_seconds=1, workdir=str(tmp_path / "work"))
+    assert sources["test"] == str(tmp_path / "work" / "test_sequence.npy")
+    assert np.load(sources["test"]).shape == (3, 300)
+
+
+def test_find_recordings(tmp_path):
+    _write_csvs(tmp_path / "card" / "test_2", _signals(10))
+    _write_csvs(tmp_path / "card" / "test_1", _signals(10))
+    _write_csvs(tmp_path / "card" / "test_1" / "old", _signals(10))  # inside a recording: not searched
+    (tmp_path / "card" / "empty").mkdir()
+
+    assert find_recordings(str(tmp_path / "card")) == [str(tmp_path / "card" / "test_1"),
+                                                       str(tmp_path / "card" / "test_2")]
+
+
+def test_session_info(tmp_path):
+    assert load_session_info(str(tmp_path)) == (None, None)
+    (tmp_path / "session_info.json").write_text(json.dumps({"sample_rate": 250, "channels": {"eda": False}}))
+    assert load_session_info(str(tmp_path)) == (250, [True, True, False])